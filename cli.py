@@ -95,6 +95,66 @@ def numerise(event: int, clear: bool, primes: bool, challenges: bool):
         print("Enumerated %d projects." % ix)
 
 
+@click.command()
+@click.argument('event', required=False)
+def recount(event=None):
+    """Rebuild activity counts of projects, optionally for one EVENT ID."""
+    with create_app().app_context():
+        from dribdat.aggregation import RecountProjects
+        if event is not None:
+            event = Event.query.filter_by(id=event).first_or_404()
+            print("Counting activities in event: ", event.name)
+        updated = RecountProjects(event)
+        print("Updated %d projects." % updated)
+
+
+@click.command()
+@click.argument('event', required=False)
+@click.option('-c', '--chunk', required=False, default=100, help="Projects per transaction")
+def rescore(event=None, chunk=100):
+    """Recalculate scores of projects (optionally for one EVENT ID) and users."""
+    with create_app().app_context():
+        from dribdat.aggregation import RecountProjects
+        if event is not None:
+            event = Event.query.filter_by(id=event).first_or_404()
+            print("Scoring projects in event: ", event.name)
+        updated = RecountProjects(event, True, chunk)
+        print("Updated %d projects." % updated)
+        from dribdat.aggregation import RescoreUsers
+        updated = RescoreUsers(chunk)
+        print("Updated %d users." % updated)
+
+
+@click.command()
+def reindex():
+    """Rebuild the full-text search index of projects."""
+    with create_app().app_context():
+        from dribdat.search import reindex_projects
+        updated = reindex_projects()
+        print("Indexed %d projects." % updated)
+
+
+@click.command()
+@click.option('-1', '--once', is_flag=True, help="Run the jobs which are due, then stop")
+@click.option('-i', '--interval', required=False, default=5, help="Seconds between checks of the queue")
+def worker(once=False, interval=5):
+    """Run queued background jobs, such as syncing and sending mail."""
+    with create_app().app_context():
+        from dribdat.jobs import run_worker
+        print("Running background jobs")
+        run_worker(interval, once)
+
+
+@click.command()
+@click.option('-1', '--once', is_flag=True, help="Sync the projects which are due, then stop")
+def autosync(once=False):
+    """Keep syncing projects of running events with their remote sources."""
+    with create_app().app_context():
+        from dribdat.autosync import run_scheduler
+        print("Syncing projects on schedule")
+        run_scheduler(once)
+
+
 @click.command()
 @click.argument('name', required=True)
 @click.argument('start', required=False)
@@ -151,9 +211,11 @@ def exports(kind):
     with create_app().app_context():
         if 'people' in kind:
             print(';'.join(['id','username','email','updated_at','fullname','my_skills','my_wishes','roles','teams','project_ids']))
-            for pp in User.query.filter_by(active=True).all():
+            users = User.query.filter_by(active=True).all()
+            joined = User.get_joined_projects([pp.id for pp in users])
+            for pp in users:
                 pdata = pp.data
-                pteams = pp.joined_projects(True, -1)
+                pteams = joined.get(pp.id, [])
                 pdata['teams'] = ','.join([ p.name for p in pteams ])
                 pdata['project_ids'] = ','.join([ str(p.id) for p in pteams ])
                 print(';'.join([
@@ -255,6 +317,11 @@ cli.add_command(register)
 cli.add_command(imports)
 cli.add_command(exports)
 cli.add_command(kick)
+cli.add_command(recount)
+cli.add_command(rescore)
+cli.add_command(reindex)
+cli.add_command(worker)
+cli.add_command(autosync)
 
 if __name__ == '__main__':
     cli()
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
-from flask_login import login_required
+from flask_login import login_required, current_user
 
 from ..utils import (
     unpack_csvlist,
@@ -10,10 +10,12 @@ from ..utils import (
     get_time_note,
     get_random_alphanumeric_string,
 )
-from ..extensions import db, cache
+from ..extensions import db
+from ..aggregation import RescoreUsers
+from ..caching import invalidate_event, invalidate_project
 from ..decorators import admin_required
 from ..api.parser import GetProjectData
-from ..aggregation import SyncProjectData
+from ..jobs import enqueue, flash_job
 from ..matching import get_matching_results
 from ..user.models import Role, User, Event, Activity, Project, Category
 from ..user import getProjectStages
@@ -197,6 +199,7 @@ def user_profile(user_id):
         user.my_skills = unpack_csvlist(form.my_skills.data)
         del form.my_wishes  # avoid setting it again
         del form.my_skills  # avoid setting it again
+        user.update_skills()
 
         form.populate_obj(user)
         user.updated_at = datetime.now(UTC)
@@ -349,7 +352,7 @@ def event(event_id):
         db.session.add(event)
         db.session.commit()
 
-        cache.clear()
+        invalidate_event(event.id)
 
         flash("Event updated.", "success")
         return redirect(url_for("admin.events"))
@@ -375,8 +378,8 @@ def event_delete(event_id):
     elif len(event.projects) > 0:
         flash("No projects may be assigned to event to delete.", "warning")
     else:
+        invalidate_event(event.id)
         event.delete()
-        cache.clear()
         flash("Event deleted.", "success")
     return events()
 
@@ -403,6 +406,7 @@ def event_feature(event_id):
     event = Event.query.filter_by(id=event_id).first_or_404()
     event.is_current = True
     event.save()
+    invalidate_event()
     return redirect(url_for("admin.events"))
 
 
@@ -424,17 +428,8 @@ def event_bootstrap_area():
 @admin_required
 def event_autosync(event_id):
     event = Event.query.filter_by(id=event_id).first_or_404()
-    count = 0
-    for project in event.projects:
-        if not project.is_syncable:
-            continue
-        data = GetProjectData(project.autotext_url, True)
-        if "name" not in data:
-            flash("Could not sync: %s" % project.name, "warning")
-            continue
-        SyncProjectData(project, data)
-        count += 1
-    flash("%d projects synced." % count, "success")
+    job = enqueue("sync-event", user=current_user, event_id=event.id)
+    flash_job(job, "Syncing the projects of %s - refresh in a moment." % event.name)
     return event_projects(event.id)
 
 
@@ -536,8 +531,9 @@ def project_view(project_id):
 def project_toggle(project_id):
     project = Project.query.filter_by(id=project_id).first_or_404()
     project.is_hidden = not project.is_hidden
+    project.update_team_scores()
     project.save()
-    cache.clear()
+    invalidate_project(project)
     if project.is_hidden:
         flash('Project "%s" is now hidden.' % project.name, "success")
     else:
@@ -553,9 +549,12 @@ def project_delete(project_id):
     if not project.is_hidden:
         flash("Project must be disabled.", "warning")
     else:
+        team = {a.user_id for a in project.activities if a.name == "star"}
         for a in project.activities:
             a.delete()
         project.delete()
+        # The project no longer counts towards the scores of its team
+        RescoreUsers(user_ids=team)
         flash("Project deleted.", "success")
     return redirect(url_for("admin.projects"))
 
@@ -593,7 +592,7 @@ def project_new():
         project.update_now()
         db.session.add(project)
         db.session.commit()
-        cache.clear()
+        invalidate_project(project)
         flash("Project added.", "success")
         return redirect(url_for("admin.event_projects", event_id=project.event.id))
     if project.user:
@@ -634,6 +633,8 @@ def category(category_id):
     form.event_id.choices.insert(0, (-1, ""))
 
     if form.is_submitted() and form.validate():
+        if category.event_id:
+            invalidate_event(category.event_id)
         form.populate_obj(category)
         if category.event_id == -1:
             category.event_id = None
@@ -643,7 +644,7 @@ def category(category_id):
         db.session.add(category)
         db.session.commit()
 
-        cache.clear()
+        invalidate_event(category.event_id)
         flash("Category updated.", "success")
         return categories()
 
@@ -667,7 +668,7 @@ def category_new():
         db.session.add(category)
         db.session.commit()
 
-        cache.clear()
+        invalidate_event(category.event_id)
         flash("Category added.", "success")
         return categories()
 
@@ -682,7 +683,7 @@ def category_delete(category_id):
     if len(category.projects) > 0:
         flash("No projects may be assigned to category to delete.", "warning")
     else:
-        cache.clear()
+        invalidate_event(category.event_id)
         category.delete()
         flash("Category deleted.", "success")
     return categories()
@@ -722,7 +723,6 @@ def role(role_id):
         db.session.add(role)
         db.session.commit()
 
-        cache.clear()
         flash("Role updated.", "success")
         return redirect(url_for("admin.presets"))
 
@@ -745,7 +745,6 @@ def role_new():
         db.session.add(role)
         db.session.commit()
 
-        cache.clear()
         flash("Role added.", "success")
         return redirect(url_for("admin.presets"))
 
@@ -864,7 +863,6 @@ def role_delete(role_id):
     if len(role.users) > 0:
         flash("No users may be assigned to role to delete.", "warning")
     else:
-        cache.clear()
         role.delete()
         flash("Role deleted.", "success")
     return redirect(url_for("admin.presets"))
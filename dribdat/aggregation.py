@@ -3,13 +3,14 @@
 
 import re
 import json
+from dribdat.futures import UTC
 from dribdat.user.models import Activity, User, Project
 from dribdat.user import isUserActive
 from dribdat.database import db
 from dribdat.api.parser import GetProjectData
-from sqlalchemy import and_
+from sqlalchemy import func, insert, update
 from requests.exceptions import ConnectionError
-from flask import flash, redirect, url_for
+from flask import current_app, flash, redirect, url_for
 
 
 def TrimProjectData(project, data):
@@ -38,8 +39,8 @@ def TrimProjectData(project, data):
         project.logo_icon = data["logo_icon"][0:40]
 
 
-def SyncProjectData(project, data):
-    """Sync remote project data."""
+def SyncProjectData(project, data, commit=True):
+    """Sync remote project data, optionally leaving the commit to the caller."""
     # Yes, the function above looks very similar to this one.
     # However, here we only overwrite the fields that are new.
     # DRY improvements are possible though..
@@ -84,10 +85,10 @@ def SyncProjectData(project, data):
     if "is_webembed" in data and data["is_webembed"]:
         project.is_webembed = True
     # Save the project state
-    project.save()
+    project.save(commit)
     # Additional logs, if available
     if "commits" in data:
-        SyncCommitData(project, data["commits"])
+        SyncCommitData(project, data["commits"], commit)
 
 
 def AddProjectDataFromAutotext(project):
@@ -170,20 +171,24 @@ def ProjectsByProgress(progress=None, event=None):
 
 def GetEventUsers(event):
     """Fetch all active users that have a project in this event."""
-    if not event or not event.projects:
+    if not event:
         return []
-    users = []
-    userlist = []
-    projects = set([p.id for p in event.projects])
-    # TODO: slow; how about actual membership?
-    activities = Activity.query.filter(
-        and_(Activity.name == "star", Activity.project_id.in_(projects))
-    ).all()
-    for a in activities:
-        if a.user and a.user.active and a.user_id not in userlist:
-            userlist.append(a.user_id)
-            users.append(a.user)
-    return sorted(users, key=lambda x: x.username)
+    return QueryEventUsers(event).all()
+
+
+def QueryEventUsers(event):
+    """Query the active users that have joined a project in this event."""
+    members = (
+        db.session.query(Activity.user_id)
+        .join(Project, Project.id == Activity.project_id)
+        .filter(Activity.name == "star")
+        .filter(Project.event_id == event.id)
+    )
+    return (
+        User.query.filter(User.active == True)  # noqa: E712
+        .filter(User.id.in_(members))
+        .order_by(User.username)
+    )
 
 
 def ProjectActivity(project, of_type, user, action=None, comments=None):
@@ -211,63 +216,206 @@ def ProjectActivity(project, of_type, user, action=None, comments=None):
         elif of_type == "unstar":
             # Not an actual activity
             if allstars.count() > 0:
+                ChangeProjectCounters(project, "star", -1)
                 allstars.first().delete()
+                # Refresh the user score
+                user.update_score()
+                user.save()
                 return True
             return False
+    ChangeProjectCounters(project, of_type)
     activity.project_score = project.score
     activity.save()
+    if of_type == "star":
+        # Refresh the user score
+        user.update_score()
+        user.save()
     # In case of an image, update the post
     if of_type == "update" and activity.content and "![" in activity.content:
         project.set_auto_image()
     return True
 
 
-def CheckPrevCommits(commit, username, since, until, prevlinks, prevdates):
-    # Check duplicates
+def ChangeProjectCounters(project, of_type, delta=1):
+    """Adjust the stored activity counters of a project, saved with the activity."""
+    counters = ["activity_count"]
+    if of_type == "star":
+        counters.append("team_count")
+    elif of_type == "boost":
+        counters.append("boost_count")
+    # Counted in SQL, so that concurrent activities do not get lost
+    db.session.execute(
+        update(Project)
+        .where(Project.id == project.id)
+        .values({
+            attr: func.coalesce(getattr(Project, attr), 0) + delta
+            for attr in counters
+        })
+        .execution_options(synchronize_session=False)
+    )
+    # Read the new values on next access
+    db.session.expire(project, counters)
+
+
+def RecountProjects(event=None, rescore=False, chunk_size=100, project_ids=None):
+    """Rebuild the stored activity counters, and optionally scores, of projects."""
+    projects = Project.query
+    if event is not None:
+        projects = projects.filter_by(event_id=event.id)
+    if project_ids is not None:
+        projects = projects.filter(Project.id.in_(project_ids))
+    projects = projects.order_by(Project.id)
+    updated = 0
+    last_id = 0
+    while True:
+        chunk = projects.filter(Project.id > last_id).limit(chunk_size).all()
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        updated += RecountChunk(chunk, rescore)
+        # One transaction per chunk
+        db.session.commit()
+    return updated
+
+
+def RecountChunk(projects, rescore=False):
+    """Rebuild the counters of a list of projects, returning how many changed."""
+    counts = Project.get_activity_counts([p.id for p in projects])
+    updated = 0
+    for project in projects:
+        c = counts.get(project.id, {})
+        changed = False
+        for attr, key in (
+            ("team_count", "people"),
+            ("activity_count", "total"),
+            ("boost_count", "boosts"),
+        ):
+            if getattr(project, attr) != c.get(key, 0):
+                setattr(project, attr, c.get(key, 0))
+                changed = True
+        if rescore:
+            project.update_null_fields()
+            score = project.calculate_score()
+            if project.score != score:
+                project.score = score
+                changed = True
+        if changed:
+            updated += 1
+    return updated
+
+
+def RescoreUsers(chunk_size=100, user_ids=None):
+    """Recalculate the cached scores of all users, or only of the given ones."""
+    users = User.query.order_by(User.id)
+    if user_ids is not None:
+        users = users.filter(User.id.in_(user_ids))
+    updated = 0
+    last_id = 0
+    while True:
+        chunk = users.filter(User.id > last_id).limit(chunk_size).all()
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        totals = User.get_project_totals([u.id for u in chunk])
+        for user in chunk:
+            score = user.calculate_score(totals.get(user.id, 0))
+            if user.score != score:
+                user.score = score
+                updated += 1
+        # One transaction per chunk
+        db.session.commit()
+    return updated
+
+
+def CommitTime(date):
+    """Round a time to the second in UTC, as some databases drop the zone."""
+    if date.tzinfo:
+        date = date.astimezone(UTC).replace(tzinfo=None)
+    return date.replace(microsecond=0)
+
+
+def CheckPrevCommits(commit, since, until, prevlinks, prevdates):
+    """Check that a commit is new, and within the time of the event."""
     if "url" in commit and commit["url"] is not None:
         if commit["url"] in prevlinks:
-            return None
-    if commit["date"].replace(microsecond=0) in prevdates:
-        return None
+            return False
+    if CommitTime(commit["date"]) in prevdates:
+        return False
     if commit["date"] < since or commit["date"] > until:
-        return None
-    # Get message and author
-    message = commit["message"]
-    if username != commit["author"]:
-        username = commit["author"]
-        user = User.query.filter_by(username=username).first()
-        if user is None:
-            message += " (@%s)" % username or "git"
-    return message
-
-
-def SyncCommitData(project, commits):
-    """Collect data for syncing a project from a remote site."""
+        return False
+    return True
+
+
+def GetCommitAuthors(entries):
+    """Look up the users matching the authors of commits, all at once."""
+    authors = set([e["author"] for e in entries if e.get("author")])
+    if not authors:
+        return {}
+    return {
+        u.username: u.id
+        for u in db.session.query(User.id, User.username)
+        .filter(User.username.in_(authors))
+    }
+
+
+def InsertCommits(project, entries, users):
+    """Save commits as activities in one bulk insert, returning how many."""
+    rows = []
+    for entry in entries:
+        message = entry["message"]
+        user_id = users.get(entry.get("author"))
+        if user_id is None:
+            message += " (@%s)" % (entry.get("author") or "git")
+        rows.append({
+            "name": "update",
+            "action": "commit",
+            "project_id": project.id,
+            "user_id": user_id,
+            "timestamp": entry["date"],
+            "content": message,
+            "ref_url": entry.get("url"),
+        })
+    db.session.execute(insert(Activity), rows)
+    ChangeProjectCounters(project, "update", len(rows))
+    db.session.add(project)
+    return len(rows)
+
+
+def SyncCommitData(project, commits, commit=True):
+    """Collect data for syncing a project from a remote site.
+
+    New commits are saved in one bulk insert, and the counts of inserted
+    and skipped commits are returned.
+    """
+    counts = {"inserted": 0, "skipped": len(commits)}
     if project.event is None or len(commits) == 0:
-        return
-    prevactivities = Activity.query.filter_by(
-        name="update", action="commit", project_id=project.id
-    ).all()
-    prevdates = [a.timestamp.replace(microsecond=0) for a in prevactivities]
-    prevlinks = [a.ref_url for a in prevactivities]
-    username = None
-    user = None
+        return counts
+    prevactivities = db.session.query(Activity.timestamp, Activity.ref_url) \
+        .filter_by(name="update", action="commit", project_id=project.id)
+    prevdates = set()
+    prevlinks = set()
+    for a in prevactivities:
+        prevdates.add(CommitTime(a.timestamp))
+        prevlinks.add(a.ref_url)
     since = project.event.starts_at_tz
     until = project.event.ends_at_tz
-    for commit in commits:
-        message = CheckPrevCommits(commit, username, since, until, prevlinks, prevdates)
-        if message is None:
+    entries = []
+    for entry in commits:
+        if not CheckPrevCommits(entry, since, until, prevlinks, prevdates):
             continue
-        # Create object
-        activity = Activity(
-            name="update",
-            action="commit",
-            project_id=project.id,
-            timestamp=commit["date"],
-            content=message,
-        )
-        if "url" in commit and commit["url"] is not None:
-            activity.ref_url = commit["url"]
-        if user is not None:
-            activity.user_id = user.id
-        activity.save()
+        # Also skip duplicates within the same batch
+        prevdates.add(CommitTime(entry["date"]))
+        if entry.get("url") is not None:
+            prevlinks.add(entry["url"])
+        entries.append(entry)
+    if not entries:
+        return counts
+    inserted = InsertCommits(project, entries, GetCommitAuthors(entries))
+    if commit:
+        db.session.commit()
+    counts["inserted"] = inserted
+    counts["skipped"] = len(commits) - inserted
+    current_app.logger.info(
+        "Synced commits of project %d: %d new, %d skipped",
+        project.id, counts["inserted"], counts["skipped"])
+    return counts
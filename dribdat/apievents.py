@@ -4,11 +4,7 @@
 from .git import clone_repo, get_git_log
 from flask import current_app
 from dateutil import parser
-import shutil
-import requests
-
-# In seconds, how long to wait for API response
-REQUEST_TIMEOUT = 10
+from . import httpclient
 
 
 def fetch_commits(url):
@@ -17,7 +13,6 @@ def fetch_commits(url):
     if not repo_path:
         return []
     commits = get_git_log(repo_path)
-    shutil.rmtree(repo_path)
     commitlog = []
     for commit in commits:
         # construct commit url from base url
@@ -39,7 +34,7 @@ def fetch_commits_codeberg(full_name, limit=10):
         full_name,
         limit,
     )
-    data = requests.get(apiurl, timeout=REQUEST_TIMEOUT)
+    data = httpclient.get_cached(apiurl)
     if data.status_code != 200:
         current_app.logger.warning("Could not sync codeberg commits on %s" % full_name)
         return []
@@ -79,7 +74,7 @@ def fetch_commits_github(full_name, since=None, until=None):
         apiurl += "&since=%s" % since.replace(microsecond=0).isoformat()
     if until is not None:
         apiurl += "&until=%s" % until.replace(microsecond=0).isoformat()
-    data = requests.get(apiurl, timeout=REQUEST_TIMEOUT)
+    data = httpclient.get_cached(apiurl)
     if data.status_code != 200:
         current_app.logger.warning("Could not sync GitHub commits on %s" % full_name)
         return []
@@ -133,7 +128,7 @@ def fetch_commits_gitlab(project_id: int, since=None, until=None):
     if until is not None:
         apiurl += "&until=%s" % until.replace(microsecond=0).isoformat()
     # Collect basic data
-    data = requests.get(apiurl, timeout=REQUEST_TIMEOUT)
+    data = httpclient.get_cached(apiurl)
     if data.text.find("{") < 0:
         return []
     json = data.json()
@@ -7,9 +7,9 @@ from base64 import b64decode
 from bleach.sanitizer import ALLOWED_ATTRIBUTES
 from urllib.parse import quote_plus
 import huggingface_hub
-import shutil
 import requests
 import bleach
+from . import httpclient
 from .apievents import (
     fetch_commits,
     fetch_commits_gitlab,
@@ -32,9 +32,6 @@ from future.standard_library import install_aliases
 
 install_aliases()
 
-# In seconds, how long to wait for API response
-REQUEST_TIMEOUT = 10
-
 
 def FetchStageConfig(url, top_element="stages", by_col="name"):
     """Download a remote YAML stages configuration."""
@@ -44,7 +41,7 @@ def FetchStageConfig(url, top_element="stages", by_col="name"):
         return load_yaml_presets(top_element, by_col, url)
     if current_app:
         current_app.logger.info("Loading stages from URL")
-    data = requests.get(url, timeout=REQUEST_TIMEOUT)
+    data = httpclient.get(url)
     if data.text.find("stages:") < 0:
         if current_app:
             current_app.logger.debug("No stage data: %s", data.text)
@@ -62,7 +59,7 @@ def FetchCodebergProject(project_url, with_history):
     api_content = api_repos + "/contents"
     # Collect basic data
     current_app.logger.info("Fetching Codeberg: %s", url_q)
-    data = requests.get(api_repos, timeout=REQUEST_TIMEOUT)
+    data = httpclient.get_cached(api_repos)
     if data.text.find("{") < 0:
         current_app.logger.debug("No data: %s", data.text)
         return {}
@@ -71,14 +68,14 @@ def FetchCodebergProject(project_url, with_history):
         current_app.logger.debug("Invalid data: %s", data.text)
         return {}
     # Collect the README
-    data = requests.get(api_content, timeout=REQUEST_TIMEOUT)
+    data = httpclient.get_cached(api_content)
     readme = ""
     if not data.text.find("{") < 0:
         readmeurl = None
         for repo_file in data.json():
             if "readme" in repo_file["name"].lower():
                 readmeurl = repo_file["download_url"]
-                readmedata = requests.get(readmeurl, timeout=REQUEST_TIMEOUT)
+                readmedata = httpclient.get_cached(readmeurl)
                 readme = readmedata.text
                 break
         if readmeurl is None:
@@ -114,11 +111,10 @@ def FetchGitProject(url, with_commits):
     if not content:
         content = get_file_content(repo_path, "README")
 
-    # Clone the repo to get commit history
+    # Read the commit history from the mirror
     commits = []
     if with_commits:
         commits = get_git_log(repo_path)
-    shutil.rmtree(repo_path)
 
     # Parse the repo name from URL
     repo_name = url.split("/")[-1].replace(".git", "")
@@ -162,7 +158,7 @@ def FetchHuggingFaceProject(project_url, with_commits=False):
         if readme_filename:
             readme_url = huggingface_hub.hf_hub_url(project_url, readme_filename)
             try:
-                readme = requests.get(readme_url, timeout=REQUEST_TIMEOUT).text
+                readme = httpclient.get(readme_url).text
             except requests.exceptions.RequestException as e:
                 current_app.logger.warning("Could not fetch README: %s", e)
 
@@ -174,7 +170,6 @@ def FetchHuggingFaceProject(project_url, with_commits=False):
         repo_path = clone_repo(clone_url)
         if repo_path:
             commits = get_git_log(repo_path)
-            shutil.rmtree(repo_path)
 
     return {
         "type": "Hugging Face",
@@ -195,7 +190,7 @@ def FetchGitlabProject(project_url, with_commits):
     current_app.logger.info("Fetching GitLab: %s" % project_url)
     # Collect basic data
     url_q = quote_plus(project_url)
-    data = requests.get(API_BASE % url_q, timeout=REQUEST_TIMEOUT)
+    data = httpclient.get_cached(API_BASE % url_q)
     if data.text.find("{") < 0:
         current_app.logger.debug("No data: %s", data.text)
         return {}
@@ -206,7 +201,7 @@ def FetchGitlabProject(project_url, with_commits):
     # Collect the README
     readmeurl = json["readme_url"] + "?inline=false"
     readmeurl = readmeurl.replace("-/blob/", "-/raw/")
-    readmedata = requests.get(readmeurl, timeout=REQUEST_TIMEOUT)
+    readmedata = httpclient.get_cached(readmeurl)
     readme = readmedata.text or ""
     # Collect the history
     commits = []
@@ -227,7 +222,7 @@ def FetchGitlabProject(project_url, with_commits):
 def FetchGitlabAvatar(email):
     """Download a user avatar from GitLab."""
     apiurl = "https://gitlab.com/api/v4/avatar?email=%s&size=80"
-    data = requests.get(apiurl % email, timeout=REQUEST_TIMEOUT)
+    data = httpclient.get(apiurl % email)
     if data.text.find("{") < 0:
         current_app.logger.debug("No data: %s", data.text)
         return None
@@ -241,7 +236,7 @@ def FetchGithubProject(project_url, with_commits):
     """Download data from GitHub."""
     API_BASE = "https://api.github.com/repos/%s"
     current_app.logger.info("Fetching GitHub: %s", project_url)
-    data = requests.get(API_BASE % project_url, timeout=REQUEST_TIMEOUT)
+    data = httpclient.get_cached(API_BASE % project_url)
     if data.text.find("{") < 0:
         current_app.logger.debug("No data: %s", data.text)
         return {}
@@ -252,7 +247,7 @@ def FetchGithubProject(project_url, with_commits):
     repo_full_name = json["full_name"]
     default_branch = json["default_branch"] or "main"
     readmeurl = "%s/readme" % (API_BASE % project_url)
-    readmedata = requests.get(readmeurl, timeout=REQUEST_TIMEOUT)
+    readmedata = httpclient.get_cached(readmeurl)
     readme = ""
     if readmedata.text.find("{") < 0:
         current_app.logger.debug("No readme: %s", data.text)
@@ -289,7 +284,7 @@ def FetchGithubIssue(project_url, issue_id):
     project_data = FetchGithubProject(project_url)
     current_app.logger.info("Fetching GitHub Issue: %s", issue_id)
     API_BASE = "https://api.github.com/repos/%s/issues/%d"
-    data = requests.get(API_BASE % (project_url, issue_id), timeout=REQUEST_TIMEOUT)
+    data = httpclient.get_cached(API_BASE % (project_url, issue_id))
     if data.text.find("{") < 0:
         current_app.logger.debug("No data: %s", data.text)
         return {}
@@ -309,7 +304,7 @@ def FetchDataProject(datapackage_url):
     # TODO: use frictionlessdata library!
     project_url = datapackage_url.replace("datapackage.json", "")
     project_url = sanitize_url(project_url) + "datapackage.json"
-    data = requests.get(project_url, timeout=REQUEST_TIMEOUT)
+    data = httpclient.get(project_url)
     # TODO: treat dribdat events as special
     current_app.logger.info("Fetching Data Package: %s", project_url)
     if data.text.find("{") < 0:
@@ -371,7 +366,7 @@ def FetchDribdatProject(dribdat_url):
     """Try to load a Dribdat project from a remote page."""
     project_url = dribdat_url.replace("/project/", "/api/project/")
     project_url = sanitize_url(project_url) + "?full=1"
-    data = requests.get(project_url, timeout=REQUEST_TIMEOUT)
+    data = httpclient.get(project_url)
     # TODO: treat dribdat events as special
     current_app.logger.info("Fetching Dribdat site: %s", project_url)
     if data.text.find("{") < 0:
@@ -438,7 +433,7 @@ def RequestRemoteContent(project_url):
         # fetch remote content.
         project_url = sanitize_url(project_url)
         current_app.logger.info("Fetching: %s", project_url)
-        data = requests.get(project_url, timeout=REQUEST_TIMEOUT)
+        data = httpclient.get(project_url)
         return data.text or None
     except requests.exceptions.RequestException:
         current_app.logger.warning("Could not connect to %s" % project_url)
@@ -562,7 +557,7 @@ def FetchWebEtherpad(text, url):
     ptitle = url.split("/")[-1]
     if len(ptitle) < 1:
         return {}
-    text_content = requests.get("%s/export/txt" % url, timeout=REQUEST_TIMEOUT).text
+    text_content = httpclient.get("%s/export/txt" % url).text
     obj = {}
     obj["type"] = "Etherpad"
     obj["name"] = ptitle.replace("_", " ")
@@ -595,7 +590,7 @@ def FetchWebGitHub(url):
         return {}
     filename = url.split("/")[-1].replace(".md", "")
     rawurl = url.replace("/blob/", "/raw/").replace("https://github.com/", "")
-    rawdata = requests.get("https://github.com/" + rawurl, timeout=REQUEST_TIMEOUT)
+    rawdata = httpclient.get("https://github.com/" + rawurl)
     text_content = rawdata.text or ""
     return {
         "type": "Markdown",
@@ -609,9 +604,8 @@ def FetchWebGitHub(url):
 def FetchWebGitHubGist(url):
     """Grab a Markdown source from a GitHub Gist link."""
     rawurl = url.replace("https://gist.github.com/", "") + "/raw"
-    rawdata = requests.get(
-        "https://gist.githubusercontent.com/" + rawurl, timeout=REQUEST_TIMEOUT
-    )
+    rawdata = httpclient.get(
+        "https://gist.githubusercontent.com/" + rawurl)
     text_content = rawdata.text or ""
     return {
         "type": "Markdown",
@@ -671,7 +665,7 @@ def FetchWebPretalx(text, url):
         return {}
     doc = pq(text)
     apiurl = doc('link[@rel="alternate"]').attr("href")
-    rawdata = requests.get(str(apiurl) + "?format=json", timeout=REQUEST_TIMEOUT)
+    rawdata = httpclient.get(str(apiurl) + "?format=json")
     if rawdata.text.find("{") < 0:
         return {}
     jsondata = rawdata.json()
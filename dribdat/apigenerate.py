@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 """Connect to generative A.I. tools."""
 
-import requests
 import json
 from json.decoder import JSONDecodeError
 from flask import current_app
 from .user.models import Project
+from .database import db
+from .aggregation import ProjectActivity
+from .caching import invalidate_project
+from .jobs import JobError, task
+from . import httpclient
 
 # In seconds, how long to wait for API response
 REQUEST_TIMEOUT = 30
@@ -158,6 +162,22 @@ def gen_project_post(project: Project, as_boost: bool = False):
     return gen_openai(prompt)
 
 
+@task("autopost")
+def autopost_job(job, project_id, as_boost=False):
+    """Generate a project post, and save it in the project log."""
+    project = db.session.get(Project, project_id)
+    if project is None:
+        raise JobError("The project no longer exists.")
+    autopost = gen_project_post(project, as_boost)
+    if not autopost:
+        raise RuntimeError("AI service is currently not available.")
+    ProjectActivity(project, "review", job.user, action="auto", comments=autopost)
+    invalidate_project(project)
+    if as_boost:
+        return "The robots have judged"
+    return "The robots have spoken 🤖"
+
+
 def gen_openai(prompt: str):
     """Request data from a text-completion API."""
     logging = current_app.logger
@@ -181,7 +201,7 @@ def gen_openai(prompt: str):
             llm_base_url = "/".join([llm_base_url, "chat", "completions"])
         logging.info(f"Dialling up remote LLM for {llm_model}")
         # Start a JSON POST
-        r = requests.post(
+        r = httpclient.post(
             f"{llm_base_url}",
             headers={
                 "Content-Type": "application/json",
@@ -196,6 +216,7 @@ def gen_openai(prompt: str):
                     ],
                 }
             ),
+            timeout=REQUEST_TIMEOUT,
         )
         try:
             j = r.json()
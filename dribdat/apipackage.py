@@ -13,6 +13,8 @@ from flask import current_app
 from frictionless import Package, Resource
 from .user.models import Event, Project, Activity, Category, User, Role
 from .utils import format_date
+from . import httpclient
+from .aggregation import ChangeProjectCounters
 from .apiutils import (
     get_project_list,
     get_event_users,
@@ -21,9 +23,6 @@ from .apiutils import (
 )
 from dribdat.futures import UTC
 
-# In seconds, how long to wait for API response
-REQUEST_TIMEOUT = 10
-
 
 def event_to_data_package(event, author=None, host_url="", full_content=False):
     """Create a Data Package from the data of an event."""
@@ -168,6 +167,7 @@ def import_users_data(data, dry_run=False):
         user.set_from_data(usr)
         import_user_roles(user, usr["roles"], dry_run)
         if not dry_run:
+            user.update_skills()
             user.save()
         updates.append(user.data)
     return updates
@@ -258,6 +258,7 @@ def import_activities(data, dry_run=False):
         activity = Activity(aname, proj.id)
         activity.set_from_data(act)
         if not dry_run:
+            ChangeProjectCounters(proj, aname)
             activity.save()
         updates.append(activity.data)
     return updates
@@ -298,7 +299,7 @@ def fetch_datapackage(url, dry_run=False, all_data=False):
         current_app.logger.error("Invalid URL: %s", url)
         return {}
     try:
-        data = requests.get(url, timeout=REQUEST_TIMEOUT).json()
+        data = httpclient.get(url).json()
         return import_event_package(data, dry_run, all_data)
     except json.decoder.JSONDecodeError:
         return {"errors": ["Could not load package due to JSON error"]}
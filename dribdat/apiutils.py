@@ -8,12 +8,14 @@ import json
 
 from datetime import datetime
 
-from dribdat.user.models import Event, Project, Category, Activity
-from dribdat.utils import format_date
-from .aggregation import GetEventUsers
+from flask import current_app
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import joinedload
 
-from sys import version_info
-PY3 = version_info[0] == 3
+from dribdat.user.models import Event, Project, Category, Activity, User
+from dribdat.database import db
+from dribdat.utils import format_date
+from .aggregation import GetEventUsers, QueryEventUsers
 
 
 def get_projects_by_event(event_id):
@@ -27,6 +29,20 @@ def get_projects_by_event(event_id):
 
 def get_event_activities(event_id=None, limit=50, q=None, action=None):
     """Fetch activities of a given event."""
+    return [a.data for a in query_event_activities(event_id, limit, q, action)]
+
+
+def iter_event_activities(event_id=None, limit=50, q=None, action=None,
+                          chunk_size=100):
+    """Generate activity data of a given event, a few rows at a time."""
+    query = query_event_activities(event_id, limit, q, action) \
+        .options(joinedload(Activity.user), joinedload(Activity.project))
+    for a in query.yield_per(chunk_size):
+        yield a.data
+
+
+def query_event_activities(event_id=None, limit=50, q=None, action=None):
+    """Query activities of a given event, most recent first."""
     if event_id is not None:
         event = Event.query.filter_by(id=event_id).first_or_404()
         query = Activity.query \
@@ -39,8 +55,7 @@ def get_event_activities(event_id=None, limit=50, q=None, action=None):
         query = query.filter(Activity.content.like(q))
     if action is not None:
         query = query.filter(Activity.action == action)
-    results = query.order_by(Activity.id.desc()).limit(limit).all()
-    return [a.data for a in results]
+    return query.order_by(Activity.id.desc()).limit(limit)
 
 
 def get_event_categories(event_id=None):
@@ -82,30 +97,94 @@ def get_event_users(event, full_data=False):
 # TODO: combine with function above
 def get_users_for_event(event=None, with_score=False):
     """Collect full user data for a particular event, optionally with the user scores."""
-    if event is None: return []
-    userlist = []
-    for u in GetEventUsers(event):
-         # with_challenges=True, limit=-1, event=None
-        udata = u.data
-        pnames = [ p.name for p in u.joined_projects(True, -1, event) ]
-        udata['teams'] = ', '.join(pnames)
-        if with_score:
-            udata['score'] = u.get_score()
-        userlist.append(udata)
-    return userlist
+    return list(iter_users_for_event(event, with_score))
+
+
+def iter_users_for_event(event=None, with_score=False, chunk_size=100):
+    """Generate full user data for a particular event, a chunk of users at a time."""
+    if event is None:
+        return
+    result = db.session.scalars(
+        QueryEventUsers(event).statement,
+        execution_options={"yield_per": chunk_size})
+    for chunk in result.partitions():
+        # with_challenges=True, limit=-1, event=event
+        joined = User.get_joined_projects([u.id for u in chunk], True, -1, event)
+        for u in chunk:
+            udata = u.data
+            pnames = [ p.name for p in joined.get(u.id, []) ]
+            udata['teams'] = ', '.join(pnames)
+            if with_score:
+                udata['score'] = u.get_score()
+            yield udata
+
+
+def get_projects_teams(projects):
+    """Collect the team members of projects, in the order of Project.get_team.
+
+    Also returns the events and categories of the projects, which stay in the
+    session only as long as they are referenced.
+    """
+    stars = (
+        db.session.query(Activity.project_id, Activity.user_id)
+        .filter(Activity.name == "star")
+        .filter(Activity.project_id.in_([p.id for p in projects]))
+        .order_by(Activity.id)
+        .all()
+    )
+    user_ids = set([a.user_id for a in stars if a.user_id])
+    user_ids.update([p.user_id for p in projects if p.user_id])
+    event_ids = set([p.event_id for p in projects if p.event_id])
+    category_ids = set([p.category_id for p in projects if p.category_id])
+    # Keep related objects loaded, so that relationships find them in session
+    users = {}
+    preloaded = []
+    if user_ids:
+        users = {u.id: u for u in User.query.filter(User.id.in_(user_ids))}
+    if event_ids:
+        preloaded.extend(Event.query.filter(Event.id.in_(event_ids)).all())
+    if category_ids:
+        preloaded.extend(Category.query.filter(Category.id.in_(category_ids)).all())
+    teams = {}
+    for a in stars:
+        if a.user_id in users:
+            teams.setdefault(a.project_id, []).append(users[a.user_id])
+    for project in projects:
+        members = []
+        if project.user_id in users:
+            members.append(users[project.user_id])
+        for u in teams.get(project.id, []):
+            if u not in members:
+                members.append(u)
+        teams[project.id] = members
+    return teams, preloaded
+
+
+def get_projects_data(projects):
+    """Serialize a list of projects, preloading related data in bulk."""
+    projects = list(projects)
+    if not projects:
+        return []
+    # Hold on to the preloaded objects while serializing
+    teams, preloaded = get_projects_teams(projects)
+    return [
+        project.get_data([u.username for u in teams[project.id]])
+        for project in projects
+    ]
 
 
 def get_project_summaries(projects, host_url, is_moar=False):
     """Collect data for each project in a list."""
     summaries = []
-    for project in projects:
-        p = project.data
+    projects = list(projects)
+    counts = Project.get_activity_counts([p.id for p in projects])
+    for project, p in zip(projects, get_projects_data(projects)):
         if is_moar:
-            p['stats'] = project.get_stats()
+            p['stats'] = project.get_stats(counts)
             p['autotext'] = project.autotext  # Markdown
             p['longtext'] = project.longtext  # Markdown - see longhtml()
         else:
-            stats = project.get_stats()
+            stats = project.get_stats(counts)
             for k in stats.keys():
                 p['stats-' + k] = stats[k]
         summaries.append(p)
@@ -116,8 +195,22 @@ def get_project_summaries(projects, host_url, is_moar=False):
 
 def get_project_list(event_id, host_url='', full_data=False):
     """Collect all projects and challenges for an event."""
-    projects = get_projects_by_event(event_id)
-    return get_project_summaries(projects, host_url, full_data)
+    return list(iter_project_list(event_id, host_url, full_data))
+
+
+def iter_project_list(event_id, host_url='', full_data=False, chunk_size=100):
+    """Generate project summaries for an event, a chunk of projects at a time."""
+    # Same order as sorting the summaries by score
+    projects = get_projects_by_event(event_id).order_by(None).order_by(
+        func.coalesce(Project.score, 0).desc(),
+        Project.progress.desc(),
+        Project.name,
+    )
+    result = db.session.scalars(
+        projects.statement, execution_options={"yield_per": chunk_size})
+    for chunk in result.partitions():
+        for p in get_project_summaries(chunk, host_url, full_data):
+            yield p
 
 
 def expand_project_urls(projects, host_url):
@@ -149,42 +242,158 @@ def get_schema_for_user_projects(user, host_url):
     return my_schema
 
 
+def get_row_values(obj):
+    """Return the column values of a database object."""
+    return tuple(getattr(obj, c.key) for c in obj.__mapper__.column_attrs)
+
+
+def get_activities_summary(*criteria):
+    """Count activities matching some criteria, with the latest id and time."""
+    return tuple(db.session.query(
+        func.count(Activity.id),
+        func.max(Activity.id),
+        func.max(Activity.timestamp),
+    ).filter(*criteria).one())
+
+
+def get_projects_summary(*criteria):
+    """Summarize the projects matching some criteria, to detect changes."""
+    return tuple(db.session.query(
+        func.count(Project.id),
+        func.max(Project.updated_at),
+        func.sum(func.coalesce(Project.score, 0)),
+        func.sum(func.coalesce(Project.progress, 0)),
+        func.sum(case((Project.is_hidden == True, 1), else_=0)),  # noqa: E712
+    ).filter(*criteria).one())
+
+
+def latest_of(*timestamps):
+    """Return the most recent of a few (possibly empty) timestamps."""
+    found = [t for t in timestamps if t is not None]
+    return max(found) if found else None
+
+
+def event_validators(event_id, **kwargs):
+    """Fingerprint of an event with its projects, for conditional requests."""
+    event = db.session.get(Event, event_id)
+    if event is None:
+        return None
+    fingerprint = (
+        get_row_values(event),
+        get_projects_summary(Project.event_id == event.id),
+        # Scores and stats of the projects follow from their activities
+        get_activities_summary(Activity.project_id.in_(
+            select(Project.id).where(Project.event_id == event.id))),
+    )
+    return fingerprint, None
+
+
+def project_validators(project_id, **kwargs):
+    """Fingerprint of a project with its activities, for conditional requests."""
+    project = db.session.get(Project, project_id)
+    if project is None:
+        return None
+    fingerprint = (
+        get_row_values(project),
+        project.event and get_row_values(project.event),
+        get_activities_summary(Activity.project_id == project.id),
+    )
+    return fingerprint, None
+
+
+def query_latest_activity(*criteria):
+    """Query the latest activity id and time, which are read from indexes."""
+    return db.session.query(
+        func.max(Activity.id),
+        func.max(Activity.timestamp),
+    ).filter(*criteria)
+
+
+def activity_validators(event_id=None, **kwargs):
+    """Fingerprint and time of the latest activities, for conditional requests."""
+    if event_id is None:
+        latest = tuple(query_latest_activity().one())
+        return latest, latest[1]
+    # The dates of the event select its activities, and have no timestamp
+    event = db.session.get(Event, event_id)
+    if event is None:
+        return None
+    latest = tuple(query_latest_activity(
+        Activity.timestamp >= event.starts_at,
+        Activity.timestamp <= event.ends_at,
+    ).one())
+    return latest + (get_row_values(event),), None
+
+
+def user_validators(username, **kwargs):
+    """Fingerprint and time of the latest posts of a user, for conditional requests."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        return None
+    activities = get_activities_summary(Activity.user_id == user.id)
+    fingerprint = (user.name, activities)
+    return fingerprint, latest_of(activities[2], user.updated_at)
+
+
+def gen_json(key, rows, extra=None):
+    """Generate a JSON object with a list of rows, one row at a time."""
+    dumps = current_app.json.dumps
+    yield '{%s: [' % dumps(key)
+    for i, row in enumerate(rows):
+        yield (',' if i else '') + dumps(row)
+    yield ']'
+    # Extra values are read after the rows, and may be filled in by them
+    for k, v in (extra or {}).items():
+        yield ', %s: %s' % (dumps(k), dumps(v))
+    yield '}'
+
+
+def gen_ndjson(rows):
+    """Generate newline delimited JSON, one row per line."""
+    dumps = current_app.json.dumps
+    for row in rows:
+        yield dumps(row) + '\n'
+
+
+def gen_row(values):
+    """Format the values of a row for CSV output."""
+    rkline = []
+    for line in values:
+        if line is None:
+            rkline.append("")
+        elif isinstance(line, (int, float, datetime, str)):
+            rkline.append(str(line))
+        elif isinstance(line, (dict)):
+            rkline.append(json.dumps(line))
+        else:
+            rkline.append(line.encode('utf-8'))
+    return rkline
+
+
 def gen_rows(csvdata):
     """Generate rows from data."""
-    rkrows = []
-    headerline = list(csvdata[0].keys())
-    rkrows.append(headerline)
+    rkrows = [list(csvdata[0].keys())]
     for rk in csvdata:
-        rkline = []
-        for line in rk.values():
-            if line is None:
-                rkline.append("")
-            elif isinstance(line, (int, float, datetime, str)):
-                rkline.append(str(line))
-            elif isinstance(line, (dict)):
-                rkline.append(json.dumps(line))
-            else:
-                rkline.append(line.encode('utf-8'))
-        rkrows.append(rkline)
+        rkrows.append(gen_row(rk.values()))
     return rkrows
 
 
+def iter_csv(csvdata):
+    """Generate a CSV file from data rows, one line at a time."""
+    output = io.StringIO()
+    writer = csv.writer(output, quoting=csv.QUOTE_NONNUMERIC)
+    for i, rk in enumerate(csvdata):
+        if i == 0:
+            writer.writerow(list(rk.keys()))
+        writer.writerow(gen_row(rk.values()))
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+
+
 def gen_csv(csvdata):
     """Generate a CSV file from data rows."""
-    if len(csvdata) < 1:
-        return ""
-    rowdata = gen_rows(csvdata)
-    headerline = rowdata[0]
-    if PY3:
-        output = io.StringIO()
-    else:
-        output = io.BytesIO()
-        headerline = [ln.encode('utf-8') for ln in headerline]
-    writer = csv.writer(output, quoting=csv.QUOTE_NONNUMERIC)
-    writer.writerow(headerline)
-    for rk in rowdata[1:]:
-        writer.writerow(rk)
-    return output.getvalue()
+    return ''.join(iter_csv(csvdata))
 
 
 def event_upload_configuration(import_level='test'):
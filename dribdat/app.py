@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 """The app module, containing the app factory function."""
 
-from flask import Flask, render_template
+from functools import partial
+
+from flask import Flask, render_template, request, has_request_context
 from flask_cors import CORS
 from flask_mailman import Mail
 from flask_talisman import Talisman
@@ -20,8 +22,12 @@ from dribdat.extensions import (
     migrate,
 )
 from dribdat.settings import ProdConfig  # noqa: I005
-from dribdat.utils import timesince, markdownit
-from dribdat.onebox import make_oembedplus
+from dribdat.utils import timesince, markdownit, MARKDOWN_CONFIG
+from dribdat.onebox import linked_project_tags, make_oembedplus
+from dribdat.boxout.datapackage import DATAPACKAGE_LOADING
+from dribdat.caching import tag_versions, RenderCache
+# Modules which define the tasks of background jobs
+from dribdat import autosync, apigenerate, mailer  # noqa: F401
 from pytz import timezone
 import logging
 
@@ -149,17 +155,36 @@ def register_commands(app):
 def register_filters(app):
     """Register filters for templates."""
 
-    # Conversion of Markdown to HTML
+    # Conversion of Markdown to HTML, memoized by content
+    app.markdown_cache = RenderCache("markdown", markdownit, MARKDOWN_CONFIG)
+
     @app.template_filter()
     def markdown(value):
-        return markdownit(value)
+        return app.markdown_cache(value)
 
     # Registration of handlers for micawber
     app.oembed_providers = bootstrap_basic()
 
+    # Boxes include remote and project data, so they are refreshed in time
+    onebox_params = dict(maxwidth=600, maxheight=400)
+    app.onebox_cache = RenderCache(
+        "onebox",
+        partial(make_oembedplus, oembed_providers=app.oembed_providers, **onebox_params),
+        sorted(onebox_params.items()),
+        timeout=app.config.get("CACHE_DEFAULT_TIMEOUT", 300),
+        # Keep rendering until boxes loading in the background are ready
+        cacheable=lambda html: DATAPACKAGE_LOADING not in html,
+    )
+
     @app.template_filter()
     def onebox(value):
-        return make_oembedplus(value, app.oembed_providers, maxwidth=600, maxheight=400)
+        if not isinstance(value, str):
+            return app.onebox_cache(value)
+        # Links to projects on this server depend on the host name, and the
+        # boxes are rendered again when a linked project is changed
+        host_url = request.host_url if has_request_context() else ""
+        return app.onebox_cache(
+            value, host_url, tag_versions(*linked_project_tags(value)))
 
     # Timezone helper
     app.tz = timezone(app.config["TIME_ZONE"] or "UTC")
@@ -167,6 +192,9 @@ def register_filters(app):
     # Lambda filters for safe image_url's
     app.jinja_env.filters["quote_plus"] = lambda u: quote_plus(u or "", ":/?&=")
 
+    # Versions of cache tags, to vary cached fragments on
+    app.jinja_env.globals["cache_version"] = tag_versions
+
     # Custom filters
     @app.template_filter()
     def since_date(value):
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""Syncing many projects with their remote sources at once."""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from hashlib import sha1
+from json import dumps
+from random import uniform
+from threading import BoundedSemaphore
+from time import monotonic, sleep
+from urllib.parse import urlparse
+
+from flask import current_app
+from sqlalchemy import case, func, or_
+
+from dribdat.database import db
+from dribdat.api.parser import GetProjectData
+from dribdat.aggregation import SyncProjectData, ProjectActivity
+from dribdat.caching import invalidate_event, invalidate_project
+from dribdat.jobs import JobError, report_progress, task
+from dribdat.futures import UTC
+from dribdat.user.models import Event, Project, ProjectSync
+
+# How many projects to fetch at once, and from the same host
+SYNC_WORKERS = 8
+SYNC_PER_HOST = 2
+# How many synced projects to save per transaction
+SYNC_BATCH_SIZE = 20
+
+# Defaults of the scheduler, which can be changed in the app configuration:
+# seconds between syncs of a project, and syncs per minute across all hosts
+AUTOSYNC_MIN_INTERVAL = 15 * 60
+AUTOSYNC_MAX_INTERVAL = 24 * 60 * 60
+AUTOSYNC_PER_MINUTE = 30
+
+
+class SyncJob(object):
+    """Progress and outcome of syncing a set of projects."""
+
+    def __init__(self, on_progress=None):
+        self.total = 0
+        self.done = 0
+        self.synced = []
+        self.failed = []
+        self.on_progress = on_progress
+
+    def handle(self, project, data):
+        """Save the fetched data of a project, returning whether there is any."""
+        if "name" not in data or not self.save(project, data):
+            self.advance(project, False)
+            return False
+        self.advance(project, True)
+        return True
+
+    def save(self, project, data):
+        """Save the changes of a project, without holding up the others on errors.
+
+        Changes are saved in a transaction of their own, so that an error only
+        undoes this project, while its schedule can still be updated.
+        """
+        db.session.commit()
+        try:
+            SyncProjectData(project, data)
+        except Exception as e:  # noqa: B902
+            db.session.rollback()
+            current_app.logger.warning(
+                "Could not save <%s>: %s", project.autotext_url, e)
+            return False
+        return True
+
+    def start(self, total):
+        self.total = total
+        self.report()
+
+    def advance(self, project, success):
+        self.done += 1
+        if success:
+            self.synced.append(project)
+        else:
+            self.failed.append(project)
+        self.report()
+
+    def report(self):
+        if self.on_progress is not None:
+            self.on_progress(self)
+
+    @property
+    def progress(self):
+        """Share of the projects which have been processed."""
+        if not self.total:
+            return 1.0
+        return self.done / self.total
+
+    @property
+    def data(self):
+        return {
+            "total": self.total,
+            "done": self.done,
+            "synced": len(self.synced),
+            "failed": [p.name for p in self.failed],
+        }
+
+
+def fetch_project_data(app, url, limit):
+    """Collect the remote data of a project, within the limit of its host."""
+    with app.app_context():
+        with limit:
+            try:
+                return GetProjectData(url, True)
+            except Exception as e:  # noqa: B902
+                app.logger.warning("Could not sync <%s>: %s", url, e)
+                return {}
+
+
+def sync_projects(projects, job=None, workers=SYNC_WORKERS,
+                  per_host=SYNC_PER_HOST, batch_size=SYNC_BATCH_SIZE):
+    """Fetch remote data of projects concurrently, and save it as it comes.
+
+    Each synced project is saved on its own, while the other changes of the
+    job (such as sync schedules) are committed in batches.
+    """
+    projects = [p for p in projects if p.is_syncable]
+    job = job or SyncJob()
+    job.start(len(projects))
+    if not projects:
+        return job
+    app = current_app._get_current_object()
+    limits = defaultdict(lambda: BoundedSemaphore(per_host))
+    # Interleave the hosts, so that the workers are not all kept waiting
+    queues = defaultdict(list)
+    for project in projects:
+        queues[urlparse(project.autotext_url).hostname].append(project)
+    ordered = []
+    while any(queues.values()):
+        for host in list(queues):
+            if queues[host]:
+                ordered.append((host, queues[host].pop(0)))
+    unsaved = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                fetch_project_data, app, project.autotext_url, limits[host]
+            ): project
+            for host, project in ordered
+        }
+        # Database writes stay in this thread
+        for future in as_completed(futures):
+            if not job.handle(futures[future], future.result()):
+                continue
+            unsaved += 1
+            if unsaved >= batch_size:
+                db.session.commit()
+                unsaved = 0
+    db.session.commit()
+    return job
+
+
+@task("sync-event")
+def sync_event_job(job, event_id):
+    """Sync the projects of an event, saving the progress along the way."""
+    event = db.session.get(Event, event_id)
+    if event is None:
+        raise JobError("The event no longer exists.")
+    sync = sync_projects(
+        event.projects, SyncJob(lambda s: report_progress(job, s.progress)))
+    invalidate_event(event.id)
+    message = "%d projects synced." % len(sync.synced)
+    if sync.failed:
+        message += " Could not sync: %s" % ", ".join([p.name for p in sync.failed])
+    return message
+
+
+@task("sync-project")
+def sync_project_job(job, project_id):
+    """Sync the data of a project from its remote source."""
+    project = db.session.get(Project, project_id)
+    if project is None or not project.is_syncable:
+        raise JobError("This project is not syncable.")
+    has_autotext = project.autotext and len(project.autotext) > 1
+    data = GetProjectData(project.autotext_url, True)
+    if not data or "name" not in data:
+        raise ValueError("Could not sync: check that your README location is public.")
+    SyncProjectData(project, data)
+    invalidate_project(project)
+    if not project.autotext or len(project.autotext) < 2:
+        raise JobError("Could not sync: remote README is empty.")
+    if job.user is not None:
+        ProjectActivity(
+            project, "update", job.user,
+            action="sync", comments=str(len(project.autotext)) + " bytes")
+    if not has_autotext:
+        return "The latest data from %s has been synced." % data["type"]
+    return "Data from %s has been refreshed." % data["type"]
+
+
+def get_fingerprint(data):
+    """Identify the remote content of a project, such as its latest commits."""
+    return sha1(dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ScheduledSync(SyncJob):
+    """Syncing which adapts the schedule of each project to its changes.
+
+    Projects which change are synced again soon, while the interval doubles
+    for each sync without changes or with an error.
+    """
+
+    def __init__(self, schedules, min_interval=AUTOSYNC_MIN_INTERVAL,
+                 max_interval=AUTOSYNC_MAX_INTERVAL, on_progress=None):
+        super().__init__(on_progress)
+        self.schedules = schedules
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.changed = []
+
+    def handle(self, project, data):
+        schedule = self.schedules[project.id]
+        now = datetime.now(UTC)
+        schedule.synced_at = now
+        success = "name" in data
+        changed = False
+        if success:
+            fingerprint = get_fingerprint(data)
+            changed = fingerprint != schedule.fingerprint
+            if changed:
+                success = self.save(project, data)
+        if not success:
+            schedule.failures += 1
+            schedule.interval = self.min_interval * 2 ** schedule.failures
+        elif changed:
+            schedule.failures = 0
+            schedule.fingerprint = fingerprint
+            schedule.interval = self.min_interval
+            self.changed.append(project)
+        else:
+            schedule.failures = 0
+            schedule.interval = schedule.interval * 2
+        self.advance(project, success)
+        schedule.interval = max(
+            self.min_interval, min(schedule.interval, self.max_interval))
+        # Spread out the projects which were synced at the same time
+        schedule.next_sync_at = now + timedelta(
+            seconds=schedule.interval * uniform(0.9, 1.1))
+        return True
+
+
+def get_due_projects(limit):
+    """Return syncable projects of running events, most overdue first."""
+    now = datetime.now(UTC)
+    return (
+        Project.query
+        .join(Event, Project.event_id == Event.id)
+        .outerjoin(ProjectSync, ProjectSync.project_id == Project.id)
+        .filter(Project.is_autoupdate == True)  # noqa: E712
+        .filter(Project.is_hidden == False)  # noqa: E712
+        .filter(Project.autotext_url != None)  # noqa: E711
+        .filter(func.trim(Project.autotext_url) != "")
+        .filter(Event.starts_at <= now, Event.ends_at >= now)
+        .filter(or_(
+            ProjectSync.next_sync_at == None,  # noqa: E711
+            ProjectSync.next_sync_at <= now))
+        .order_by(
+            case((ProjectSync.next_sync_at == None, 0), else_=1),  # noqa: E711
+            ProjectSync.next_sync_at,
+            Project.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def autosync_due(per_minute=None):
+    """Sync the projects which are due, up to the budget of one minute."""
+    config = current_app.config
+    per_minute = per_minute or config.get("AUTOSYNC_PER_MINUTE", AUTOSYNC_PER_MINUTE)
+    min_interval = config.get("AUTOSYNC_MIN_INTERVAL", AUTOSYNC_MIN_INTERVAL)
+    max_interval = config.get("AUTOSYNC_MAX_INTERVAL", AUTOSYNC_MAX_INTERVAL)
+    projects = get_due_projects(per_minute)
+    schedules = {}
+    if projects:
+        schedules = {s.project_id: s for s in ProjectSync.query.filter(
+            ProjectSync.project_id.in_([p.id for p in projects]))}
+    for project in projects:
+        if project.id not in schedules:
+            schedules[project.id] = ProjectSync(
+                project_id=project.id, interval=min_interval, failures=0)
+            db.session.add(schedules[project.id])
+        if not project.is_syncable:
+            # Skipped by the sync, so check back only rarely
+            schedules[project.id].interval = max_interval
+            schedules[project.id].next_sync_at = datetime.now(UTC) + timedelta(
+                seconds=max_interval)
+    job = ScheduledSync(schedules, min_interval, max_interval)
+    sync_projects(projects, job)
+    for project in job.changed:
+        invalidate_project(project)
+    return job
+
+
+def run_scheduler(once=False):
+    """Keep syncing the projects which are due, once per minute."""
+    while True:
+        started = monotonic()
+        try:
+            job = autosync_due()
+            if job.total:
+                current_app.logger.info(
+                    "Autosync: %d changed, %d unchanged, %d failed",
+                    len(job.changed), len(job.synced) - len(job.changed),
+                    len(job.failed))
+        except Exception as e:  # noqa: B902
+            db.session.rollback()
+            current_app.logger.error("Could not autosync: %s", e)
+        db.session.remove()
+        if once:
+            return
+        sleep(max(0, 60 - (monotonic() - started)))
@@ -2,10 +2,20 @@
 
 import re
 import pystache
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
+from threading import Lock
+from time import time
 from flask import current_app
+from flask_caching.backends import NullCache
 from frictionless import Package
 
+# In seconds, how long to keep boxes, after which time they are refreshed
+DATAPACKAGE_REFRESH = 60 * 60
+DATAPACKAGE_TTL = 60 * 60 * 24 * 7
+# In seconds, how long to wait before trying a broken package again
+DATAPACKAGE_FAILED_TTL = 60 * 10
+
 TEMPLATE_PACKAGE = r"""
 <div class="boxout datapackage card mb-4" style="max-width:23em">
   <div class="card-body">
@@ -51,6 +61,17 @@ TEMPLATE_PACKAGE = r"""
 </div>
 """
 
+# Marks the placeholder of a box which is not ready
+DATAPACKAGE_LOADING = "datapackage-loading"
+TEMPLATE_PLACEHOLDER = r"""
+<div class="boxout datapackage datapackage-loading card mb-4" style="max-width:23em">
+  <div class="card-body">
+    <a href="{{url}}" download title="Get Data Package">Data Package</a>
+    <small class="text-muted">is loading ...</small>
+  </div>
+</div>
+"""
+
 dpkg_url_re = re.compile(r".*(http?s:\/\/.+datapackage\.json)\)*")
 
 
@@ -62,13 +83,67 @@ def chk_datapackage(line):
 
 
 def box_datapackage(line, cache=None):
-    """Create a OneBox for local projects."""
+    """Create a OneBox for a Data Package, which is fetched in the background."""
     m = dpkg_url_re.match(line)
     if not m:
         return None
     url = m.group(1)
-    if cache and cache.has(url):
-        return cache.get(url)
+    if not cache or isinstance(cache.cache, NullCache):
+        # Without a place to keep results, fetch while rendering
+        return render_datapackage(url)
+    entry = cache.get(cache_key(url))
+    if entry is None:
+        prefetch_datapackage(url, cache)
+        return pystache.render(TEMPLATE_PLACEHOLDER, {"url": url})
+    if entry["fetched"] + DATAPACKAGE_REFRESH < time():
+        # Serve the box we have, while getting a fresh one
+        prefetch_datapackage(url, cache)
+    return entry["box"]
+
+
+def cache_key(url):
+    """Address the cached box of a Data Package."""
+    return "datapackage-box:" + url
+
+
+# Packages being fetched, by URL
+_prefetching = {}
+_prefetch_lock = Lock()
+_executor = ThreadPoolExecutor(max_workers=2)
+
+
+def prefetch_datapackage(url, cache):
+    """Fetch and cache the box of a Data Package in a background thread."""
+    app = current_app._get_current_object()
+
+    def fetch():
+        with app.app_context():
+            try:
+                box = render_datapackage(url)
+                timeout = DATAPACKAGE_TTL if box else DATAPACKAGE_FAILED_TTL
+                # Failures are cached too, as an empty box
+                cache.set(cache_key(url), {"box": box, "fetched": time()},
+                          timeout=timeout)
+            finally:
+                with _prefetch_lock:
+                    _prefetching.pop(url, None)
+
+    with _prefetch_lock:
+        if url in _prefetching:
+            return _prefetching[url]
+        _prefetching[url] = future = _executor.submit(fetch)
+    return future
+
+
+def wait_for_prefetch(timeout=None):
+    """Wait for the packages being fetched in the background."""
+    with _prefetch_lock:
+        futures = list(_prefetching.values())
+    wait(futures, timeout=timeout)
+
+
+def render_datapackage(url):
+    """Fetch a Data Package and render it as a box."""
     try:
         current_app.logger.info("Fetching Data Package: <%s>" % url)
         package = Package(url)
@@ -88,9 +163,4 @@ def box_datapackage(line, cache=None):
         if rp and not rp.startswith("http"):
             package.resources[r]["path"] = "/".join([base_url, rp])
     # Render to template
-    box = pystache.render(TEMPLATE_PACKAGE, {"url": url, "dp": package, "date": dt})
-    if cache:
-        cache.set(url, box)
-    if cache and cache.has(url):
-        current_app.logger.debug("Cached Data Package: <%s>" % url)
-    return box
+    return pystache.render(TEMPLATE_PACKAGE, {"url": url, "dp": package, "date": dt})
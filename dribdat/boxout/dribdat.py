@@ -1,6 +1,7 @@
 """Boxout module for Dribdat projects."""
 
 import pystache
+from hashlib import sha1
 
 TEMPLATE_PROJECT = r"""
 <div class="onebox honeycomb" title="{{summary}} ...">
@@ -22,14 +23,70 @@ TEMPLATE_PROJECT = r"""
 
 def box_project(url):
     """Create a OneBox for local projects."""
+    return box_projects([url]).get(url)
+
+
+def project_id_from_url(url):
+    """Extract the project id from the link to a project."""
     project_id = url.split('/')[-1].split('#')[0]
     if not project_id or not project_id.isnumeric():
         return None
-    from ..user.models import Project
-    project = Project.query.filter_by(id=int(project_id)).first()
-    if not project:
-        return None
-    pd = project.data
-    # project.url returns a relative path
-    pd['link'] = url
-    return pystache.render(TEMPLATE_PROJECT, pd)
+    return int(project_id)
+
+
+def box_projects(urls):
+    """Create OneBoxes for links to local projects, in one go."""
+    from ..caching import get_tag_versions
+    from ..extensions import cache
+    links = {}
+    for url in set(urls):
+        project_id = project_id_from_url(url)
+        if project_id is not None:
+            links[url] = project_id
+    if not links:
+        return {}
+    # Cached boxes are replaced when their project is changed
+    versions = get_tag_versions(["project-%d" % pid for pid in links.values()])
+    keys = {
+        url: "project-box:%s@%s" % (
+            sha1(url.encode('utf-8')).hexdigest(),
+            versions["project-%d" % pid])
+        for url, pid in links.items()
+    }
+    boxes = dict(zip(keys.keys(), cache.get_many(*keys.values())))
+    missing = [url for url in boxes if boxes[url] is None]
+    if not missing:
+        return boxes
+    rendered = {}
+    projects = get_box_data([links[url] for url in missing])
+    for url in missing:
+        pd = projects.get(links[url])
+        if pd is None:
+            continue
+        # project.url returns a relative path
+        boxes[url] = rendered[keys[url]] = pystache.render(
+            TEMPLATE_PROJECT, dict(pd, link=url))
+    if rendered:
+        cache.set_many(rendered)
+    return boxes
+
+
+def get_box_data(project_ids):
+    """Load the data shown in the boxes of projects with one query."""
+    from ..database import db
+    from ..user.models import Event, Project
+    from ..user.constants import getProjectPhase
+    rows = db.session.query(
+        Project.id, Project.name, Project.summary, Project.image_url,
+        Project.progress, Event.name.label('event_name'),
+    ).outerjoin(Event, Project.event_id == Event.id) \
+        .filter(Project.id.in_(set(project_ids)))
+    return {
+        row.id: {
+            'name': row.name,
+            'summary': row.summary or "",
+            'image_url': row.image_url or "",
+            'phase': getProjectPhase(row),
+            'event_name': row.event_name or "",
+        } for row in rows
+    }
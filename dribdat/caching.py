@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Caching of rendered content, with tag-based invalidation."""
+
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock
+from time import monotonic
+from uuid import uuid4
+
+from dribdat.extensions import cache
+
+TAG_PREFIX = "tag-version:"
+RENDER_PREFIX = "render:"
+
+# Each tag has a version token stored in the cache. Keys of cached entries
+# include the tokens of their tags, so renewing a token makes every entry
+# that depends on it unreachable, to expire on its own. This works the same
+# way with any cache backend, as no list of keys needs to be kept.
+
+
+def new_version():
+    """Create a random version token."""
+    return uuid4().hex[:8]
+
+
+def get_tag_versions(tags):
+    """Return a map of tags to their current version tokens."""
+    tags = [str(t) for t in tags]
+    if not tags:
+        return {}
+    keys = [TAG_PREFIX + t for t in tags]
+    versions = dict(zip(tags, cache.get_many(*keys)))
+    missing = {}
+    for t in tags:
+        if not versions[t]:
+            versions[t] = missing[TAG_PREFIX + t] = new_version()
+    if missing:
+        # Versions are kept until they are replaced
+        cache.set_many(missing, timeout=0)
+    return versions
+
+
+def tag_versions(*tags):
+    """Return the current version tokens of a set of tags, as a string."""
+    versions = get_tag_versions(tags)
+    return ".".join([versions[str(t)] for t in tags])
+
+
+def tagged_key(key, *tags):
+    """Make a cache key which changes when any of the tags is invalidated."""
+    return "%s@%s" % (key, tag_versions(*tags))
+
+
+def invalidate_tags(*tags):
+    """Renew the versions of tags, making all entries tagged with them stale."""
+    if not tags:
+        return
+    cache.set_many(
+        {TAG_PREFIX + str(t): new_version() for t in tags}, timeout=0)
+
+
+def invalidate_event(event_id=None):
+    """Invalidate the content of an event, and of the event listings."""
+    if event_id is None:
+        invalidate_tags("events")
+    else:
+        invalidate_tags("event-%d" % event_id, "events")
+
+
+def invalidate_user(user_id):
+    """Invalidate the content shown to a particular user."""
+    invalidate_tags("user-%d" % user_id)
+
+
+def invalidate_project(project):
+    """Invalidate the content of a project, its event and its team."""
+    tags = ["project-%d" % project.id]
+    if project.event_id:
+        tags.append("event-%d" % project.event_id)
+    user_ids = set([u.id for u in project.get_team()])
+    if project.user_id:
+        user_ids.add(project.user_id)
+    tags.extend(["user-%d" % uid for uid in user_ids])
+    invalidate_tags(*tags)
+
+
+class RenderCache(object):
+    """Memoize a text renderer, keyed on a hash of the text and its configuration.
+
+    Recent results are kept in a bounded in-process LRU, backed by the shared
+    cache. Entries can be given a timeout, for renderers whose output also
+    depends on something else than the text (such as remote content), and
+    results which should not be kept (such as placeholders) can be filtered.
+    """
+
+    def __init__(self, name, render, config="", maxsize=512, timeout=None,
+                 shared=True, cacheable=None):
+        self.name = name
+        self.render = render
+        self.config = config
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.shared = shared
+        self.cacheable = cacheable
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def make_key(self, text, *variant):
+        """Address the output by the renderer, its configuration and the text."""
+        digest = sha1(repr((self.config,) + variant).encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return "%s%s:%s" % (RENDER_PREFIX, self.name, digest.hexdigest())
+
+    def __call__(self, text, *variant):
+        """Render a text, or return the result of a previous rendering."""
+        if not isinstance(text, str):
+            return self.render(text)
+        key = self.make_key(text, *variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        result = cache.get(key) if self.shared else None
+        if result is None:
+            result = self.render(text)
+            with self._lock:
+                self.misses += 1
+            if self.cacheable is not None and not self.cacheable(result):
+                return result
+            if self.shared:
+                cache.set(key, result, timeout=self.timeout)
+        else:
+            with self._lock:
+                self.hits += 1
+        self._remember(key, result)
+        return result
+
+    def _remember(self, key, result):
+        expires = monotonic() + self.timeout if self.timeout else None
+        with self._lock:
+            self._entries[key] = (result, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    @property
+    def stats(self):
+        """Counts of hits and misses, and the size of the local cache."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+        }
+
+    def clear(self):
+        """Forget the locally cached results and counts."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 
 from functools import wraps
+from hashlib import sha1
 
-from flask import abort, jsonify
+from flask import abort, jsonify, make_response, request, Response
 from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+from dribdat.futures import UTC
 
 
 def admin_required(f):
@@ -22,3 +26,38 @@ def requires_auth(f):
             return jsonify(flag='fail', msg='Login required')
         return f(*args, **kwargs)
     return decorated
+
+
+def conditional(validators):
+    """Answer conditional requests with 304 Not Modified.
+
+    The validators are called with the arguments of the view, and return a
+    cheap fingerprint of the content along with the time it was last
+    modified (or None), so that the view only runs when something changed.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            found = validators(*args, **kwargs)
+            if found is None:
+                return f(*args, **kwargs)
+            fingerprint, last_modified = found
+            etag = sha1(repr(
+                (request.full_path, current_user.get_id(), fingerprint)
+            ).encode('utf-8')).hexdigest()
+            if last_modified is not None:
+                if last_modified.tzinfo is None:
+                    last_modified = last_modified.replace(tzinfo=UTC)
+                last_modified = last_modified.replace(microsecond=0)
+            if is_resource_modified(request.environ, etag, last_modified=last_modified):
+                resp = make_response(f(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            else:
+                resp = Response(status=304)
+            resp.set_etag(etag)
+            if last_modified is not None:
+                resp.last_modified = last_modified
+            return resp
+        return decorated
+    return decorator
@@ -1,29 +1,216 @@
 import subprocess
 import os
 from flask import current_app
+from .httpclient import get_setting
+from contextlib import contextmanager
 from datetime import datetime
+from hashlib import sha1
+from threading import Lock
 import tempfile
 import shutil
 
-def clone_repo(url):
-    """Clones a git repository to a temporary directory."""
-    path = tempfile.mkdtemp()
+try:
+    import fcntl
+except ImportError:  # e.g. on Windows
+    fcntl = None
+
+# Defaults, which can be changed in the app configuration
+GIT_MIRROR_DIR = os.path.join(tempfile.gettempdir(), "dribdat-git")
+GIT_MIRROR_SIZE = 500  # megabytes
+GIT_TIMEOUT = 120  # seconds
+
+# Never wait for credentials on the terminal
+GIT_ENV = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+
+_locks = {}
+_locks_lock = Lock()
+
+
+def get_mirror_dir():
+    """Return the directory in which repositories are mirrored."""
+    return get_setting("GIT_MIRROR_DIR", GIT_MIRROR_DIR)
+
+
+def get_mirror_path(url):
+    """Return the path of the bare mirror of a repository."""
+    return os.path.join(
+        get_mirror_dir(), sha1(url.encode("utf-8")).hexdigest() + ".git")
+
+
+def get_lock(path):
+    """Return a lock for updating a mirror, shared between threads."""
+    with _locks_lock:
+        return _locks.setdefault(path, Lock())
+
+
+def is_mirror(path):
+    """Check whether a path is one of the mirrors."""
+    return os.path.dirname(os.path.abspath(path)) == os.path.abspath(
+        get_mirror_dir())
+
+
+@contextmanager
+def mirror_lock(path, shared=False, blocking=True):
+    """Lock a mirror, also against other processes using the mirror directory.
+
+    Updating or removing a mirror takes an exclusive lock, and reading from
+    it a shared one. Yields whether the lock was obtained.
+    """
+    if fcntl is None:
+        # Only the threads of this process can be kept apart
+        lock = get_lock(path)
+        locked = lock.acquire(blocking)
+        try:
+            yield locked
+        finally:
+            if locked:
+                lock.release()
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        mode |= fcntl.LOCK_NB
+    while True:
+        lockfile = open(path + '.lock', 'a')
+        try:
+            fcntl.flock(lockfile, mode)
+        except BlockingIOError:
+            lockfile.close()
+            yield False
+            return
+        if is_lock_current(lockfile, path):
+            break
+        # The mirror was pruned while waiting, along with its lock file
+        lockfile.close()
     try:
-        subprocess.check_call(['git', 'clone', url, path])
-        return path
-    except subprocess.CalledProcessError as e:
-        current_app.logger.error("Could not clone repo: %s", e)
-        return None
+        yield True
+    finally:
+        fcntl.flock(lockfile, fcntl.LOCK_UN)
+        lockfile.close()
+
+
+def is_lock_current(lockfile, path):
+    """Check whether an open lock file is still the one of a mirror."""
+    try:
+        return os.fstat(lockfile.fileno()).st_ino == os.stat(
+            path + '.lock').st_ino
+    except FileNotFoundError:
+        return False
+
+
+def remove_lock(path):
+    """Remove the lock file of a mirror which is gone, while holding the lock."""
+    if fcntl is not None:
+        os.remove(path + '.lock')
+
+
+@contextmanager
+def reading(path):
+    """Keep a mirror from being removed while it is read."""
+    if not is_mirror(path):
+        yield
+        return
+    with mirror_lock(path, shared=True):
+        yield
+
+
+def run_git(args, cwd=None):
+    """Run a git command, which may not ask for input or take too long."""
+    subprocess.check_call(
+        ['git'] + args, cwd=cwd, env=GIT_ENV,
+        stdin=subprocess.DEVNULL,
+        timeout=get_setting("GIT_TIMEOUT", GIT_TIMEOUT),
+    )
+
+
+def clone_repo(url):
+    """Updates a bare mirror of a git repository, and returns its path.
+
+    The mirror is kept between calls, so it must not be removed. File
+    contents are left on the server until they are read (partial clone).
+    """
+    path = get_mirror_path(url)
+    options = ['--filter=blob:none']
+    with mirror_lock(path):
+        try:
+            if os.path.exists(path):
+                run_git(['fetch', '--prune', '--quiet'] + options + [
+                    'origin', '+refs/heads/*:refs/heads/*'], cwd=path)
+            else:
+                # Clone next to the mirror, to not leave an incomplete one
+                os.makedirs(get_mirror_dir(), exist_ok=True)
+                tmp_path = tempfile.mkdtemp(dir=get_mirror_dir())
+                try:
+                    run_git(['clone', '--bare', '--quiet'] + options + [
+                        url, tmp_path])
+                    os.rename(tmp_path, path)
+                finally:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+        except (subprocess.CalledProcessError,
+                subprocess.TimeoutExpired, OSError) as e:
+            current_app.logger.error("Could not clone repo: %s", e)
+            if not os.path.exists(path):
+                remove_lock(path)
+                return None
+            # Make do with the previous state of the mirror
+        # Mark as recently used
+        os.utime(path)
+    prune_mirrors(keep=path)
+    return path
+
+
+def get_dir_size(path):
+    """Sums up the size of the files in a directory."""
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for f in files:
+            try:
+                size += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return size
+
+
+def prune_mirrors(keep=None):
+    """Removes the least recently used mirrors, beyond the size limit."""
+    mirror_dir = get_mirror_dir()
+    if not os.path.isdir(mirror_dir):
+        return []
+    limit = get_setting("GIT_MIRROR_SIZE", GIT_MIRROR_SIZE)
+    limit = limit * 1024 * 1024
+    mirrors = []
+    for name in os.listdir(mirror_dir):
+        path = os.path.join(mirror_dir, name)
+        if name.endswith('.git') and os.path.isdir(path):
+            mirrors.append((os.path.getmtime(path), path, get_dir_size(path)))
+    total = sum([m[2] for m in mirrors])
+    removed = []
+    for mtime, path, size in sorted(mirrors):
+        if total <= limit:
+            break
+        if path == keep:
+            continue
+        with mirror_lock(path, blocking=False) as locked:
+            if not locked:
+                # In use by another thread or process
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            remove_lock(path)
+        total -= size
+        removed.append(path)
+    return removed
+
 
 def get_git_log(path):
     """Gets the git log for a repository."""
-    if not os.path.exists(path):
-        return []
     try:
-        log = subprocess.check_output(
-            ['git', 'log', '--pretty=format:%H%n%an%n%ae%n%at%n%s'],
-            cwd=path
-        ).decode('utf-8')
+        with reading(path):
+            if not os.path.exists(path):
+                return []
+            log = subprocess.check_output(
+                ['git', 'log', '--pretty=format:%H%n%an%n%ae%n%at%n%s'],
+                cwd=path
+            ).decode('utf-8')
         commits = []
         commit_data = log.strip().split('\n')
         for i in range(0, len(commit_data), 5):
@@ -40,10 +227,23 @@ def get_git_log(path):
         current_app.logger.error("Could not get git log: %s", e)
         return []
 
+
 def get_file_content(path, filename):
-    """Gets the content of a file in a repository."""
+    """Gets the content of a file in a repository, or in its mirror."""
     filepath = os.path.join(path, filename)
-    if not os.path.exists(filepath):
+    if os.path.exists(filepath):
+        with open(filepath, 'r') as f:
+            return f.read()
+    # Read from the default branch, without a checkout
+    try:
+        with reading(path):
+            if not os.path.exists(path):
+                return None
+            return subprocess.check_output(
+                ['git', 'show', 'HEAD:%s' % filename],
+                cwd=path, env=GIT_ENV, stderr=subprocess.DEVNULL,
+                stdin=subprocess.DEVNULL,
+                timeout=get_setting("GIT_TIMEOUT", GIT_TIMEOUT),
+            ).decode('utf-8')
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
         return None
-    with open(filepath, 'r') as f:
-        return f.read()
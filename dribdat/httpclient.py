@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Shared HTTP client for requests to remote services."""
+
+from hashlib import sha1
+from threading import Lock
+
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from dribdat.extensions import cache
+
+# Defaults, which can be changed in the app configuration
+HTTP_TIMEOUT = 10
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+HTTP_POOL_SIZE = 10
+HTTP_CACHE_TIMEOUT = 7 * 24 * 60 * 60  # seconds
+
+HTTP_CACHE_PREFIX = "http:"
+
+# Responses which are worth trying again, after a pause. Connection and read
+# errors are not retried, so that an unreachable host only costs one timeout.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = Lock()
+
+
+class TimeoutSession(requests.Session):
+    """A session which applies a timeout to every request."""
+
+    def __init__(self, timeout=HTTP_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def get_setting(name, default):
+    """Read a setting of the current app, if there is one."""
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def make_session(transport=None):
+    """Create a session with pooled connections and retries."""
+    session = TimeoutSession(get_setting("HTTP_TIMEOUT", HTTP_TIMEOUT))
+    if transport is None:
+        pool_size = get_setting("HTTP_POOL_SIZE", HTTP_POOL_SIZE)
+        retries = Retry(
+            total=get_setting("HTTP_RETRIES", HTTP_RETRIES),
+            connect=0,
+            read=0,
+            backoff_factor=get_setting("HTTP_BACKOFF", HTTP_BACKOFF),
+            status_forcelist=RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        transport = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries
+        )
+    session.mount("http://", transport)
+    session.mount("https://", transport)
+    return session
+
+
+def get_session():
+    """Return the shared session, which keeps connections alive between requests."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def set_transport(transport=None):
+    """Replace the shared session, e.g. to use a local stand-in for tests.
+
+    The transport is a requests adapter, or None to restore the default one.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = make_session(transport) if transport is not None else None
+
+
+def get(url, **kwargs):
+    """Send a GET request with the shared session."""
+    return get_session().get(url, **kwargs)
+
+
+def get_cached(url, **kwargs):
+    """Send a conditional GET request, reusing the cached body if unchanged.
+
+    Responses with an ETag or Last-Modified header are kept in the shared
+    cache, and revalidated on the next request. APIs such as GitHub's do not
+    count unchanged (304) responses against the rate limit.
+    """
+    if not has_app_context():
+        return get(url, **kwargs)
+    key = HTTP_CACHE_PREFIX + sha1(url.encode("utf-8")).hexdigest()
+    cached = cache.get(key)
+    headers = dict(kwargs.pop("headers", None) or {})
+    if cached:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["modified"]:
+            headers["If-Modified-Since"] = cached["modified"]
+    response = get(url, headers=headers, **kwargs)
+    if cached and response.status_code == 304:
+        current_app.logger.debug("Not modified: %s", url)
+        response.status_code = 200
+        response._content = cached["content"]
+        response.encoding = cached["encoding"]
+        response.headers.update(cached["headers"])
+        response.from_cache = True
+        return response
+    etag = response.headers.get("ETag")
+    modified = response.headers.get("Last-Modified")
+    if response.status_code == 200 and (etag or modified):
+        cache.set(key, {
+            "etag": etag,
+            "modified": modified,
+            "content": response.content,
+            "encoding": response.encoding,
+            "headers": {
+                k: v for k, v in response.headers.items()
+                if k.lower() in ("content-type", "link")
+            },
+        }, timeout=get_setting("HTTP_CACHE_TIMEOUT", HTTP_CACHE_TIMEOUT))
+    response.from_cache = False
+    return response
+
+
+def post(url, **kwargs):
+    """Send a POST request with the shared session."""
+    return get_session().post(url, **kwargs)
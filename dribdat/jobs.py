@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Queue of slow tasks, which run in the background."""
+
+from datetime import datetime, timedelta
+from hashlib import sha1
+from json import dumps, loads
+from threading import Event as Signal, Lock, Thread
+
+from flask import current_app, flash
+from sqlalchemy import delete, update
+
+from dribdat.database import db
+from dribdat.futures import UTC
+from dribdat.user.models import Job
+
+# Defaults, which can be changed in the app configuration
+JOB_ATTEMPTS = 3
+JOB_BACKOFF = 30  # seconds, doubled after every attempt
+JOB_INTERVAL = 5  # seconds between checks of the queue
+JOB_TIMEOUT = 900  # seconds after which a running job is presumed lost
+JOB_RETENTION = 7 * 24 * 60 * 60  # seconds to keep finished jobs
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobError(Exception):
+    """A failure of a task which is not worth trying again."""
+
+
+# Tasks are registered by name, as the queue only stores their arguments
+_tasks = {}
+
+_worker = None
+_worker_lock = Lock()
+_wakeup = Signal()
+
+
+def task(name, attempts=None, private=False):
+    """Register a function as a task which can be queued.
+
+    The function is called with the job, and the arguments it was queued
+    with. It may return a message on success, and raises to be retried,
+    or raises JobError to fail straight away.
+    The arguments of private tasks, such as e-mails with sign-in links,
+    are removed once the job has finished.
+    """
+    def decorator(f):
+        _tasks[name] = (f, attempts, private)
+        return f
+    return decorator
+
+
+def job_key(name, payload):
+    """Identify a task with its arguments."""
+    return sha1(dumps([name, payload], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def enqueue(name, user=None, **payload):
+    """Queue a task, unless the same one is already waiting to run."""
+    if name not in _tasks:
+        raise LookupError("Unknown task: %s" % name)
+    key = job_key(name, payload)
+    job = Job.query.filter_by(key=key, status=PENDING).first()
+    if job is None:
+        job = Job(
+            name=name,
+            key=key,
+            payload=dumps(payload),
+            status=PENDING,
+            max_attempts=_tasks[name][1] or current_app.config.get(
+                "JOB_ATTEMPTS", JOB_ATTEMPTS),
+            created_at=datetime.now(UTC),
+            run_at=datetime.now(UTC),
+            user_id=getattr(user, "id", None),
+        )
+        job.save()
+    mode = current_app.config.get("JOB_WORKER", "thread")
+    if mode == "inline":
+        # Run straight away, e.g. for development, in a session of its own
+        # which leaves the objects of the caller alone
+        with current_app._get_current_object().app_context():
+            claimed = claim_job(job.id)
+            if claimed is not None:
+                run_job(claimed)
+        db.session.refresh(job)
+    elif mode == "thread":
+        start_worker()
+    return job
+
+
+def claim_job(job_id=None):
+    """Mark the next job which is due (or a given one) as running, and return it.
+
+    Jobs are claimed with a conditional update, so that several workers can
+    share the same queue.
+    """
+    now = datetime.now(UTC)
+    if job_id is not None:
+        candidates = [job_id]
+    else:
+        candidates = [j for (j,) in db.session.query(Job.id)
+                      .filter(Job.status == PENDING, Job.run_at <= now)
+                      .order_by(Job.run_at, Job.id)
+                      .limit(10)]
+    for job_id in candidates:
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == PENDING)
+            .values(status=RUNNING, started_at=now, attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if claimed.rowcount:
+            return db.session.get(Job, job_id)
+    return None
+
+
+def run_job(job):
+    """Run a claimed job, and schedule another attempt if it fails."""
+    f, _, private = _tasks.get(job.name, (None, 0, False))
+    try:
+        if f is None:
+            raise LookupError("Unknown task: %s" % job.name)
+        message = f(job, **loads(job.payload or "{}"))
+    except Exception as e:  # noqa: B902
+        db.session.rollback()
+        current_app.logger.warning(
+            "Job %d (%s) failed on attempt %d: %s", job.id, job.name, job.attempts, e)
+        job.error = str(e) or e.__class__.__name__
+        if job.attempts < job.max_attempts and not isinstance(e, JobError):
+            backoff = current_app.config.get("JOB_BACKOFF", JOB_BACKOFF)
+            job.status = PENDING
+            job.run_at = datetime.now(UTC) + timedelta(
+                seconds=backoff * 2 ** (job.attempts - 1))
+        else:
+            job.status = FAILED
+            job.finished_at = datetime.now(UTC)
+            if private:
+                job.payload = None
+        job.save()
+        return False
+    job.status = DONE
+    if private:
+        job.payload = None
+    job.progress = 1.0
+    job.error = None
+    if message:
+        job.message = str(message)[:256]
+    job.finished_at = datetime.now(UTC)
+    job.save()
+    return True
+
+
+def flash_job(job, waiting):
+    """Tell the user how a job went, or that it is on the way."""
+    if job.status == DONE:
+        flash(job.message or "Done.", "success")
+    elif job.error:
+        flash(job.error, "warning")
+    else:
+        flash(waiting, "info")
+
+
+def report_progress(job, progress, message=None):
+    """Update the progress of a job, to be saved along with its work."""
+    job.progress = progress
+    if message is not None:
+        job.message = message[:256]
+
+
+def release_lost_jobs(timeout=JOB_TIMEOUT):
+    """Requeue running jobs, which were left behind by a stopped worker."""
+    lost = (Job.status == RUNNING,
+            Job.started_at < datetime.now(UTC) - timedelta(seconds=timeout))
+    db.session.execute(
+        update(Job).where(*lost, Job.attempts < Job.max_attempts)
+        .values(status=PENDING, error="Worker stopped")
+        .execution_options(synchronize_session=False))
+    db.session.execute(
+        update(Job).where(*lost)
+        .values(status=FAILED, error="Worker stopped")
+        .execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+def purge_jobs(retention=JOB_RETENTION):
+    """Delete the jobs which finished longer ago than the retention time."""
+    purged = db.session.execute(
+        delete(Job)
+        .where(Job.status.in_([DONE, FAILED]),
+               Job.finished_at < datetime.now(UTC) - timedelta(seconds=retention))
+        .execution_options(synchronize_session=False))
+    db.session.commit()
+    return purged.rowcount
+
+
+def work_off(limit=None):
+    """Run the jobs which are due, and return how many were run."""
+    release_lost_jobs(current_app.config.get("JOB_TIMEOUT", JOB_TIMEOUT))
+    purge_jobs(current_app.config.get("JOB_RETENTION", JOB_RETENTION))
+    count = 0
+    while limit is None or count < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+def run_worker(interval=JOB_INTERVAL, once=False):
+    """Keep running jobs as they become due."""
+    while True:
+        try:
+            work_off()
+        except Exception as e:  # noqa: B902
+            # Such as a lost database connection
+            db.session.rollback()
+            current_app.logger.error("Could not run jobs: %s", e)
+        # Start afresh, without objects of previous jobs
+        db.session.remove()
+        if once:
+            return
+        _wakeup.wait(interval)
+        _wakeup.clear()
+
+
+def start_worker():
+    """Run jobs in a thread of this process, started when first needed."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            app = current_app._get_current_object()
+            _worker = Thread(target=worker_thread, args=(app,), daemon=True)
+            _worker.start()
+    _wakeup.set()
+
+
+def worker_thread(app):
+    """Run jobs within the app, for as long as the process runs."""
+    with app.app_context():
+        run_worker(app.config.get("JOB_INTERVAL", JOB_INTERVAL))
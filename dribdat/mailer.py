@@ -4,6 +4,7 @@
 from flask import url_for, current_app
 from flask_mailman import EmailMessage
 from dribdat.utils import random_password  # noqa: I005
+from dribdat.jobs import enqueue, task
 
 
 EMAIL_SIGNATURE = """ 
@@ -15,14 +16,28 @@ You can delete your account any time by editing your profile.
 
 
 def send_mail(msg, log_message=None):
-    """Send an e-mail message."""
+    """Queue an e-mail message to be sent in the background."""
     if "mailman" not in current_app.extensions:
         current_app.logger.warning("E-mail extension has not been configured")
         return False
+    enqueue(
+        "send-mail",
+        subject=msg.subject,
+        body=msg.body,
+        from_email=msg.from_email,
+        to=list(msg.to),
+        log_message=log_message,
+    )
+    return True
+
+
+@task("send-mail", private=True)
+def deliver_mail(job, subject, body, from_email, to, log_message=None):
+    """Send an e-mail message, which is tried again if the server fails."""
     if log_message:
         current_app.logger.info(log_message)
-    msg.send(fail_silently=True)
-    return True
+    msg = EmailMessage(subject=subject, body=body, from_email=from_email, to=to)
+    msg.send()
 
 
 def user_activation_message(user, act_hash):
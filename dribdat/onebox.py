@@ -2,14 +2,30 @@
 """Jinja formatters for Oneboxes and Embeds."""
 
 import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from hashlib import sha1
 from flask import current_app, url_for
 from micawber.parsers import standalone_url_re, full_handler
 from .boxout.ckan import box_dataset, chk_dataset, ini_dataset
-from .boxout.dribdat import box_project
+from .boxout.dribdat import box_project, box_projects
 from .boxout.datapackage import box_datapackage, chk_datapackage
 from .boxout.github import box_repo, chk_github
 from dribdat.extensions import cache
 
+# How many oEmbed providers to query at once, across all renderings
+OEMBED_WORKERS = 8
+# In seconds, how long to keep provider responses, and failures
+OEMBED_CACHE_TTL = 60 * 60 * 24
+OEMBED_FAILED_TTL = 60 * 10
+
+# Links which may be boxed with the data of a project on this server
+PROJECT_LINK_RE = re.compile(r"/project/(\d+)")
+
+# Shared by all requests, so that the number of threads stays bounded. Each
+# provider request ends with the socket timeout of its provider.
+_oembed_executor = ThreadPoolExecutor(
+    max_workers=OEMBED_WORKERS, thread_name_prefix="oembed")
+
 
 def format_webembed(url, project_id=None):
     """Create a well-formatted frame for project embeds."""
@@ -57,7 +73,7 @@ def format_webslides(longtext):
     # Adjusting for Thematic Break format
 
 
-def repl_onebox(mat=None, li=None):
+def repl_onebox(mat=None, li=None, boxes=None):
     """Check for onebox application links."""
     if li is None:
         li = []
@@ -67,16 +83,32 @@ def repl_onebox(mat=None, li=None):
     if mat.group(1):
         url = mat.group(1).strip()
         if "/project/" in url:
-            # Try to parse a project link
+            # Try to parse a project link, unless it was already boxed
+            if boxes is not None:
+                return boxes.get(url) or mat.group()
             return box_project(url) or mat.group()
     return mat.group()
 
 
+def repl_oneboxes(regexp, text):
+    """Prepare to box the project links of a text, loading the projects together."""
+    boxes = box_projects([
+        mat.group(1).strip() for mat in regexp.finditer(text)
+        if "/project/" in mat.group(1)
+    ])
+    return lambda mat: repl_onebox(mat, boxes=boxes)
+
+
 def make_onebox(raw_html):
     """Create a onebox container."""
     url = re.escape(url_for("public.home", _external=True))
     regexp = re.compile('<a href="(%s.+?)">(%s.+?)</a>' % (url, url))
-    return re.sub(regexp, repl_onebox, raw_html)
+    return re.sub(regexp, repl_oneboxes(regexp, raw_html), raw_html)
+
+
+def linked_project_tags(text):
+    """Return the cache tags of the projects which may be boxed in a text."""
+    return sorted(set("project-%s" % pid for pid in PROJECT_LINK_RE.findall(text)))
 
 
 def make_oembedplus(text, oembed_providers, **params):
@@ -87,12 +119,18 @@ def make_oembedplus(text, oembed_providers, **params):
     # Url to projects
     home_url = re.escape(url_for("public.home", _external=True) + "project/")
     home_url_re = re.compile("(%s.+)" % home_url)
+    repl_project = repl_oneboxes(
+        home_url_re, "\n".join([ln for ln in lines if home_url_re.match(ln)]))
+    # Resolve the embeddable links of the document together
+    embeds = fetch_oembeds(
+        [line.strip() for line in lines if standalone_url_re.match(line)],
+        oembed_providers, **params)
     # Iterate each line (inefficient!)
     for line in lines:
         newline = None
         if home_url_re.match(line):
             # Parse an internal project
-            newline = re.sub(home_url_re, repl_onebox, line)
+            newline = re.sub(home_url_re, repl_project, line)
         elif chk_datapackage(line):
             # Try to parse a Data Package link
             newline = box_datapackage(line, cache)
@@ -105,7 +143,7 @@ def make_oembedplus(text, oembed_providers, **params):
             newline = box_repo(line)
         elif standalone_url_re.match(line):
             # Check for out of box providers
-            newline = box_default(line, oembed_providers, **params)
+            newline = box_default(line, embeds, **params)
         # Do we have parse?
         if newline is not None:
             line = newline
@@ -116,13 +154,52 @@ def make_oembedplus(text, oembed_providers, **params):
     return "\n".join(parsed)
 
 
-def box_default(line, oembed_providers, **params):
-    """Fetch a built-in provider box."""
+def box_default(line, embeds, **params):
+    """Render a built-in provider box from a resolved response."""
     url = line.strip()
-    try:
-        response = oembed_providers.request(url, **params)
-    except Exception:  # noqa: B902
-        current_app.logger.info("OEmbed could not parse: <%s>" % url)
-    else:
-        return full_handler(url, response, **params)
-    return None
+    response = embeds.get(url)
+    if not response:
+        return None
+    return full_handler(url, response, **params)
+
+
+def oembed_cache_key(url, **params):
+    """Address the cached provider response for a link."""
+    key = repr((url, sorted(params.items()))).encode("utf-8")
+    return "oembed:" + sha1(key).hexdigest()
+
+
+def fetch_oembeds(urls, oembed_providers, **params):
+    """Resolve links with their oEmbed providers, concurrently and cached.
+
+    Returns a map of links to responses, which are empty for failed links.
+    """
+    embeds = {}
+    pending = {}
+    for url in set(urls):
+        if not oembed_providers.provider_for_url(url):
+            continue
+        key = oembed_cache_key(url, **params)
+        response = cache.get(key)
+        if response is None:
+            pending[url] = key
+        else:
+            embeds[url] = response
+    if not pending:
+        return embeds
+    futures = {
+        _oembed_executor.submit(oembed_providers.request, url, **params): url
+        for url in pending
+    }
+    wait(futures)
+    for future in futures:
+        url = futures[future]
+        if future.exception() is None:
+            embeds[url] = future.result()
+            cache.set(pending[url], embeds[url], timeout=OEMBED_CACHE_TTL)
+        else:
+            current_app.logger.info("OEmbed could not parse: <%s>" % url)
+            # Remember failures for a while, as an empty response
+            embeds[url] = {}
+            cache.set(pending[url], {}, timeout=OEMBED_FAILED_TTL)
+    return embeds
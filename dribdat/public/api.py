@@ -2,6 +2,7 @@
 """API calls for dribdat."""
 import boto3
 import tempfile
+from itertools import chain
 from json import loads
 from datetime import datetime
 
@@ -9,29 +10,39 @@ from flask import (
     Blueprint, current_app,
     Response, request, redirect,
     stream_with_context, send_file,
-    jsonify, flash, url_for
+    jsonify, flash, url_for, abort
 )
 from flask_login import login_required, current_user
-from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
 from markupsafe import escape
 
 from ..extensions import db, cache
+from ..caching import tagged_key
 from ..utils import timesince, random_password, sanitize_url, markdownit
-from ..decorators import admin_required
-from ..user.models import Event, Project, Activity, User
+from ..decorators import admin_required, conditional
+from ..user.models import Event, Project, Activity, User, Job
 from ..apipackage import import_event_package, event_to_data_package
 from ..api.parser import GetProjectData
+from ..search import search_projects
+from .userhelper import search_users
 from ..aggregation import (
     AddProjectDataFromAutotext,
 )
 from ..apiutils import (
-    get_project_list,
+    iter_project_list,
     get_event_activities,
-    get_users_for_event,
+    iter_event_activities,
+    iter_users_for_event,
     get_schema_for_user_projects,
     event_upload_configuration,
     expand_project_urls,
-    gen_csv,
+    get_projects_data,
+    event_validators,
+    project_validators,
+    activity_validators,
+    iter_csv,
+    gen_json,
+    gen_ndjson,
 )
 from ..apipackage import (
     fetch_datapackage, import_datapackage, import_projects_csv
@@ -40,6 +51,15 @@ from ..apipackage import (
 blueprint = Blueprint('api', __name__, url_prefix='/api')
 
 
+def stream_rows(key, rows, extra=None):
+    """Stream rows as a JSON object, or as NDJSON with ?format=ndjson."""
+    if request.args.get('format') == 'ndjson':
+        return Response(stream_with_context(gen_ndjson(rows)),
+                        mimetype='application/x-ndjson')
+    return Response(stream_with_context(gen_json(key, rows, extra)),
+                    mimetype='application/json')
+
+
 # ------ EVENT INFORMATION ---------
 
 def get_current_event():
@@ -48,6 +68,11 @@ def get_current_event():
         Event.query.order_by(Event.id.desc()).first_or_404()
 
 
+def current_event_validators(**kwargs):
+    """Fingerprint of the current event, for conditional requests."""
+    return event_validators(get_current_event().id)
+
+
 @blueprint.route('/event/current/info.json')
 def info_current_event_json():
     """Output JSON about the current event."""
@@ -87,24 +112,27 @@ def info_event_ical(event_id):
 
 # ------ EVENT PROJECTS ---------
 
-def request_project_list(event_id):
-    """Fetch a project list."""
+def request_project_rows(event_id):
+    """Generate the rows of a project list."""
     is_moar = bool(request.args.get('moar', type=bool))
     host_url = request.host_url
-    return get_project_list(event_id, host_url, is_moar)
+    return iter_project_list(event_id, host_url, is_moar)
 
 
 @blueprint.route('/event/current/projects.json')
+@conditional(current_event_validators)
 def project_list_current_json():
     """Output JSON of projects in the current event with its info."""
     event = get_current_event()
-    return jsonify(projects=request_project_list(event.id), event=event.data)
+    return stream_rows('projects', request_project_rows(event.id),
+                       {'event': event.data})
 
 
 @blueprint.route('/event/<int:event_id>/projects.json')
+@conditional(event_validators)
 def project_list_json(event_id):
     """Output JSON of all projects at a specific event."""
-    return jsonify(projects=request_project_list(event_id))
+    return stream_rows('projects', request_project_rows(event_id))
 
 
 def project_list_csv(event_id, event_name):
@@ -113,7 +141,7 @@ def project_list_csv(event_id, event_name):
         'Content-Disposition': 'attachment; filename='
         + event_name + '_projects_dribdat.csv'
     }
-    csvlist = gen_csv(request_project_list(event_id))
+    csvlist = iter_csv(request_project_rows(event_id))
     return Response(stream_with_context(csvlist),
                     mimetype='text/csv',
                     headers=headers)
@@ -136,15 +164,13 @@ def project_list_current_csv():
 @blueprint.route('/events.<as_format>')
 def list_all_events(as_format='json'):
     """Output basic data of all public events."""
-    eventlist = []
-    for event in Event.query \
-            .filter_by(is_hidden=False, lock_resources=False) \
-            .order_by(Event.starts_at.desc()).all():
-        eventlist.append(event.data)
+    events = Event.query \
+        .filter_by(is_hidden=False, lock_resources=False) \
+        .order_by(Event.starts_at.desc())
     if as_format == 'json':
-        return jsonify(events=eventlist)
+        return stream_rows('events', (e.data for e in events.yield_per(100)))
     headers = {'Content-Disposition': 'attachment; filename=events.csv'}
-    csvlist = gen_csv(eventlist)
+    csvlist = iter_csv(e.data for e in events.yield_per(100))
     return Response(stream_with_context(csvlist),
                     mimetype='text/csv',
                     headers=headers)
@@ -153,12 +179,12 @@ def list_all_events(as_format='json'):
 @blueprint.route('/events/projects.csv')
 def project_list_all_events_csv():
     """Output CSV of projects and challenges in all events."""
-    projectlist = []
-    export = Event.query.filter_by(is_hidden=False, lock_resources=False).all()
-    for event in export:
-        projectlist.extend(request_project_list(event.id))
+    export = Event.query.filter_by(is_hidden=False, lock_resources=False) \
+        .with_entities(Event.id).all()
+    projectlist = chain.from_iterable(
+        request_project_rows(event.id) for event in export)
     headers = {'Content-Disposition': 'attachment; filename=projects.csv'}
-    csvlist = gen_csv(projectlist)
+    csvlist = iter_csv(projectlist)
     return Response(stream_with_context(csvlist),
                     mimetype='text/csv',
                     headers=headers)
@@ -185,13 +211,14 @@ def categories_list_current_json():
 
 
 @blueprint.route('/event/<int:event_id>/activity.json')
+@conditional(activity_validators)
 def event_activity_json(event_id):
     """Output JSON of recent activity in an event."""
     limit = request.args.get('limit') or 50
     q = request.args.get('q') or None
     if q and len(q) < 3:
         q = None
-    return jsonify(activities=get_event_activities(event_id, limit, q))
+    return stream_rows('activities', iter_event_activities(event_id, limit, q))
 
 
 @blueprint.route('/event/current/activity.json')
@@ -204,6 +231,7 @@ def event_activity_current_json():
 
 
 @blueprint.route('/event/<int:event_id>/posts.json')
+@conditional(activity_validators)
 def event_posts_json(event_id):
     """Output JSON of recent posts (activity) from an event."""
     limit = request.args.get('limit') or 10
@@ -226,23 +254,25 @@ def event_activity_csv(event_id):
     q = request.args.get('q') or None
     if q and len(q) < 3:
         q = None
-    csvstream = gen_csv(get_event_activities(event_id, limit, q))
+    csvstream = iter_csv(iter_event_activities(event_id, limit, q))
     headers = {'Content-Disposition': 'attachment; filename=activity_list.csv'}
     return Response(stream_with_context(csvstream),
                     mimetype='text/csv', headers=headers)
 
 
 @blueprint.route('/project/activity.json')
+@conditional(activity_validators)
 def projects_activity_json():
     """Output JSON of recent activity across all projects."""
     limit = request.args.get('limit') or 10
     q = request.args.get('q') or None
     if q and len(q) < 3:
         q = None
-    return jsonify(activities=get_event_activities(None, limit, q))
+    return stream_rows('activities', iter_event_activities(None, limit, q))
 
 
 @blueprint.route('/project/posts.json')
+@conditional(activity_validators)
 def projects_posts_json():
     """Output JSON of recent posts (a kind of activity) across projects."""
     limit = request.args.get('limit') or 10
@@ -263,13 +293,14 @@ def projects_top_json():
             .order_by(Project.progress.desc()) \
             .limit(limit).all()
     projects = expand_project_urls(
-        [p.data for p in pp],
+        get_projects_data(pp),
         request.host_url
     )
     return jsonify(projects=projects)
 
 
 @blueprint.route('/project/<int:project_id>/activity.json')
+@conditional(project_validators)
 def project_activity_json(project_id):
     """Output JSON of recent activity of a project."""
     limit = request.args.get('limit') or 10
@@ -282,6 +313,7 @@ def project_activity_json(project_id):
 
 @blueprint.route('/project/<int:project_id>')
 @blueprint.route('/project/<int:project_id>/info.json')
+@conditional(project_validators)
 def project_info_json(project_id):
     """Output JSON info for a specific project."""
     is_full = bool(request.args.get('full')) or False
@@ -319,35 +351,43 @@ def project_info_json(project_id):
 def event_participants_csv(event_id):
     """Download a CSV of event participants."""
     event = Event.query.filter_by(id=event_id).first_or_404()
-    userlist = get_users_for_event(event, True)
+    userlist = iter_users_for_event(event, True)
     headers = {
         'Content-Disposition': 'attachment; '
         + 'filename=user_list_%d.csv' % event.id
     }
-    return Response(stream_with_context(gen_csv(userlist)),
+    return Response(stream_with_context(iter_csv(userlist)),
                     mimetype='text/csv',
                     headers=headers)
 
 
 @blueprint.route('/participants.json')
 def participants_directory_json():
-    """Search for participants across events."""
-    MAX_COUNT = 500
+    """Search for participants across events, one page at a time."""
     search_by = request.args.get("u") or ""
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 500)
+    page = max(request.args.get('page', 1, type=int), 1)
     if len(search_by) < 3:
-        users = User.query.filter_by(active=True).all()
+        users = User.query.filter_by(active=True).order_by(User.username)
     else:
-        users = get_users_by_search(search_by, MAX_COUNT)
-    userdata = []
-    for u in users:
-        userdata.append({
-            "user": u.username,
-            "name": u.name,
-            "image": u.carddata or "",
-            "goals": u.my_goals or "",
-            "roles": u.my_roles or "",
-        })
-    return jsonify(users=userdata)
+        users = search_users(search_by)
+    users = users.options(selectinload(User.roles)) \
+        .offset((page - 1) * limit).limit(limit + 1)
+    paging = {'page': page, 'has_more': False}
+
+    def gen_users():
+        for i, u in enumerate(users.yield_per(100)):
+            if i == limit:
+                paging['has_more'] = True
+                break
+            yield {
+                "user": u.username,
+                "name": u.name,
+                "image": u.carddata or "",
+                "goals": u.my_goals or "",
+                "roles": u.my_roles or "",
+            }
+    return stream_rows('users', gen_users(), paging)
 
 
 # ------ SEARCH ---------
@@ -358,21 +398,14 @@ def project_search_json():
     q = request.args.get('q')
     if q is None or len(q) < 3:
         return jsonify(projects=[])
-    limit = request.args.get('limit') or 10
-    q = "%%%s%%" % q
-    projects = Project.query \
-        .filter(Project.is_hidden==False) \
-        .filter(or_(
-            Project.name.ilike(q),
-            Project.summary.ilike(q),
-            Project.longtext.ilike(q),
-            Project.autotext.ilike(q),
-        )).limit(limit).all()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    page = max(request.args.get('page', 1, type=int), 1)
+    projects, has_more = search_projects(q, page, limit)
     projects = expand_project_urls(
-        [p.data for p in projects],
+        get_projects_data(projects),
         request.host_url
     )
-    return jsonify(projects=projects)
+    return jsonify(projects=projects, page=page, has_more=has_more)
 
 # ------ UPDATE ---------
 
@@ -526,6 +559,30 @@ def project_autofill():
     data = GetProjectData(url)
     return jsonify(data)
 
+# ------ JOBS -------
+
+
+@blueprint.route('/job/<int:job_id>.json')
+@login_required
+def job_status_json(job_id):
+    """Output the status and progress of a background job."""
+    job = Job.query.filter_by(id=job_id).first_or_404()
+    if job.user_id != current_user.id and not current_user.is_admin:
+        abort(403)
+    return jsonify(job=job.data)
+
+
+@blueprint.route('/jobs.json')
+@admin_required
+def job_list_json():
+    """Output the most recent background jobs, optionally with a given status."""
+    limit = request.args.get('limit', 50, type=int)
+    jobs = Job.query
+    if request.args.get('status'):
+        jobs = jobs.filter_by(status=request.args.get('status'))
+    jobs = jobs.order_by(Job.id.desc()).limit(limit)
+    return jsonify(jobs=[j.data for j in jobs])
+
 # ------ UPLOADING -------
 
 # TODO: move to separate upload.py ?
@@ -608,7 +665,8 @@ def generate_event_package(event, format='json'):
         return "Format not supported"
 
     # For JSON format, we try to return a cached version
-    cache_key = f"event_package_{event.id}_{format}"
+    cache_key = tagged_key(
+        f"event_package_{event.id}_{format}", "event-%d" % event.id)
     if format == 'json':
         cached_package = cache.get(cache_key)
         if cached_package:
@@ -633,6 +691,7 @@ def generate_event_package(event, format='json'):
         return send_file(fp_package.name, as_attachment=True)
 
 @blueprint.route('/event/current/datapackage.<format>', methods=["GET"])
+@conditional(current_event_validators)
 def package_current_event(format):
     """Download a Data Package for an event."""
     event = get_current_event()
@@ -640,6 +699,7 @@ def package_current_event(format):
 
 
 @blueprint.route('/event/<int:event_id>/datapackage.<format>', methods=["GET"])
+@conditional(event_validators)
 def package_specific_event(event_id, format):
     """Download a Data Package for an event."""
     event = Event.query.filter_by(id=event_id).first_or_404()
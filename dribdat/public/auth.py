@@ -20,7 +20,7 @@ from dribdat.sso.hitobito import hitobito
 from dribdat.sso.mattermost import mattermost
 
 # Dribdat modules
-from dribdat.user.models import User, Event, Role
+from dribdat.user.models import User, Event, Role, Activity
 from dribdat.extensions import login_manager  # noqa: I005
 from dribdat.utils import (
     unpack_csvlist,
@@ -40,6 +40,7 @@ from dribdat.user.forms import (
     RankingForm,
 )
 from dribdat.database import db
+from dribdat.aggregation import RecountProjects, RescoreUsers
 from dribdat.mailer import (
     user_activation,
     user_registration,
@@ -304,8 +305,21 @@ def delete_my_account():
     for p in current_user.projects:
         p.user_id = None
         p.save()
-    # Delete user posts
-    [a.delete() for a in current_user.activities]
+    # Delete user posts, and update the counters of their projects
+    project_ids = set()
+    for a in current_user.activities:
+        if a.project_id:
+            project_ids.add(a.project_id)
+        a.delete(commit=False)
+    db.session.commit()
+    RecountProjects(rescore=True, project_ids=project_ids)
+    # Refresh the scores of the remaining team members
+    team = (
+        db.session.query(Activity.user_id)
+        .filter(Activity.name == "star", Activity.project_id.in_(project_ids))
+        .distinct()
+    )
+    RescoreUsers(user_ids=[t.user_id for t in team])
     # Delete user account
     current_user.delete()
     logout_user()
@@ -391,6 +405,7 @@ def user_story():
         del form.my_skills  # avoid setting it again
         user.my_wishes = unpack_csvlist(form.my_wishes.data)
         del form.my_wishes  # avoid setting it again
+        user.update_skills()
 
         # Verify CV data
         if form.vitae.data:
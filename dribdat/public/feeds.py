@@ -14,8 +14,11 @@ from datetime import datetime
 from dribdat.futures import UTC
 
 from ..user.models import Event, Project, Activity, User
+from ..decorators import conditional
 from ..apiutils import (
     get_event_activities,
+    activity_validators,
+    user_validators,
 )
 
 blueprint = Blueprint('feeds', __name__, url_prefix='/feeds')
@@ -27,6 +30,7 @@ RSS_DATE_FORMAT = '%a, %d %b %Y %H:%M:%S GMT'
 
 
 @blueprint.route("/dribs.xml")
+@conditional(activity_validators)
 def get_dribs():
     """Show the latest logged posts."""
     dribs = Activity \
@@ -45,6 +49,7 @@ def get_dribs():
 
 
 @blueprint.route('/user/<username>', methods=['GET'])
+@conditional(user_validators)
 def get_user(username):
     """Output feed by username."""
     a_user = User.query.filter_by(username=username).first_or_404()
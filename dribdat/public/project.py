@@ -15,7 +15,8 @@ from flask_login import login_required, current_user
 from dribdat.user.models import Event, Project, Activity, User, Resource
 from dribdat.user.constants import drib_question
 from dribdat.database import db
-from dribdat.extensions import cache
+from dribdat.caching import invalidate_project
+from dribdat.jobs import enqueue, flash_job
 from dribdat.utils import timesince, timelimit
 from dribdat.public.forms import (
     ProjectImport,
@@ -25,9 +26,8 @@ from dribdat.public.forms import (
     ProjectComment,
     ResourceForm,
 )
-from dribdat.api.parser import GetProjectData
 from dribdat.aggregation import (
-    SyncProjectData,
+    ChangeProjectCounters,
     AllowProjectEdit,
     AllowUserInEvent,
     IsProjectStarred,
@@ -48,7 +48,7 @@ from dribdat.public.projhelper import (
     navigate_around_project,
     check_update,
 )
-from dribdat.apigenerate import gen_project_pitch, gen_project_post, prompt_ideas
+from dribdat.apigenerate import gen_project_pitch, prompt_ideas
 from ..decorators import admin_required
 from ..mailer import user_invitation
 
@@ -113,12 +113,12 @@ def project_boost(project_id):
     # Process form
     if form.is_submitted() and form.validate():
         # Update project data
-        cache.clear()
         project_action(
             project_id, "boost", action=form.boost_type.data, text=form.note.data
         )
         project.update_now()
         project.save()
+        invalidate_project(project)
         flash("Thanks for your boost!", "success")
         return project_view(project.id)
 
@@ -138,13 +138,8 @@ def project_autoboost(project_id):
     """Add automatic evaluation to a project."""
     p = Project.query.filter_by(id=project_id).first_or_404()
     # Go whizz up some content based on project data
-    autopost = gen_project_post(p, True)
-    if not autopost:
-        flash("AI service is currently not available.", "warning")
-        return redirect(url_for("project.get_log", project_id=p.id))
-    # Save the new content in the project log
-    project_action(p.id, "review", action="auto", text=autopost)
-    flash("The robots have judged", "success")
+    job = enqueue("autopost", user=current_user, project_id=p.id, as_boost=True)
+    flash_job(job, "The robots are judging 🤖 check back in a moment.")
     return redirect(url_for("project.get_log", project_id=p.id))
 
 
@@ -163,7 +158,7 @@ def project_approve(project_id):
         project.update_now()
         db.session.add(project)
         db.session.commit()
-        cache.clear()
+        invalidate_project(project)
         flash("Promoted to stage '%s'" % project.phase, "info")
     return redirect(url_for("project.project_view", project_id=project.id))
 
@@ -233,7 +228,7 @@ def project_post(project_id):
         project.update_now()
         db.session.add(project)
         db.session.commit()
-        cache.clear()
+        invalidate_project(project)
 
         # Write a post
         note_text = form.note.data
@@ -317,13 +312,8 @@ def project_autopost(project_id):
             )
             return redirect(url_for("project.get_log", project_id=p.id))
     # Go whizz up some content based on project data
-    autopost = gen_project_post(p)
-    if not autopost:
-        flash("AI service is currently not available.", "warning")
-        return redirect(url_for("project.get_log", project_id=p.id))
-    # Save the new content in the project log
-    project_action(p.id, "review", action="auto", text=autopost)
-    flash("The robots have spoken 🤖", "success")
+    job = enqueue("autopost", user=current_user, project_id=p.id)
+    flash_job(job, "The robots are writing a post 🤖 check back in a moment.")
     return redirect(url_for("project.get_log", project_id=p.id))
 
 
@@ -337,6 +327,8 @@ def post_delete(project_id, activity_id):
     if not activity.may_delete(current_user):
         flash("No permission to delete.", "warning")
     else:
+        if activity.project:
+            ChangeProjectCounters(activity.project, activity.name, -1)
         activity.delete()
         flash("The post has been deleted.", "success")
     return redirect(purl)
@@ -686,7 +678,7 @@ def import_new_project(event_id):
     project.update_now()
     db.session.add(project)
     db.session.commit()
-    cache.clear()
+    invalidate_project(project)
 
     project_action(project.id, "create", False)
     if not current_user.is_admin:
@@ -783,7 +775,7 @@ def create_new_project(event):
         project.save()
 
     # Cachebusters!
-    cache.clear()
+    invalidate_project(project)
 
     if is_anonymous:
         flash("Thanks for your submission - Join in to make changes.", "success")
@@ -820,9 +812,6 @@ def project_autoupdate(project_id):
         flash("You may not sync this project.", "warning")
         return redirect(url_for("project.project_view", project_id=project_id))
 
-    # Check if we already have content
-    has_autotext = project.autotext and len(project.autotext) > 1
-
     # Instruct user about certain links
     if project.autotext_url.startswith("https://docs.google.com/document") and (
         project.autotext_url.endswith("/edit") or "/edit#" in project.autotext_url
@@ -830,30 +819,9 @@ def project_autoupdate(project_id):
         flash("The Publish link should be used for a Google Doc", "warning")
         return redirect(url_for("project.project_view", project_id=project_id))
 
-    # Start update process
-    data = GetProjectData(project.autotext_url, True)
-    if not data or "name" not in data:
-        flash("Could not Sync: check that your README location is public.", "warning")
-        return redirect(url_for("project.project_view", project_id=project_id))
-
-    # Transfer the project fields
-    SyncProjectData(project, data)
-
-    # Confirmation messages
-    if project.autotext and len(project.autotext) > 1:
-        project_action(
-            project.id,
-            "update",
-            action="sync",
-            text=str(len(project.autotext)) + " bytes",
-        )
-        if not has_autotext:
-            flash("The latest data from %s has been synced." % data["type"], "dark")
-        else:
-            flash("Data from %s has been refreshed." % data["type"], "dark")
-    else:
-        flash("Could not sync: remote README is empty.", "warning")
-
+    # Start update process in the background
+    job = enqueue("sync-project", user=current_user, project_id=project.id)
+    flash_job(job, "Syncing with %s - refresh in a moment." % project.autotext_url)
     return redirect(url_for("project.project_view", project_id=project_id))
 
 
@@ -868,8 +836,9 @@ def project_toggle(project_id):
         flash("You do not have permission to change visibility.", "warning")
         return redirect(purl)
     project.is_hidden = not project.is_hidden
+    project.update_team_scores()
     project.save()
-    cache.clear()
+    invalidate_project(project)
     if project.is_hidden:
         flash('Project "%s" is now hidden.' % project.name, "success")
     else:
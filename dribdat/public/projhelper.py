@@ -19,8 +19,10 @@ from dribdat.user import (
 from dribdat.utils import (
     unpack_csvlist, pack_csvlist,
 )
+from dribdat.apiutils import get_projects_data
 from dribdat.database import db
-from dribdat.extensions import cache
+from sqlalchemy import func
+from dribdat.caching import invalidate_project
 from dribdat.futures import UTC
 
 
@@ -45,7 +47,7 @@ def bootstraps_by_stage(progress=None, limit=None):
     for eid in bootstrap_events:
         projects = Project.query.filter_by(
             event_id=eid, is_hidden=False, progress=progress)
-        project_list.extend([p.data for p in projects.all()])
+        project_list.extend(get_projects_data(projects))
     if limit is not None:
         return project_list[:limit]
     return project_list
@@ -62,7 +64,7 @@ def templates_from_event(bootstrap_event=False):
     for eid in template_events:
         projects = Project.query.filter_by(
             event_id=eid, is_hidden=False)
-        project_list.extend([p.data for p in projects.all()])
+        project_list.extend(get_projects_data(projects))
     return project_list
 
 
@@ -120,7 +122,7 @@ def project_edit_action(project_id, detail_view=False):
         project.update_now()
         db.session.add(project)
         db.session.commit()
-        cache.clear()
+        invalidate_project(project)
 
         # Create an optional post update
         if 'note' in form and form.note.data:
@@ -241,34 +243,46 @@ def revert_project_by_activity(project, activity):
     return revert_to, 'Project data reverted to version %d.' % revert_to
 
 
+def event_projects_ordered(event_id):
+    """Visible projects of an event, by identity (if used), or alphabetically."""
+    # This is the order of the projects in the event view
+    return Project.query \
+        .filter_by(event_id=event_id, is_hidden=False) \
+        .filter(Project.progress >= 0) \
+        .order_by(Project.ident, Project.name, Project.id)
+
+
 def navigate_around_project(project, as_challenge=False):
     """Returns previous and next projects in the default order."""
     go_nav = {}
-    # Sort visible projects by identity (if used), or alphabetically
-    projects = Project.query \
-        .filter_by(event_id=project.event_id, is_hidden=False)
-    projects = projects.filter(Project.progress >= 0)
-    projects = projects.order_by(Project.ident, Project.name)
-        # The above must match views->event
-    p_prev = p_next = p_found = None
-    for p in projects:
-        if p_found:
-            p_next = p
-            break
-        elif p.id == project.id:
-            p_found = True
-        else:
-            p_prev = p
-    if p_prev:
-        go_nav['prev'] = p_prev.data
-        go_nav['prev']['url'] = '/' + p_prev.url
-        if as_challenge:
-            go_nav['prev']['url'] = '/' + p_prev.url + '/challenge'
-    if p_next:
-        go_nav['next'] = p_next.data
-        go_nav['next']['url'] = '/' + p_next.url
-        if as_challenge:
-            go_nav['next']['url'] = '/' + p_next.url + '/challenge'
-    elif not p_prev:
+    if project.id is None:
+        # Pending projects only get their id on flush
+        db.session.flush()
+    # Find both neighbours with a single window query
+    order_by = (Project.ident, Project.name, Project.id)
+    ordering = event_projects_ordered(project.event_id).with_entities(
+        Project.id,
+        func.lag(Project.id).over(order_by=order_by).label('prev_id'),
+        func.lead(Project.id).over(order_by=order_by).label('next_id'),
+    ).order_by(None).subquery()
+    found = db.session.query(ordering.c.prev_id, ordering.c.next_id) \
+        .filter(ordering.c.id == project.id).first()
+    if found:
+        prev_id, next_id = found
+    else:
+        # Projects outside the listing only link back to the last one
+        last = event_projects_ordered(project.event_id) \
+            .order_by(None) \
+            .order_by(*[c.desc() for c in order_by]) \
+            .with_entities(Project.id).first()
+        prev_id, next_id = (last[0] if last else None), None
+    if not prev_id and not next_id:
         return None
+    neighbours = Project.query.filter(Project.id.in_([prev_id, next_id])).all()
+    for p, data in zip(neighbours, get_projects_data(neighbours)):
+        nav = 'prev' if p.id == prev_id else 'next'
+        go_nav[nav] = data
+        go_nav[nav]['url'] = '/' + p.url
+        if as_challenge:
+            go_nav[nav]['url'] = '/' + p.url + '/challenge'
     return go_nav
@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 """Helper functions for user lists."""
 
-from dribdat.user.models import User, Activity, Role
+from dribdat.user.models import (
+    User, Activity, Role, Skill, users_roles, users_skills, users_wishes,
+)
 from urllib.parse import quote, quote_plus
 from flask import flash
 from dribdat.database import db
 from sqlalchemy import func, case
 
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, select, union
 
 import re
 
@@ -20,18 +22,30 @@ def get_users_by_search(search_by, MAX_COUNT=200):
     """Collects all users."""
     if not search_by or len(search_by) < 3:
         return []
+    return search_users(search_by).limit(MAX_COUNT).all()
+
+
+def search_users(search_by):
+    """Query active users by skill, role, name or profile, sorted by username."""
     users = User.query.filter_by(active=True)
     q = search_by.replace("@", "").replace("*", "").replace("~", "")
     q = "%%%s%%" % q.lower()
     if search_by.startswith("*"):
-        # We are looking for a skill
-        users = users.filter(or_(User._my_skills.ilike(q), User._my_wishes.ilike(q)))
+        # We are looking for a skill, via the (small) list of skill names
+        skill_ids = select(Skill.id).where(Skill.name.like(q))
+        skilled = union(
+            select(users_skills.c.user_id).where(
+                users_skills.c.skill_id.in_(skill_ids)),
+            select(users_wishes.c.user_id).where(
+                users_wishes.c.skill_id.in_(skill_ids)),
+        )
+        users = users.filter(User.id.in_(skilled))
     elif search_by.startswith("~"):
         # We are looking for a role
-        a_role = Role.query.filter(Role.name.ilike(q)).first()
-        if not a_role:
-            return []
-        users = users.filter(User.roles.contains(a_role))
+        role_ids = select(Role.id).where(Role.name.ilike(q))
+        users = users.filter(User.id.in_(
+            select(users_roles.c.user_id).where(
+                users_roles.c.role_id.in_(role_ids))))
     elif "@" in search_by:
         # Looking for a username or email
         users = users.filter(
@@ -51,11 +65,7 @@ def get_users_by_search(search_by, MAX_COUNT=200):
                 User.fullname.ilike(q),
             )
         )
-    if not users:
-        return []
-    # Filter to active, limit, sort
-    users = users.limit(MAX_COUNT).all()
-    return sorted(users, key=lambda x: x.username)
+    return users.order_by(User.username)
 
 
 def get_dribs_paginated(page=1, per_page=10, host_url=""):
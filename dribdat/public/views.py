@@ -24,11 +24,13 @@ from dribdat.public.userhelper import (
     get_contributor_stats,
 )
 from dribdat.public.forms import EventNew, EventEdit
-from dribdat.public.projhelper import current_event
+from dribdat.public.projhelper import current_event, event_projects_ordered
 from dribdat.database import db
 from dribdat.mailer import notify_admin
 from dribdat.extensions import cache
+from dribdat.caching import invalidate_event
 from dribdat.aggregation import GetEventUsers
+from dribdat.apiutils import get_projects_data
 from urllib.parse import urlparse
 from sqlalchemy import and_, func
 from datetime import datetime, timedelta
@@ -323,10 +325,10 @@ def event(event_id):
     # Redirect bootstrap type events
     if event.lock_resources:
         return event_bootstraps(event_id)
-    # Sort visible projects by identity (if used), or alphabetically
-    projects = Project.query.filter_by(event_id=event_id, is_hidden=False)
-    # Do not show unapproved challenges here
-    projects = projects.filter(Project.progress >= 0)
+    # Sort visible projects by identity (if used), or alphabetically,
+    # without showing unapproved challenges here
+    projects = event_projects_ordered(event_id)
+    # NB: the same order is used by projhelper->navigate_around_project
     # Admin messages
     editable = False
     if current_user and not current_user.is_anonymous:
@@ -334,9 +336,6 @@ def event(event_id):
         editable = current_user.is_admin or event.user == current_user
         if not isUserActive(current_user):
             flash(USER_UNDER_REVIEW_MESSAGE, "warning")
-    # Order by ident then name
-    projects = projects.order_by(Project.ident, Project.name)
-    # NB: the above must match projhelper->navigate_around_project
     # Embedding view
     if request.args.get("embed"):
         return render_template(
@@ -346,12 +345,9 @@ def event(event_id):
     if event.instruction and "---" in event.instruction:
         event.instruction = event.instruction.split("---")[0]
     # Recommend projects
-    summaries = []
-    suggestions = []
-    for project in projects:
-        summaries.append(project.data)
-        if project.needs_members:
-            suggestions.append(project)
+    projects = projects.all()
+    summaries = get_projects_data(projects)
+    suggestions = [p for p in projects if p.needs_members]
     # Check for certificate
     may_certify = event.has_finished and event.certificate_path
     if may_certify:
@@ -425,13 +421,14 @@ def event_stages(event_id):
     projects = Project.query.filter_by(event_id=event.id, is_hidden=False).order_by(
         Project.ident, Project.name
     )
+    counts = Project.get_activity_counts([p.id for p in projects])
     for s in steps:
         if "projects" not in s:
             s["projects"] = []
         project_list = []
-        for p in projects.filter_by(progress=s["id"]).all():
-            pp = p.data
-            pp["stats"] = p.get_stats()
+        stage_projects = projects.filter_by(progress=s["id"]).all()
+        for p, pp in zip(stage_projects, get_projects_data(stage_projects)):
+            pp["stats"] = p.get_stats(counts)
             pp["age"] = p.created_at
             project_list.append(pp)
         s["projects"].extend(project_list)
@@ -579,7 +576,7 @@ def event_new():
                 )
             else:
                 flash("A new event has been planned!", "success")
-            cache.clear()
+            invalidate_event(event.id)
             return redirect(url_for("public.event", event_id=event.id))
     if not current_user.is_admin:
         flash(
@@ -610,7 +607,7 @@ def event_edit(event_id):
         db.session.add(event)
         db.session.commit()
 
-        cache.clear()
+        invalidate_event(event.id)
 
         flash("Saved your event.", "success")
         return redirect(url_for("public.event", event_id=event.id))
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Full-text search of projects."""
+
+import re
+
+from sqlalchemy import (
+    DDL, Float, Integer, event, func, inspect, literal_column, or_, text
+)
+from sqlalchemy.orm import Session
+
+from .database import db
+from .user.models import Project
+
+# Indexed columns, in order of relevance
+SEARCH_COLUMNS = ("name", "summary", "longtext", "autotext")
+SEARCH_WEIGHTS = ("A", "B", "C", "D")
+FTS_TABLE = "projects_fts"
+FTS_RANKING = "bm25(%s, 10.0, 5.0, 1.0, 1.0)" % FTS_TABLE
+
+
+def search_vector():
+    """Weighted text search vector of a project (PostgreSQL)."""
+    # Constants are inlined, so that queries match the index expression
+    vector = None
+    for col, weight in zip(SEARCH_COLUMNS, SEARCH_WEIGHTS):
+        part = func.setweight(
+            func.to_tsvector(
+                literal_column("'simple'"),
+                func.coalesce(Project.__table__.c[col], literal_column("''")),
+            ),
+            literal_column("'%s'" % weight),
+        )
+        vector = part if vector is None else vector.op("||")(part)
+    return vector
+
+
+# The GIN index keeps itself in sync with the projects table
+search_index = db.Index(
+    "ix_projects_search", search_vector(), postgresql_using="gin"
+).ddl_if(dialect="postgresql")
+Project.__table__.append_constraint(search_index)
+
+# In SQLite, the FTS5 table is maintained from the session (see below)
+event.listen(
+    Project.__table__,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5(%s, "
+        "tokenize='unicode61 remove_diacritics 2')"
+        % (FTS_TABLE, ", ".join(SEARCH_COLUMNS))
+    ).execute_if(dialect="sqlite"),
+)
+event.listen(
+    Project.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS %s" % FTS_TABLE).execute_if(dialect="sqlite"),
+)
+
+# Engines on which the FTS5 table is known to exist
+_fts_engines = set()
+
+
+def has_fts_table(connection):
+    """Check that the SQLite full-text index has been set up."""
+    if connection.dialect.name != "sqlite":
+        return False
+    key = str(connection.engine.url)
+    if key not in _fts_engines:
+        found = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"),
+            {"name": FTS_TABLE},
+        ).first()
+        if not found:
+            return False
+        _fts_engines.add(key)
+    return True
+
+
+def search_terms(q):
+    """Split a query into plain words, dropping any search syntax."""
+    return re.findall(r"\w+", q or "")
+
+
+def search_projects(q, page=1, per_page=10):
+    """Find visible projects by relevance, returning a page and a flag for more."""
+    terms = search_terms(q)
+    if not terms:
+        return [], False
+    query = Project.query.filter(Project.is_hidden == False)  # noqa: E712
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql":
+        tsquery = func.to_tsquery(
+            literal_column("'simple'"), " & ".join(["%s:*" % t for t in terms]))
+        vector = search_vector()
+        query = query \
+            .filter(vector.op("@@")(tsquery)) \
+            .order_by(func.ts_rank(vector, tsquery).desc(), Project.id)
+    elif has_fts_table(connection):
+        matches = text(
+            "SELECT rowid AS id, %s AS rank FROM %s WHERE %s MATCH :match"
+            % (FTS_RANKING, FTS_TABLE, FTS_TABLE)
+        ).bindparams(
+            match=" ".join(['"%s"*' % t for t in terms])
+        ).columns(id=Integer, rank=Float).subquery()
+        query = query \
+            .join(matches, matches.c.id == Project.id) \
+            .order_by(matches.c.rank, Project.id)
+    else:
+        # Fall back to a (slow) pattern search
+        like = "%%%s%%" % q
+        query = query.filter(or_(
+            *[getattr(Project, col).ilike(like) for col in SEARCH_COLUMNS]
+        )).order_by(Project.id)
+    projects = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+    return projects[:per_page], len(projects) > per_page
+
+
+def index_projects(connection, projects):
+    """Write the text of projects to the SQLite full-text index."""
+    ids = [{"id": p.id} for p in projects]
+    if not ids:
+        return
+    connection.execute(
+        text("DELETE FROM %s WHERE rowid = :id" % FTS_TABLE), ids)
+    connection.execute(
+        text("INSERT INTO %s (rowid, %s) VALUES (:id, %s)" % (
+            FTS_TABLE,
+            ", ".join(SEARCH_COLUMNS),
+            ", ".join([":" + col for col in SEARCH_COLUMNS]),
+        )),
+        [dict(id=p.id, **{col: getattr(p, col) for col in SEARCH_COLUMNS})
+         for p in projects],
+    )
+
+
+def reindex_projects():
+    """Rebuild the full-text index from scratch, returning the project count."""
+    connection = db.session.connection()
+    count = Project.query.count()
+    if connection.dialect.name == "postgresql":
+        search_index.create(connection, checkfirst=True)
+        connection.execute(text("REINDEX INDEX %s" % search_index.name))
+    elif connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS %s" % FTS_TABLE))
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE %s USING fts5(%s, "
+            "tokenize='unicode61 remove_diacritics 2')"
+            % (FTS_TABLE, ", ".join(SEARCH_COLUMNS))))
+        connection.execute(text(
+            "INSERT INTO %s (rowid, %s) SELECT id, %s FROM projects"
+            % (FTS_TABLE, ", ".join(SEARCH_COLUMNS), ", ".join(SEARCH_COLUMNS))))
+    db.session.commit()
+    return count
+
+
+@event.listens_for(Session, "after_flush")
+def update_search_index(session, flush_context):
+    """Keep the SQLite full-text index in step with saved projects."""
+    changed = [
+        obj for obj in session.new.union(session.dirty)
+        if isinstance(obj, Project) and (obj in session.new or any(
+            inspect(obj).attrs[col].history.has_changes()
+            for col in SEARCH_COLUMNS
+        ))
+    ]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Project)]
+    if not changed and not deleted:
+        return
+    connection = session.connection()
+    if not has_fts_table(connection):
+        return
+    if deleted:
+        connection.execute(
+            text("DELETE FROM %s WHERE rowid = :id" % FTS_TABLE),
+            [{"id": p.id} for p in deleted])
+    index_projects(connection, changed)
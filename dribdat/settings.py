@@ -4,6 +4,7 @@
 # Documentation: https://dribdat.cc/deploy.html#features
 
 import os
+import tempfile
 from dotenv import load_dotenv
 from json import loads
 from .utils import strtobool
@@ -86,6 +87,35 @@ class Config(object):
     TIME_ZONE = os_env.get("TIME_ZONE", "UTC")
     MAX_CONTENT_LENGTH = int(os_env.get("MAX_CONTENT_LENGTH", 1 * 1024 * 1024))
 
+    # Requests to remote services
+    HTTP_TIMEOUT = float(os_env.get("HTTP_TIMEOUT", 10))
+    HTTP_RETRIES = int(os_env.get("HTTP_RETRIES", 3))
+    HTTP_BACKOFF = float(os_env.get("HTTP_BACKOFF", 0.5))
+    HTTP_POOL_SIZE = int(os_env.get("HTTP_POOL_SIZE", 10))
+    # Seconds to keep API responses for revalidation with their ETag
+    HTTP_CACHE_TIMEOUT = int(os_env.get("HTTP_CACHE_TIMEOUT", 7 * 24 * 60 * 60))
+
+    # Mirrors of git repositories, and their total size in megabytes
+    GIT_MIRROR_DIR = os_env.get(
+        "GIT_MIRROR_DIR", os.path.join(tempfile.gettempdir(), "dribdat-git")
+    )
+    GIT_MIRROR_SIZE = int(os_env.get("GIT_MIRROR_SIZE", 500))
+    GIT_TIMEOUT = int(os_env.get("GIT_TIMEOUT", 120))
+
+    # Background jobs run in a 'thread' of the web server, in an 'external'
+    # worker process (./cli.py worker), or 'inline' during the request
+    JOB_WORKER = os_env.get("JOB_WORKER", "thread")
+    JOB_ATTEMPTS = int(os_env.get("JOB_ATTEMPTS", 3))
+    JOB_BACKOFF = int(os_env.get("JOB_BACKOFF", 30))
+    # Seconds to keep finished jobs, before they are deleted
+    JOB_RETENTION = int(os_env.get("JOB_RETENTION", 7 * 24 * 60 * 60))
+
+    # Scheduled syncing of projects (./cli.py autosync), with the intervals
+    # in seconds, and a limit of syncs per minute
+    AUTOSYNC_MIN_INTERVAL = int(os_env.get("AUTOSYNC_MIN_INTERVAL", 15 * 60))
+    AUTOSYNC_MAX_INTERVAL = int(os_env.get("AUTOSYNC_MAX_INTERVAL", 24 * 60 * 60))
+    AUTOSYNC_PER_MINUTE = int(os_env.get("AUTOSYNC_PER_MINUTE", 30))
+
     # Configure an external LLM API
     LLM_MODEL = os_env.get("LLM_MODEL", "local-model")  # e.g. gpt-3.5-turbo
     LLM_TITLE = LLM_MODEL.upper().replace("_", " ").split("/")[-1]
@@ -180,3 +210,4 @@ class TestConfig(Config):
     WTF_CSRF_ENABLED = False  # Allows form testing
     PRESERVE_CONTEXT_ON_EXCEPTION = False
     DRIBDAT_ALLOW_EVENTS = True  # Allows anyone to create an event
+    JOB_WORKER = "inline"  # Run background jobs right away
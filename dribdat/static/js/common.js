@@ -0,0 +1,68 @@
+(function($,window){if(window.location.pathname.endsWith('/log')){$('#dribs-tab-md').click();}
+$('[data-bs-toggle="popover"]').click(function(triggerEl){return new bootstrap.Popover(triggerEl)});$('[data-toggle="modal"]').click(function(triggerEl){return new bootstrap.Modal(triggerEl)});$('#next-dribs').click(function(e){e.preventDefault();e.stopPropagation();var $self=$(this);if($self.hasClass('disabled'))return;$self.addClass('disabled');$.get($self.attr('href'),function(d){$('section.timeline').append($(d).find('section.timeline').html());$next=$(d).find('#next-dribs');if($next.length){$self.removeClass('disabled').attr('href',$next.attr('href'));}else{$self.removeClass('btn-primary').html('BOF');}});})
+$('.project-home .project-image-container').each(function(){var $self=$(this);var url=$self.data('href');if(url.length<6)return;var img=new Image();img.onload=function(){if(this.width>this.height>512||this.width>640)
+return $self.addClass('overlay');this.id='overlayImage';$self.addClass('underlay').after(this);}
+img.src=url;});function delay(callback,ms){var timer=0;return function(){var context=this,args=arguments;clearTimeout(timer);timer=setTimeout(function(){callback.apply(context,args);},ms||0);};}
+function dateFormat(dt){let d=new Date(Date.parse(dt.replace(' ','T')));return d.getDate()+'.'+(d.getMonth()+1)+'.'+d.getFullYear();}
+var lastSearch=null;var searchForm=$('#search');var searchHolder=$('#navSearch');var searchAction=searchForm.data('action');var searchIgnore=searchForm.find('#id').val();searchForm.find('input[name="q"]').keyup(delay(function(e){if(e.keyCode==13){e.preventDefault();return false;}
+runSearch($(this).val());},500));$('#navSearchButton').click(function(e){e.preventDefault();e.stopPropagation();searchHolder.toggleClass('hidden');});function runSearch(q){if(q.length<4||q.trim()==lastSearch)return;lastSearch=q.trim();$.get(searchAction+'?q='+q,function(d){var projects=d.projects;if(typeof searchIgnore!==undefined&&searchIgnore){const si=parseInt(searchIgnore);projects=projects.filter(function(d){return d.id!==si});}
+$ul=$('#search-results').empty();$sm=$('#search-matches').empty().addClass('hidden');if(projects.length>0){$ul.parent().removeClass('hidden');$sm.html('<span class="user-score">'+(projects.length)+'</span> matches').removeClass('hidden');}else{$ul.parent().addClass('hidden');$sm.html('Zero cool projects found :(').removeClass('hidden');}
+projects.forEach(function(p){$ul.append('<tr data-href="'+p.url+'">'+
+'<th scope="row">'+p.name+'<sm>'+p.summary+'</sm></th>'+
+'<td><tt>'+p.event_name.substr(0,20)+'</tt>'+
+'<br>'+dateFormat(p.updated_at)+'</td>'+
+'</tr>');});enableClickableRows();});}
+function checkSearchQuery(){let paramString=(new URL(document.location)).searchParams;let searchParams=new URLSearchParams(paramString);if(searchParams.has("q")){let q=searchParams.get("q");searchForm.find('input[name="q"]').val(q);runSearch(q);}}
+var $navCategories=$('.nav-categories .btn-group label').click(function(e){$(this).parent().find('.active').removeClass('active');$(this).parent().addClass('active');var selected_id=$(this).find('input').attr('id');var $projects=$('.honeycomb .hexagon');var $infotext=$('.category-info');$('.honeycomb').removeClass('hide-challenges');if(selected_id===''||selected_id==='list'||selected_id==='challenges'){$projects.addClass('category-highlight');$('.category-container',$infotext).hide();$projects.removeClass('hexagon hexalist').addClass(selected_id==='list'?'hexalist':'hexagon');if(selected_id!=='')
+$('.honeycomb').addClass('hide-challenges');}else{var $selected=$('[category-id="'+selected_id+'"]',$projects.parent());$projects.removeClass('category-highlight');$selected.addClass('category-highlight');$('.category-container',$infotext).hide();$('[category-id="'+selected_id+'"]',$infotext).show();}});function enableClickableRows(){$("tr[data-href]").click(function(){window.location=$(this).data("href");});}
+$('#embed-link').click(function(e){e.preventDefault();e.stopPropagation();var url=$(this).attr('href')+'?embed=1';var code='<iframe src="'+url+'" style="width:100%;height:320px;background:transparent;border:none;overflow:hidden" scrolling="no"></iframe>';window.prompt('Copy and paste this HTML code to embed challenges on your site. Visit dribdat/backboard for another option.',code);});$('#invite-link').each(function(){var urlContent=$(this).parent().find('input').val();$(this).click(function(e){e.preventDefault();e.stopPropagation();$(this).tooltip({'title':'Copied'}).tooltip('show');if('clipboard'in navigator){return navigator.clipboard.writeText(urlContent);}else{return document.execCommand('copy',true,urlContent);}}).css({'cursor':'pointer'});});$('.profile-projects .row').each(function(){const ele=$(this)[0];ele.style.cursor='grab';let pos={top:0,left:0,x:0,y:0};const mouseDownHandler=function(e){ele.style.cursor='grabbing';ele.style.userSelect='none';pos={left:ele.scrollLeft,top:ele.scrollTop,x:e.clientX,y:e.clientY,};document.addEventListener('mousemove',mouseMoveHandler);document.addEventListener('mouseup',mouseUpHandler);};const mouseMoveHandler=function(e){const dx=e.clientX-pos.x;const dy=e.clientY-pos.y;ele.scrollTop=pos.top-dy;ele.scrollLeft=pos.left-dx;};const mouseUpHandler=function(){ele.style.cursor='grab';ele.style.removeProperty('user-select');document.removeEventListener('mousemove',mouseMoveHandler);document.removeEventListener('mouseup',mouseUpHandler);};ele.addEventListener('mousedown',mouseDownHandler);});$('#show-history').click(function(e){e.preventDefault();e.stopPropagation();$('.details .history').slideDown();});$('.details .history').hide();$('#qrcode').each(function(){new QRCode(this,{text:$(this).data('href'),width:192,height:192,});});$('#autoprompt').click(function(){var apiUrl=$(this).data('api');$(this).after('<textarea rows="3" style="width:100%" id="autoprompt"></textarea>');$(this).remove();$.get(apiUrl,function(d){let $ap=$('#autoprompt').val(d);if(navigator.clipboard){navigator.clipboard.writeText(d);$ap.after('<tt>✅ Copied to clipboard</tt>');}});});let hasLightbox=false;$('.project-longtext, .project-autotext, .timeline .content').each(function(){$(this).find('img').each(function(){const imgtag=$(this);const mysrc=imgtag.attr('src');if(imgtag.parent().tagName!=='A'){imgtag.wrap('<a title="🔍" href="'+mysrc+'"></a>');imgtag.parent().addClass('lightboxed');hasLightbox=true;}});});if(hasLightbox){let gallery=new SimpleLightbox('.lightboxed');}
+$('#issues-list').each(function(){var per_page=5;var $self=$(this);var userAndRepo=$self.data('github');var url_api='https://api.github.com/repos/'+userAndRepo+'/issues';var url_www='https://github.com/'+userAndRepo+'/issues';$.getJSON(url_api+'?per_page='+(per_page+1),function(data){$self.empty();$.each(data,function(index){if(index==per_page){return;}
+$self.append('<a href="'+this.html_url+
+'" class="list-group-item" target="_blank">'+
+'<img src="'+this.user.avatar_url+'">&nbsp;'+this.title+'</a>');});});});function setDarkMode(toggle){dm=Boolean(window.darkmode);if(toggle)dm=!dm;$css=$('#css-bootswatch').first();if(dm){$('html').attr('data-bs-theme','dark');$('body').addClass('theme-dark');$('nav.navbar').removeClass('navbar-light');$('nav.navbar').addClass('navbar-dark');$('footer .darkmode span').html('Light');}else{$('html').removeAttr('data-bs-theme');$('body').removeClass('theme-dark');$('nav.navbar').removeClass('navbar-dark');$('nav.navbar').addClass('navbar-light');$('footer .darkmode span').html('Dark');}
+localStorage.setItem('darkmode',dm?'1':'0');window.darkmode=dm;}
+window.darkmode=localStorage.getItem('darkmode')=='1';setDarkMode(false);$('.darkmode').click(function(e){e.preventDefault();e.stopPropagation();setDarkMode(true);});function init_clock(){$('.event-countdown').each(function(){var startdate=$(this).data('start');var datenow=Date.now();var datesched=Date.parse(startdate.replace(' ','T'));var timeleft=datesched-datenow;if(isNaN(timeleft)||timeleft<0)return;var unixtime=datesched/1000;new FlipDown(unixtime,$(this).attr('id')).start();});$('.carousel').each(function(){new bootstrap.Carousel($(this));});}
+init_clock();checkSearchQuery();enableClickableRows();}).call(this,jQuery,window);(function($,window){$("#autotext_url").each(function(){var checkAutotext=function(val,$ind){if(typeof val!=="string")return;if(val.trim()==="")return;$ind.find("i").removeClass("fa-circle-o fa-check-circle-o").addClass("fa-circle-o").css("color","red");$("#is_autoupdate").click(function(){if($(this).is(":checked"))
+if(!$indicator.find("button").click())$(this).click();});};var $inputfield=$(this);var $indicator=$inputfield.parent().prepend('<span class="autotext-indicator float-right">'+
+'<a title="Status" class="btn-disabled me-1"><i class="fa fa-circle-o"></i></a>'+
+'<button class="btn btn-light" type="button">?</button>'+
+"</span>",).find(".autotext-indicator");var $inputbutton=$indicator.find("button");var runAutofill=function($button,url){$indicator.find("i").css("color","blue");$button.attr("disabled","disabled").html("Testing ...");$.getJSON("/api/project/autofill?url="+url,function(data){$button.removeAttr("disabled");if(!data||typeof data.name==="undefined"||data.name===""){$("div.import-note").removeClass('hidden');$("#is_autoupdate").prop("checked",false);$indicator.find("i").css("color","red");$button.html("Retry");return;}
+$button.html("Ready");$indicator.find("i").removeClass("fa-circle-o fa-check-circle-o").addClass("fa-check-circle-o").css("color","green");if(!$("input#name").val())$("input#name").val(data.name);if(!$("input#summary").val())$("input#summary").val(data.summary);if(!$("input#webpage_url").val())
+$("input#webpage_url").val(data.webpage_url);if(!$("input#source_url").val())
+$("input#source_url").val(data.source_url);if(!$("input#contact_url").val())
+$("input#contact_url").val(data.contact_url);if(!$("input#download_url").val())
+$("input#download_url").val(data.download_url);if(!$("input#image_url").val())
+$("input#image_url").val(data.image_url);$("#submit").removeAttr("disabled");}).fail(function(){window.alert("Could not connect to remote site - please try again later",);$button.removeAttr("disabled").html("Retry");});};checkAutotext($inputfield.val(),$indicator);$inputfield.on("keyup",function(e){checkAutotext($inputfield.val(),$indicator);$(".template-select label input").prop("checked",false);});const ms_timeout=1000;$inputfield.on("input",function(e){e.preventDefault();e.stopPropagation();$inputfield.data('updated',new Date().getTime());setTimeout(()=>{if(new Date().getTime()-ms_timeout>=$inputfield.data('updated')){var url=$inputfield.val();runAutofill($inputbutton,url);}},ms_timeout);});$inputbutton.click(function(e){e.preventDefault();e.stopPropagation();var url=$inputfield.val();runAutofill($inputbutton,url);});});if($(".projectpost .stage-conditions .stage-no").length==0){$('.form-project-post label[for="has_progress"] input').attr('checked',true);}else{$('.form-project-post label[for="has_progress"]').parent().hide();}
+$("input#logo_color[type=text]").attr("type","color");$(".project-autotext").click(function(){$(this).addClass("active");});$(".template-select label input").change(function(){$("input#template").val($(this).val());$("#autotext_url").val("");});$("#uploadImage").each(function(){var $dialog=$(this);var $togglebtn=$('button[data-bs-target="#uploadImage"]');var $longtext=$(".fld-longtext");if($longtext.length>0){$longtext.prepend($togglebtn.clone().show());}else{$dialog.find("[data-target='pitch']").hide();}
+var $imageurl=$(".fld-image_url,.fld-logo_url");if($imageurl.length>0){$imageurl.append($togglebtn.clone().show());}else{$dialog.find("[data-target='cover']").hide();}
+var $postnote=$(".fld-note");if($postnote.length>0&&$("body").hasClass("projectpost")){$postnote.prev().prepend($togglebtn.clone().show());}else{$dialog.find("[data-target='post']").hide();}
+var $inputfd=$dialog.find('input[type="file"]');$inputfd.change(function(){var imgfile=$inputfd[0].files[0];var maxsize=parseInt($inputfd.data("maxsize"));if(imgfile.size>maxsize){return alert("Please upload a smaller file (reduce resolution, save as JPEG)",);}
+var fdd=new FormData();fdd.append("file",imgfile);$.ajax({url:"/api/project/uploader",type:"post",data:fdd,processData:false,contentType:false,success:function(response){if(response.indexOf("http")!==0){return alert("File could not be uploaded :(\n"+response);}
+$dialog.find(".preview img").attr("src",response);$dialog.find(".preview input").val(response);$dialog.find(".hidden").show();$("#img-confirm").show().find("button").off("click").click(function(){if($(this).data("target")=="cover"){$("#image_url,#logo_url").val(response);$dialog.modal("hide");}else if($(this).data("target")=="post"){var imglink="![]("+response+")";if(typeof window.Editor!=="undefined"){window.Editor.codemirror.replaceRange(imglink,{line:Infinity});}else{$("#note").val(imglink+" "+$("#note").val());}
+$dialog.modal("hide");}else if($(this).data("target")=="pitch"){var filename=response.split(/(\\|\/)/g).pop().replaceAll("_"," ");var imglink="!["+filename+"]("+response+")";if(typeof window.Editor!=="undefined"){window.Editor.codemirror.replaceRange(imglink,{line:Infinity});}else{$("#longtext").val($("#longtext").val()+"\n\n"+imglink);}
+$dialog.modal("hide");}else{if(navigator.clipboard){navigator.clipboard.writeText(response);$dialog.modal("hide");}else{$dialog.find(".preview input").click().select();document.execCommand("copy");}}});},error:function(e){alert("Sorry, an error has occurred.\n"+e.statusText);},});});});$("#uploadFile").each(function(){var $dialog=$(this);var $togglebtn=$('button[data-bs-target="#uploadFile"]');var $webpageurl=$(".fld-webpage_url");$webpageurl.prepend($togglebtn.clone().show());var $inputfd=$dialog.find('input[type="file"]');$inputfd.change(function(){var thefile=$inputfd[0].files[0];var maxsize=parseInt($inputfd.data("maxsize"));if(thefile.size>maxsize){return alert("Please upload a smaller file (1 MB limit)");}
+var fdd=new FormData();fdd.append("file",thefile);$.ajax({url:"/api/project/uploader",type:"post",data:fdd,processData:false,contentType:false,success:function(response){if(response.indexOf("http")!==0){return alert("File could not be uploaded :(\n"+response);}
+var filename=response.split(/(\\|\/)/g).pop().replaceAll("_"," ");var fileext=filename.split(".").pop().toLowerCase();var filesize=Math.round(thefile.size/102.4)/10;filesize=filesize>1000?Math.round(filesize/102.4)/10+" MB":filesize+" KB";$dialog.find(".preview input").val(response);$dialog.find(".hidden").removeClass("hidden");$dialog.find(".file-preview").removeClass("hidden");$dialog.find(".file-preview .filename").html(filename);$dialog.find(".file-preview .filesize").html(filesize);$dialog.find(".file-preview .filetype *").addClass("hidden");if(filename.indexOf("datapackage.json")>0){$dialog.find(".file-preview .filetype-frictionless").removeClass("hidden");}else{$dialog.find(".file-preview .filetype-"+fileext).removeClass("hidden");}
+$("#file-confirm").show().find("button").off("click").click(function(){if($(this).data("target")=="weblink"){$("#webpage_url").val(response);$("#is_webembed:not(:checked)").click();$dialog.modal("hide");}else{if(navigator.clipboard){navigator.clipboard.writeText(response);$dialog.modal("hide");}else{$dialog.find(".preview input").click().select();document.execCommand("copy");}}});},error:function(e){alert("Sorry, an error has occurred.\n"+e.statusText);},});});});$("#uploadPackage").each(function(){var $dialog=$(this);var $togglebtn=$('button[data-bs-target="#uploadPackage"]');var $longtext=$(".fld-longtext");$longtext.prepend($togglebtn.clone().show());var $inputfd=$dialog.find('input[type="file"]');$inputfd.change(function(){var thefile=$inputfd[0].files[0];var maxsize=parseInt($inputfd.data("maxsize"));if(thefile.size>maxsize){return alert("Please upload a smaller file (1 MB limit)");}
+var fdd=new FormData();fdd.append("file",thefile);$.ajax({url:"/api/project/uploader",type:"post",data:fdd,processData:false,contentType:false,success:function(response){if(response.indexOf("http")!==0){return alert("File could not be uploaded :(\n"+response);}
+var filename=response.split(/(\\|\/)/g).pop().replaceAll("_"," ");var fileext=filename.split(".").pop().toLowerCase();var filesize=Math.round(thefile.size/102.4)/10;filesize=filesize>1000?Math.round(filesize/102.4)/10+" MB":filesize+" KB";$dialog.find(".preview input").val(response);$dialog.find(".hidden").removeClass("hidden");$dialog.find(".file-preview").removeClass("hidden");$dialog.find(".file-preview .filename").html(filename);$dialog.find(".file-preview .filesize").html(filesize);$dialog.find(".file-preview .filetype *").addClass("hidden");const isDataPackage=filename.indexOf("datapackage.json")>=0;if(isDataPackage){$dialog.find(".file-preview .filetype-frictionless").removeClass("hidden");}else{$dialog.find(".file-preview .filetype-"+fileext).removeClass("hidden");}
+$("#data-confirm").show().find("button").off("click").click(function(){if($(this).data("target")=="pitch"){if(typeof window.Editor!=="undefined"){if(isDataPackage){window.Editor.codemirror.replaceRange(response,{line:Infinity});}else{var linkmd='['+filename+']('+response+')';window.Editor.codemirror.replaceRange(linkmd,{line:Infinity});}}else{var fileLink="📎 ["+filename+"]("+response+")";if(isDataPackage){fileLink=response;}
+$("#longtext").val($("#longtext").val()+"\n\n"+fileLink);}
+$dialog.modal("hide");}else{if(navigator.clipboard){navigator.clipboard.writeText(response);$dialog.modal("hide");}else{$dialog.find(".preview input").click().select();document.execCommand("copy");}}});},error:function(e){alert("Sorry, an error has occurred.\n"+e.statusText);},});});});$("#uploadMedia").each(function(){var $dialog=$(this);var $togglebtn=$('button[data-bs-target="#uploadMedia"]');var $longtext=$(".fld-longtext");$longtext.prepend($togglebtn.clone().show());var $inputfd=$dialog.find('input[type="url"]');var $submitb=$dialog.find('button[data-target="insert"');$submitb.click(function(){var theurl=$inputfd.val();if(theurl.indexOf("https://")!==0){return window.alert("Invalid address");}
+theurl="\n"+theurl+"\n";if(typeof window.Editor!=="undefined"){window.Editor.codemirror.replaceRange(theurl,{line:Infinity});}else{theurl="\n"+theurl+"\n";$("#longtext").val($("#longtext").val()+theurl);}
+$dialog.modal("hide");});});$("#suggestTool").each(function(){var $dialog=$(this);var $togglebtn=$('button[data-bs-target="#suggestTool"]');var $targetfld=$(".fld-webpage_url");$targetfld.prepend($togglebtn.clone().show());var $inputfd=$dialog.find('input[type="url"]');var $submitb=$dialog.find('button[data-target="insert"');$submitb.click(function(){var theurl=$inputfd.val();if(theurl.indexOf("https://")!==0){return window.alert("Invalid address");}
+$("input",$targetfld).val(theurl);$dialog.modal("hide");});});$(".admin-defaults button").click(function(){$("input#name").val($(this).text());});$("#importEvent form").submit(function(e){var $form=$(this);if($form.find('input[type="file"]').val().length>0)return;e.preventDefault();var url=$form.attr("action");$form.find('input[type="submit"]').addClass("disabled");$form.find(".message-ok,.message-error,.buttons").hide();$form.find(".message-loading").show();$.ajax({type:"POST",url:url,data:$form.serialize(),success:function(data){$form.find(".buttons").show();$form.find(".message-loading").hide();if(data.status=="Error"){$form.find(".message-error").html(data.errors.join("\n")).show();}else{$form.find(".message-ok").show();}
+$form.find('input[type="submit"]').removeClass("disabled");},error:function(err){$form.find('input[type="submit"]').removeClass("disabled");console.error(err.statusText);$form.find(".buttons").show();$form.find(".message-error").show();},});});function activate_editor(){if(typeof EasyMDE!=="function")return;const $longtext=$("#longtext,#note").first();if(!$longtext.length)return;const is_note=$longtext.attr('id')=='note';$longtext.parents("form").submit(function(){$('#submit',this).addClass('disabled').attr('disabled','disabled');});const Editor=new EasyMDE({element:$longtext[0],autofocus:is_note,minHeight:is_note?"100px":"500px",spellChecker:false,sideBySideFullscreen:false});localStorage.setItem("markdownhelper","1");const $activateEditor=$("#activateEditor");$activateEditor.find('[data-do="activate"]').hide();$activateEditor.find('[data-do="reset"]').show().click(function(){if(window.confirm("Save changes first! Continue?")){localStorage.setItem("markdownhelper","0");window.location.reload();}});window.Editor=Editor;console.info("editor ready.");}
+function markRequired(){var control=$(this).find(".form-control");var label=$(this).children("label");if(control.attr("required")=="required"){label.addClass("required");}}
+function countCharacters(){var max=$(this).attr("maxlength");if(!max||max>1000)return;var length=$(this).val().length;var counter=max-length;var helper=$(this).next().find(".form-text");helper=helper.length?helper:$(this).next().append("<span class='form-text'></span>").find(".form-text");if(counter!==1){helper.text(counter+" bytes");}else{helper.text("All out of bytes!");}
+if(counter===0){helper.removeClass("text-muted");helper.addClass("text-danger");}else{helper.removeClass("text-danger");helper.addClass("text-muted");}}
+function init_forms(){$(".form-group").each(markRequired);$(".form-control").each(countCharacters);$(".form-control").keyup(countCharacters);}
+function init_editor(){const $activateEditor=$("#activateEditor");$activateEditor.find('[data-do="activate"]').show().on("click",activate_editor);if(localStorage.getItem("markdownhelper")===null){localStorage.setItem("markdownhelper","1");}
+if(localStorage.getItem("markdownhelper")=="1"){setTimeout(activate_editor,100);}}
+init_editor();init_forms();}).call(this,jQuery,window);(function($,window){let notificationsAllow=false;function askNotificationPermission(){if(!("Notification"in window)){console.log("This browser does not support notifications.");return;}
+Notification.requestPermission().then((permission)=>{notificationsAllow=permission==="granted";});}
+function createNotification(){if(localStorage.getItem('eventstatus-mute')){return;}
+askNotificationPermission();$.get('/api/event/current/get/status',function(result){if(result.status){let eventStatus=localStorage.getItem('eventstatus');if(eventStatus==result.status)return;eventStatus=result.status;localStorage.setItem('eventstatus',eventStatus);let htmlStatus=result.html;let eventName=result.event;$('#notifications-status-text').html(htmlStatus);$('#global-notifications-alert').removeClass('hidden');setTimeout(function(){let userOptOut=localStorage.getItem('eventstatus-mute');if(!userOptOut){const img="/static/img/logo/logo12_128x128.png";const txt=eventStatus.substr(0,20);const title=eventName;const notification=new Notification(title,{body:txt,icon:img});}
+},500);}});};if($('#notification-button').length>0){createNotification();setInterval(createNotification,60*1000);$('#notification-button').show().click(function(){let userOptOut=localStorage.getItem('eventstatus-mute');if(userOptOut){$('#notifications-status-text').html('You will now receive alerts');$('#global-notifications-alert').removeClass('hidden');localStorage.removeItem('eventstatus-mute');localStorage.removeItem('eventstatus');}else{localStorage.setItem('eventstatus-mute',1);$('#notifications-status-text').html('Alerts have been muted');$('#global-notifications-alert').removeClass('hidden');}
+setTimeout(function(){$('#global-notifications-alert').addClass('hidden');},3*1000);});}
+$('#event-instruction-tip').each(function(){if(localStorage.getItem('eventstatus-mute')){$(this).parent().parent().find('.btn-close').click();}});$('#global-notifications-alert .close').click(function(){$('#global-notifications-alert').addClass('hidden');});}).call(this,jQuery,window);
\ No newline at end of file
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 """Dribdat data schema."""
 
-from sqlalchemy import Table, or_, func
+from sqlalchemy import Table, and_, or_, case, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy_continuum import make_versioned
 from sqlalchemy_continuum.plugins import FlaskPlugin
 from flask import current_app
@@ -64,6 +65,23 @@ users_roles = Table(
     db.metadata,
     Column("user_id", db.Integer, db.ForeignKey("users.id"), primary_key=True),
     Column("role_id", db.Integer, db.ForeignKey("roles.id"), primary_key=True),
+    db.Index("ix_users_roles_role_user", "role_id", "user_id"),
+)
+
+# Set up user skills and wishes mappings, kept in sync with the CSV fields
+users_skills = Table(
+    "users_skills",
+    db.metadata,
+    Column("user_id", db.Integer, db.ForeignKey("users.id"), primary_key=True),
+    Column("skill_id", db.Integer, db.ForeignKey("skills.id"), primary_key=True),
+    db.Index("ix_users_skills_skill_user", "skill_id", "user_id"),
+)
+users_wishes = Table(
+    "users_wishes",
+    db.metadata,
+    Column("user_id", db.Integer, db.ForeignKey("users.id"), primary_key=True),
+    Column("skill_id", db.Integer, db.ForeignKey("skills.id"), primary_key=True),
+    db.Index("ix_users_wishes_skill_user", "skill_id", "user_id"),
 )
 
 
@@ -92,13 +110,57 @@ class Role(PkModel):
         return users.count()
 
 
+class Skill(PkModel):
+    """Something to be good at, or to learn."""
+
+    __tablename__ = "skills"
+    name = Column(db.String(80), unique=True, nullable=False)
+
+    def __init__(self, name=None, **kwargs):
+        """Create instance."""
+        self.name = name
+        super().__init__(**kwargs)
+
+    def __repr__(self):
+        """Represent instance as a unique string."""
+        return f"<Skill({self.name})>"
+
+    @staticmethod
+    def from_names(names):
+        """Look up or create skills by their (case insensitive) names."""
+        keys = []
+        for n in names or []:
+            key = n.strip().lower()[:80]
+            if key and key not in keys:
+                keys.append(key)
+        if not keys:
+            return []
+        with db.session.no_autoflush:
+            found = {s.name: s for s in Skill.query.filter(Skill.name.in_(keys))}
+        missing = [{"name": key} for key in keys if key not in found]
+        if missing:
+            # Skip skills which were added by someone else in the meantime
+            dialect = db.session.get_bind().dialect.name
+            if dialect == "postgresql":
+                stmt = postgresql.insert(Skill).on_conflict_do_nothing()
+            elif dialect == "sqlite":
+                stmt = sqlite.insert(Skill).on_conflict_do_nothing()
+            else:
+                stmt = insert(Skill).prefix_with("IGNORE", dialect="mysql")
+            db.session.execute(stmt, missing)
+            with db.session.no_autoflush:
+                found = {s.name: s for s in Skill.query.filter(Skill.name.in_(keys))}
+        return [found[key] for key in keys]
+
+
 class User(UserMixin, PkModel):
     """Just a regular Jane."""
 
     __tablename__ = "users"
     username = Column(db.String(80), unique=True, nullable=False)
     email = Column(db.String(80), unique=True, nullable=False)
-    # TODO: cache the score from get_score()
+    # Cached result of calculate_score(), see update_score()
+    score = Column(db.Integer(), nullable=True)
 
     # My full name, for use in profile or certificate
     fullname = Column(db.String(255), nullable=True)
@@ -124,6 +186,8 @@ class User(UserMixin, PkModel):
 
     # Internal profile
     roles = relationship("Role", secondary=users_roles, backref="users")
+    skills = relationship("Skill", secondary=users_skills)
+    wishes = relationship("Skill", secondary=users_wishes)
     my_story = Column(db.UnicodeText(), nullable=True)
     my_goals = Column(db.UnicodeText(), nullable=True)
 
@@ -228,38 +292,58 @@ class User(UserMixin, PkModel):
             gravatar_url += "?d=retro&"
             gravatar_url += urlencode({"s": str(gr_size)})
             self.carddata = gravatar_url
+        # The profile counts towards the score
+        self.update_score()
         self.save()
 
     def joined_projects(self, with_challenges=True, limit=-1, event=None):
         """Retrieve all projects user has joined."""
-        activities = Activity.query.filter_by(user_id=self.id, name="star").order_by(
-            Activity.timestamp.desc()  # pyright: ignore
+        return User.get_joined_projects(
+            [self.id], with_challenges, limit, event
+        ).get(self.id, [])
+
+    @staticmethod
+    def get_joined_projects(user_ids, with_challenges=True, limit=-1, event=None):
+        """Retrieve the joined projects of several users, most recent first."""
+        if not user_ids:
+            return {}
+        stars = (
+            db.session.query(
+                Activity.user_id,
+                Activity.project_id,
+                func.max(Activity.timestamp).label("joined_at"),
+            )
+            .filter(Activity.name == "star")
+            .filter(Activity.user_id.in_(user_ids))
+            .group_by(Activity.user_id, Activity.project_id)
+            .subquery()
         )
-        if limit > 0:
-            activities = activities.limit(limit)
-        else:
-            activities = activities.all()
-        projects = []
-        project_ids = []
-        for a in activities:
-            if limit > 0 and len(projects) >= limit:
-                break
-            if not a.project or a.project_id in project_ids or a.project.is_hidden:
-                continue
-            if event is not None and a.project.event != event:
-                continue
-            if with_challenges or not a.project.is_challenge:
-                projects.append(a.project)
-                project_ids.append(a.project_id)
+        query = (
+            db.session.query(stars.c.user_id, Project)
+            .join(Project, Project.id == stars.c.project_id)
+            .filter(Project.is_hidden.isnot(True))
+        )
+        if event is not None:
+            query = query.filter(Project.event_id == event.id)
+        if not with_challenges:
+            query = query.filter(
+                or_(Project.progress.is_(None), Project.progress > PR_CHALLENGE)
+            )
+        query = query.order_by(
+            stars.c.user_id, stars.c.joined_at.desc(), Project.id.desc()
+        )
+        if limit > 0 and len(user_ids) == 1:
+            query = query.limit(limit)
+        projects = {}
+        for user_id, project in query:
+            joined = projects.setdefault(user_id, [])
+            if limit <= 0 or len(joined) < limit:
+                joined.append(project)
         return projects
 
     def has_joined(self, event):
         """Check if the user has starred a team at this event."""
-        jp = self.joined_projects(True, -1, event)
-        for project in jp:
-            if project.event == event:
-                return True
-        return False
+        return len(self.joined_projects(True, 1, event)) > 0
 
     def simple_resume(self):
         """Convert a JSON CV into a simplified dictionary."""
@@ -329,16 +413,56 @@ class User(UserMixin, PkModel):
         return p_score / MAX_SCORE
 
     def get_score(self):
+        """Return my personal score, calculating it if not yet stored."""
+        if self.score is None:
+            self.score = self.calculate_score()
+        return self.score
+
+    def calculate_score(self, project_total=None):
         """Calculate my personal score, based on profile completeness and projects."""
-        # See def calculate_score(self) below
-        projects = self.joined_projects(False)
-        project_total = sum([p.score for p in projects])
+        # See def calculate_score(self) of Project below
+        if project_total is None:
+            project_total = User.get_project_totals([self.id]).get(self.id, 0)
         # Adjust score based on score
         user_score = self.get_profile_percent()
         if user_score > 0:
             project_total = project_total + 10
         return round(project_total * user_score)
 
+    @staticmethod
+    def get_project_totals(user_ids):
+        """Sum up the scores of joined projects (without challenges) per user."""
+        if not user_ids:
+            return {}
+        stars = (
+            db.session.query(Activity.user_id, Activity.project_id)
+            .filter(Activity.name == "star")
+            .filter(Activity.user_id.in_(user_ids))
+            .distinct()
+            .subquery()
+        )
+        rows = (
+            db.session.query(stars.c.user_id, func.sum(Project.score))
+            .join(Project, Project.id == stars.c.project_id)
+            .filter(Project.is_hidden.isnot(True))
+            .filter(or_(Project.progress.is_(None), Project.progress > PR_CHALLENGE))
+            .group_by(stars.c.user_id)
+            .all()
+        )
+        return {r[0]: int(r[1] or 0) for r in rows}
+
+    def update_skills(self):
+        """Match the skills and wishes to the lists in my profile.
+
+        New skills are created, so call this when saving a profile form.
+        """
+        self.skills = Skill.from_names(self.my_skills)
+        self.wishes = Skill.from_names(self.my_wishes)
+
+    def update_score(self):
+        """Refresh my cached score, after changes to my profile or projects."""
+        self.score = self.calculate_score()
+
     def posted_challenges(self):
         """Retrieve all challenges user has posted."""
         projects = (
@@ -781,8 +905,12 @@ class Event(PkModel):
 class Project(PkModel):
     """You know, for kids."""
 
-    __versioned__ = {}
+    __versioned__ = {"exclude": ["team_count", "activity_count", "boost_count"]}
     __tablename__ = "projects"
+    __table_args__ = (
+        db.Index("ix_projects_event_hidden_progress", "event_id", "is_hidden", "progress"),
+        db.Index("ix_projects_ident_name", "ident", "name"),
+    )
     name = Column(db.String(80), unique=True, nullable=False)
     ident = Column(db.String(10), nullable=True)
     hashtag = Column(db.String(140), nullable=True)
@@ -843,6 +971,11 @@ class Project(PkModel):
     progress = Column(db.Integer(), nullable=True, default=-1)
     score = Column(db.Integer(), nullable=True, default=0)
 
+    # Activity counters for scoring, see aggregation.ChangeProjectCounters
+    team_count = Column(db.Integer(), nullable=True, default=0)
+    activity_count = Column(db.Integer(), nullable=True, default=0)
+    boost_count = Column(db.Integer(), nullable=True, default=0)
+
     @property
     def team(self):
         """Array of project team."""
@@ -872,7 +1005,7 @@ class Project(PkModel):
     @property
     def needs_members(self):
         """Return True if the team should grow."""
-        if self.is_approved and self.team_count < 5:
+        if self.is_approved and (self.team_count or 0) < 5:
             return True
         return False
 
@@ -925,6 +1058,12 @@ class Project(PkModel):
     @property
     def data(self):
         """Get JSON representation."""
+        return self.get_data()
+
+    def get_data(self, team=None):
+        """Get JSON representation, optionally with a preloaded team."""
+        if team is None:
+            team = self.team
         d = {
             "id": self.id,
             "ident": self.ident,
@@ -932,8 +1071,8 @@ class Project(PkModel):
             "name": self.name,
             "score": self.score,
             "phase": self.phase,
-            "team": self.team,
-            "team_count": self.team_count,
+            "team": team,
+            "team_count": self.team_count or 0,
             "is_challenge": self.is_challenge,
             "is_webembed": self.is_webembed,
             "progress": self.progress,
@@ -984,12 +1123,6 @@ class Project(PkModel):
         q = q.order_by(Activity.timestamp.desc())  # pyright: ignore
         return q.limit(max)
 
-    @property
-    def team_count(self):
-        """Return follower count."""
-        # TODO: this is much too slow
-        return Activity.query.filter_by(project_id=self.id, name="star").count()
-
     def get_team(self, with_spectators=False):
         """Return all starring users (A team)."""
         activities = self.activities
@@ -1010,29 +1143,18 @@ class Project(PkModel):
         """Collect some activity stats."""
         return self.get_stats()
 
-    def get_stats(self):
+    def get_stats(self, counts=None):
         """Collect some activity stats."""
-        q = self.activities
+        if counts is None:
+            counts = Project.get_activity_counts([self.id])
+        c = counts.get(self.id, {})
 
         # Basic statistics
-        s_total = len(q)
-        s_updates = 0
-        s_commits = 0
-        s_during = 0
-        s_people = 0
-        for act in q:
-            if act.name == "update":
-                s_updates += 1
-                if act.action == "commit":
-                    s_commits += 1
-            elif act.name == "star":
-                s_people += 1
-            if self.event:
-                if (
-                    act.timestamp > self.event.starts_at
-                    and act.timestamp < self.event.ends_at
-                ):
-                    s_during += 1
+        s_total = c.get("total", 0)
+        s_updates = c.get("updates", 0)
+        s_commits = c.get("commits", 0)
+        s_during = c.get("during", 0)
+        s_people = c.get("people", 0)
 
         # A byte count of contents
         s_sizepitch = 0
@@ -1053,6 +1175,37 @@ class Project(PkModel):
             "sizetotal": s_sizetotal,
         }
 
+    @staticmethod
+    def get_activity_counts(project_ids):
+        """Count the activities of several projects in one aggregate query."""
+        if not project_ids:
+            return {}
+        during = and_(
+            Activity.timestamp > Event.starts_at,
+            Activity.timestamp < Event.ends_at,
+        )
+        is_update = Activity.name == "update"
+        rows = (
+            db.session.query(
+                Activity.project_id,
+                func.count(Activity.id),
+                func.sum(case((is_update, 1), else_=0)),
+                func.sum(case((and_(is_update, Activity.action == "commit"), 1), else_=0)),
+                func.sum(case((during, 1), else_=0)),
+                func.sum(case((Activity.name == "star", 1), else_=0)),
+                func.sum(case((Activity.name == "boost", 1), else_=0)),
+            )
+            .join(Project, Project.id == Activity.project_id)
+            .outerjoin(Event, Event.id == Project.event_id)
+            .filter(Activity.project_id.in_(project_ids))
+            .group_by(Activity.project_id)
+            .all()
+        )
+        keys = ("total", "updates", "commits", "during", "people", "boosts")
+        return {
+            r[0]: dict(zip(keys, [int(v or 0) for v in r[1:]])) for r in rows
+        }
+
     def get_missing_roles(self):
         """List all roles which are not yet in team."""
         get_roles = Role.query.order_by("name")
@@ -1276,6 +1429,21 @@ class Project(PkModel):
         self.update_null_fields()
         self.set_auto_image()
         self.score = self.calculate_score()
+        self.update_team_scores()
+
+    def update_team_scores(self):
+        """Refresh the cached scores of users who joined the project."""
+        if self.id is None:
+            return
+        team = (
+            User.query.join(Activity, Activity.user_id == User.id)
+            .filter(Activity.project_id == self.id, Activity.name == "star")
+            .distinct()
+            .all()
+        )
+        totals = User.get_project_totals([u.id for u in team])
+        for u in team:
+            u.score = u.calculate_score(totals.get(u.id, 0))
 
     def update_null_fields(self):
         """Reset fields in None-state."""
@@ -1328,16 +1496,15 @@ class Project(PkModel):
         """Calculate score of a project based on base progress."""
         # See also get_score above
         score = self.progress or 0
-        cqu = Activity.query.filter_by(project_id=self.id)
         # Challenges only get a point per team-member
         if self.is_challenge:
-            return cqu.filter_by(name="star").count()
+            return self.team_count or 0
         # Get a point for every (join, update, comment ..)
         # activity in dribs:
-        c_s = cqu.count()
+        c_s = self.activity_count or 0
         score = score + (1 * int(c_s / 2))
         # Extra points for every boost (upvote)
-        c_a = cqu.filter_by(name="boost").count()
+        c_a = self.boost_count or 0
         score = score + (5 * c_a)
         # Add to the score for every complete documentation field
         score = score + 1 * int(len(self.summary) > 3)
@@ -1439,6 +1606,12 @@ class Activity(PkModel):
     """Public, real time, conversational."""
 
     __tablename__ = "activities"
+    __table_args__ = (
+        db.Index("ix_activities_project_name", "project_id", "name"),
+        db.Index("ix_activities_user_name_timestamp", "user_id", "name", "timestamp"),
+        db.Index("ix_activities_action_id", "action", "id"),
+        db.Index("ix_activities_timestamp", "timestamp"),
+    )
     name = Column(
         db.Enum("review", "boost", "create", "update", "star", name="activity_type")
     )
@@ -1550,5 +1723,81 @@ class Resource(PkModel):
         return "<Resource({name})>".format(name=self.name)
 
 
+class Job(PkModel):
+    """A slow task, queued to run in the background."""
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        db.Index("ix_jobs_status_run_at", "status", "run_at"),
+        db.Index("ix_jobs_key_status", "key", "status"),
+    )
+    name = Column(db.String(64), nullable=False)
+    # Identifies jobs with the same task and arguments
+    key = Column(db.String(40), nullable=False)
+    payload = Column(db.UnicodeText, nullable=True)
+    # 'pending', 'running', 'done', 'failed'
+    status = Column(db.String(16), nullable=False, default="pending")
+    progress = Column(db.Float, nullable=False, default=0)
+    message = Column(db.String(256), nullable=True)
+    error = Column(db.UnicodeText, nullable=True)
+    attempts = Column(db.Integer, nullable=False, default=0)
+    max_attempts = Column(db.Integer, nullable=False, default=1)
+    created_at = Column(db.DateTime(timezone=True), nullable=False, default=func.now())
+    run_at = Column(db.DateTime(timezone=True), nullable=False, default=func.now())
+    started_at = Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = Column(db.DateTime(timezone=True), nullable=True)
+
+    # Who asked for it, if anyone
+    user_id = reference_col("users", nullable=True)
+    user = relationship("User")
+
+    @property
+    def data(self):
+        """Get JSON representation."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "progress": self.progress or 0,
+            "message": self.message or "",
+            "error": self.error or "",
+            "attempts": self.attempts or 0,
+            "created_at": self.created_at and format_date(self.created_at),
+            "finished_at": self.finished_at and format_date(self.finished_at),
+        }
+
+    def __repr__(self):
+        """Represent instance as a unique string."""
+        return "<Job({name}, {status})>".format(name=self.name, status=self.status)
+
+
+class ProjectSync(PkModel):
+    """Schedule of syncing a project with its remote source."""
+
+    __tablename__ = "project_syncs"
+    __table_args__ = (
+        db.Index("ix_project_syncs_next_sync_at", "next_sync_at"),
+    )
+    # Removed along with the project
+    project_id = reference_col(
+        "projects",
+        foreign_key_kwargs={"ondelete": "CASCADE"},
+        column_kwargs={"unique": True},
+    )
+    project = relationship("Project")
+
+    synced_at = Column(db.DateTime(timezone=True), nullable=True)
+    next_sync_at = Column(db.DateTime(timezone=True), nullable=True)
+    # Seconds until the next sync, which grow while nothing changes
+    interval = Column(db.Integer, nullable=False, default=0)
+    failures = Column(db.Integer, nullable=False, default=0)
+    # Identifies the remote content, such as by its latest commit
+    fingerprint = Column(db.String(64), nullable=True)
+
+    def __repr__(self):
+        """Represent instance as a unique string."""
+        return "<ProjectSync({project_id})>".format(project_id=self.project_id)
+
+
 # class Availability(PkModel):
 #    """Agree when do we drib."""
@@ -23,7 +23,8 @@ import string
 
 
 # Instantiate Markdown parser
-md = MarkdownIt("gfm-like").enable("table")
+MARKDOWN_CONFIG = ("gfm-like", "table")
+md = MarkdownIt(MARKDOWN_CONFIG[0]).enable(MARKDOWN_CONFIG[1])
 
 
 def markdownit(content):
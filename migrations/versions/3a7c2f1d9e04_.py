@@ -0,0 +1,35 @@
+"""add team_count to projects
+
+Revision ID: 3a7c2f1d9e04
+Revises: efbe8a1c4eab
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3a7c2f1d9e04"
+down_revision = "efbe8a1c4eab"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("projects", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("team_count", sa.Integer(), nullable=True))
+
+    # Populate from existing team memberships
+    op.execute(
+        "UPDATE projects SET team_count = ("
+        "SELECT COUNT(activities.id) FROM activities "
+        "WHERE activities.project_id = projects.id "
+        "AND activities.name = 'star')"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("projects", schema=None) as batch_op:
+        batch_op.drop_column("team_count")
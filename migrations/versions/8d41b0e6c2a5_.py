@@ -0,0 +1,42 @@
+"""add activity and boost counts to projects
+
+Revision ID: 8d41b0e6c2a5
+Revises: 3a7c2f1d9e04
+Create Date: 2026-10-18 11:40:05.318842
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8d41b0e6c2a5"
+down_revision = "3a7c2f1d9e04"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("projects", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("activity_count", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("boost_count", sa.Integer(), nullable=True))
+
+    # Populate from existing activities
+    op.execute(
+        "UPDATE projects SET activity_count = ("
+        "SELECT COUNT(activities.id) FROM activities "
+        "WHERE activities.project_id = projects.id)"
+    )
+    op.execute(
+        "UPDATE projects SET boost_count = ("
+        "SELECT COUNT(activities.id) FROM activities "
+        "WHERE activities.project_id = projects.id "
+        "AND activities.name = 'boost')"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("projects", schema=None) as batch_op:
+        batch_op.drop_column("boost_count")
+        batch_op.drop_column("activity_count")
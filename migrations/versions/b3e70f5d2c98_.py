@@ -0,0 +1,43 @@
+"""add sync schedules of projects
+
+Revision ID: b3e70f5d2c98
+Revises: a6d19c4e8b21
+Create Date: 2026-10-18 22:03:41.227904
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b3e70f5d2c98"
+down_revision = "a6d19c4e8b21"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "project_syncs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("synced_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("next_sync_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("interval", sa.Integer(), nullable=False),
+        sa.Column("failures", sa.Integer(), nullable=False),
+        sa.Column("fingerprint", sa.String(length=64), nullable=True),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("project_id"),
+    )
+    with op.batch_alter_table("project_syncs", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_project_syncs_next_sync_at", ["next_sync_at"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("project_syncs", schema=None) as batch_op:
+        batch_op.drop_index("ix_project_syncs_next_sync_at")
+    op.drop_table("project_syncs")
@@ -0,0 +1,28 @@
+"""add cached score to users
+
+Revision ID: c5e9a3d7f210
+Revises: 8d41b0e6c2a5
+Create Date: 2026-10-18 14:02:47.551930
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c5e9a3d7f210"
+down_revision = "8d41b0e6c2a5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Scores are calculated on first use, or in bulk with the rescore command
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("score", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.drop_column("score")
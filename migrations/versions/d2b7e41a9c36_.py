@@ -0,0 +1,50 @@
+"""add indexes for activity and project lookups
+
+Revision ID: d2b7e41a9c36
+Revises: c5e9a3d7f210
+Create Date: 2026-10-18 16:40:12.518304
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "d2b7e41a9c36"
+down_revision = "c5e9a3d7f210"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("activities", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_activities_project_name", ["project_id", "name"], unique=False
+        )
+        batch_op.create_index(
+            "ix_activities_user_name_timestamp",
+            ["user_id", "name", "timestamp"],
+            unique=False,
+        )
+        batch_op.create_index("ix_activities_action_id", ["action", "id"], unique=False)
+        batch_op.create_index("ix_activities_timestamp", ["timestamp"], unique=False)
+
+    with op.batch_alter_table("projects", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_projects_event_hidden_progress",
+            ["event_id", "is_hidden", "progress"],
+            unique=False,
+        )
+        batch_op.create_index("ix_projects_ident_name", ["ident", "name"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("projects", schema=None) as batch_op:
+        batch_op.drop_index("ix_projects_ident_name")
+        batch_op.drop_index("ix_projects_event_hidden_progress")
+
+    with op.batch_alter_table("activities", schema=None) as batch_op:
+        batch_op.drop_index("ix_activities_timestamp")
+        batch_op.drop_index("ix_activities_action_id")
+        batch_op.drop_index("ix_activities_user_name_timestamp")
+        batch_op.drop_index("ix_activities_project_name")
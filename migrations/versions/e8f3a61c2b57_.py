@@ -0,0 +1,46 @@
+"""add full-text search index of projects
+
+Revision ID: e8f3a61c2b57
+Revises: d2b7e41a9c36
+Create Date: 2026-10-18 18:05:47.204911
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "e8f3a61c2b57"
+down_revision = "d2b7e41a9c36"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute(
+            "CREATE INDEX ix_projects_search ON projects USING gin (("
+            "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(summary, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(longtext, '')), 'C') || "
+            "setweight(to_tsvector('simple', coalesce(autotext, '')), 'D')))"
+        )
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING "
+            "fts5(name, summary, longtext, autotext, "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "INSERT INTO projects_fts (rowid, name, summary, longtext, autotext) "
+            "SELECT id, name, summary, longtext, autotext FROM projects"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_projects_search")
+    elif dialect == "sqlite":
+        op.execute("DROP TABLE IF EXISTS projects_fts")
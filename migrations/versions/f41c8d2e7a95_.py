@@ -0,0 +1,81 @@
+"""add skills tables for users
+
+Revision ID: f41c8d2e7a95
+Revises: e8f3a61c2b57
+Create Date: 2026-10-18 18:47:20.930156
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "f41c8d2e7a95"
+down_revision = "e8f3a61c2b57"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    skills = op.create_table(
+        "skills",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=80), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    mappings = {}
+    for table in ["users_skills", "users_wishes"]:
+        mappings[table] = op.create_table(
+            table,
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("skill_id", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(["skill_id"], ["skills.id"]),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("user_id", "skill_id"),
+        )
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(
+                "ix_%s_skill_user" % table, ["skill_id", "user_id"], unique=False
+            )
+    with op.batch_alter_table("users_roles", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_users_roles_role_user", ["role_id", "user_id"], unique=False
+        )
+
+    # Populate from the CSV lists in the user profiles
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.text("SELECT id, _my_skills, _my_wishes FROM users")
+    ).fetchall()
+    names = {"users_skills": [], "users_wishes": []}
+    for user_id, my_skills, my_wishes in rows:
+        for table, packed in [("users_skills", my_skills), ("users_wishes", my_wishes)]:
+            linked = set()
+            for name in (packed or "").split(","):
+                name = name.strip().lower()[:80]
+                if name and name not in linked:
+                    linked.add(name)
+                    names[table].append((user_id, name))
+    all_names = set([n for t in names.values() for (u, n) in t])
+    if not all_names:
+        return
+    op.bulk_insert(skills, [{"name": n} for n in sorted(all_names)])
+    skill_ids = dict(
+        (name, id) for (id, name) in conn.execute(sa.text("SELECT id, name FROM skills"))
+    )
+    for table, mapping in mappings.items():
+        if names[table]:
+            op.bulk_insert(
+                mapping,
+                [{"user_id": u, "skill_id": skill_ids[n]} for (u, n) in names[table]],
+            )
+
+
+def downgrade():
+    with op.batch_alter_table("users_roles", schema=None) as batch_op:
+        batch_op.drop_index("ix_users_roles_role_user")
+    op.drop_table("users_wishes")
+    op.drop_table("users_skills")
+    op.drop_table("skills")
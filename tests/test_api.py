@@ -6,8 +6,13 @@ import json
 
 from dribdat.aggregation import ProjectActivity
 from dribdat.apigenerate import gen_project_pitch
-from dribdat.user.models import Event, Category
+from dribdat.user.models import Event, Category, Role
+from dribdat.public.userhelper import get_users_by_search
 from dribdat.public.api import *
+from dribdat.search import search_projects, reindex_projects
+from dribdat.apiutils import (
+    get_projects_data, get_users_for_event, iter_project_list,
+)
 
 from .factories import EventFactory, ProjectFactory, UserFactory
 
@@ -123,6 +128,94 @@ class TestApi:
         assert len(jsondata["projects"]) == 1
         assert jsondata["projects"][0]["name"] == "myproject"
 
+    def test_get_projects_data(self):
+        """Test bulk serialization of projects."""
+        event = EventFactory()
+        event.save()
+        owner = UserFactory()
+        owner.save()
+        category = Category(name="mycategory")
+        category.save()
+        projects = []
+        for i in range(3):
+            project = ProjectFactory(event=event, user=owner, category=category)
+            project.save()
+            projects.append(project)
+        for i in range(2):
+            member = UserFactory()
+            member.save()
+            ProjectActivity(projects[i], "star", member)
+        ProjectActivity(projects[0], "star", owner)
+        bulkdata = get_projects_data(projects)
+        assert bulkdata == [p.data for p in projects]
+        assert bulkdata[0]["team"] == [owner.username, projects[0].get_team()[1].username]
+        assert bulkdata[2]["team"] == [owner.username]
+        assert get_projects_data([]) == []
+
+    def test_streaming_lists(self, testapp):
+        """Test chunked JSON and NDJSON output of lists."""
+        event = EventFactory(name="hello")
+        event.save()
+        for i in range(5):
+            project = ProjectFactory(event=event, progress=10, score=i * 10)
+            project.save()
+        res = testapp.get('/api/event/%d/projects.json' % event.id)
+        assert res.content_type == 'application/json'
+        scores = [p['score'] for p in res.json['projects']]
+        assert scores == [40, 30, 20, 10, 0]
+        assert scores == [p['score'] for p in iter_project_list(event.id, '', False, 2)]
+        res = testapp.get('/api/event/%d/projects.json?format=ndjson' % event.id)
+        assert res.content_type == 'application/x-ndjson'
+        rows = [json.loads(line) for line in res.text.splitlines()]
+        assert [p['score'] for p in rows] == scores
+        res = testapp.get('/api/events.json?format=ndjson')
+        assert json.loads(res.text)['name'] == "hello"
+        res = testapp.get('/api/project/activity.json')
+        assert res.json == {'activities': []}
+
+    def test_conditional_requests(self, testapp):
+        """Test validators and 304 responses of lists."""
+        event = EventFactory(name="hello")
+        event.save()
+        project = ProjectFactory(event=event, progress=10)
+        project.save()
+        url = '/api/event/%d/projects.json' % event.id
+        res = testapp.get(url)
+        etag = res.headers['ETag']
+        res = testapp.get(url, headers={'If-None-Match': etag}, status=304)
+        assert res.body == b''
+        # Changes to the projects produce a new validator
+        project.summary = "Changed"
+        project.update_now()
+        project.save()
+        res = testapp.get(url, headers={'If-None-Match': etag})
+        assert res.status_code == 200
+        assert res.headers['ETag'] != etag
+        assert res.json['projects'][0]['summary'] == "Changed"
+        # Activities in other events do not change the validator
+        etag = res.headers['ETag']
+        ProjectActivity(ProjectFactory(event=EventFactory()), 'star', UserFactory())
+        testapp.get(url, headers={'If-None-Match': etag}, status=304)
+        # Activity feeds are also validated by their time
+        ProjectActivity(project, 'update', UserFactory())
+        res = testapp.get('/api/project/activity.json')
+        modified = res.headers['Last-Modified']
+        testapp.get('/api/project/activity.json',
+                    headers={'If-Modified-Since': modified}, status=304)
+        res = testapp.get('/feeds/dribs.xml')
+        testapp.get('/feeds/dribs.xml',
+                    headers={'If-None-Match': res.headers['ETag']}, status=304)
+        # Event feeds follow the latest activity within the event
+        feed = '/api/event/%d/activity.json' % event.id
+        res = testapp.get(feed)
+        testapp.get(feed, headers={'If-None-Match': res.headers['ETag']}, status=304)
+        ProjectActivity(project, 'star', UserFactory())
+        testapp.get(feed, headers={'If-None-Match': res.headers['ETag']}, status=200)
+        testapp.get('/api/project/%d/info.json' % project.id,
+                    headers={'If-None-Match': etag}, status=200)
+        res = testapp.get('/api/event/999/projects.json')
+        assert 'ETag' not in res.headers
+
     def test_get_category_list(self):
         """Test category list API functions."""
         event = EventFactory(name="hello", is_current=True)
@@ -182,6 +275,33 @@ class TestApi:
         assert len(res.json['projects']) == 1
         assert res.json['projects'][0]['name'] == "myproject"
 
+    def test_project_search_index(self, testapp):
+        """Test ranking, paging and upkeep of the search index."""
+        event = EventFactory()
+        event.save()
+        p1 = ProjectFactory(name="Hello", longtext="A rubber duck", event=event)
+        p2 = ProjectFactory(name="Rubber ducks", event=event)
+        p3 = ProjectFactory(name="Secret", summary="Rubber", is_hidden=True)
+        for p in [p1, p2, p3]:
+            p.save()
+        res = testapp.get('/api/project/search.json?q=rubber+duck')
+        assert [p['id'] for p in res.json['projects']] == [p2.id, p1.id]
+        assert not res.json['has_more']
+        res = testapp.get('/api/project/search.json?q=rubber&limit=1&page=2')
+        assert [p['id'] for p in res.json['projects']] == [p1.id]
+        assert res.json['page'] == 2
+        res = testapp.get('/api/project/search.json?q=rubber&limit=1')
+        assert res.json['has_more']
+        # Edits and deletions are reflected in the index
+        p1.longtext = "A yellow duck"
+        p1.save()
+        p2.delete()
+        assert search_projects("rubber") == ([], False)
+        assert search_projects("yellow") == ([p1], False)
+        assert search_projects("!!!") == ([], False)
+        assert reindex_projects() == 2
+        assert search_projects("yell") == ([p1], False)
+
     def test_get_user_profile(self, testapp):
         """Test user profile API functions."""
         user = UserFactory(username="myuser")
@@ -200,6 +320,36 @@ class TestApi:
         assert len(res.json['users']) == 1
         assert res.json['users'][0]['name'] == "myuser"
 
+    def test_participants_search(self, testapp):
+        """Test searching and paging through participants."""
+        role = Role(name="mentor")
+        role.save()
+        users = [
+            UserFactory(username=name, my_skills=["Python"])
+            for name in ["bob", "alice", "carol"]
+        ]
+        users.append(UserFactory(username="dave", my_wishes=["python", "rust"]))
+        users.append(UserFactory(username="eve", active=False, my_skills=["Python"]))
+        for user in users:
+            user.update_skills()
+            user.save()
+        mentor = UserFactory(username="frank")
+        mentor.roles.append(role)
+        mentor.save()
+        users = get_users_by_search("*pyth")
+        assert [u.username for u in users] == ["alice", "bob", "carol", "dave"]
+        assert [u.username for u in get_users_by_search("*rust")] == ["dave"]
+        assert [u.username for u in get_users_by_search("~ment")] == ["frank"]
+        assert get_users_by_search("~nobody") == []
+        res = testapp.get('/api/participants.json?u=*python&limit=3')
+        assert [u['user'] for u in res.json['users']] == ["alice", "bob", "carol"]
+        assert res.json['has_more']
+        res = testapp.get('/api/participants.json?u=*python&limit=3&page=2')
+        assert [u['user'] for u in res.json['users']] == ["dave"]
+        assert not res.json['has_more']
+        res = testapp.get('/api/participants.json?u=~mentor')
+        assert res.json['users'][0]['roles'] == "mentor"
+
     def test_set_admin_status(self, testapp):
         """Set an Event status for broadcast."""
         event = EventFactory(is_current=True)
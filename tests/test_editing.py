@@ -218,6 +218,35 @@ class TestEditing:
         assert AllowProjectEdit(project, useradmin) is True
 
 
+    def test_admin_project_scores(self, db, user, testapp):
+        """Hiding or deleting a project refreshes the scores of its team."""
+        user.is_admin = True
+        user.save()
+        event = EventFactory()
+        event.save()
+        project = ProjectFactory(event=event, progress=30)
+        project.update_now()
+        project.save()
+        teammate = UserFactory(webpage_url="https://blah.com")
+        teammate.save()
+        ProjectActivity(project, "star", teammate)
+        score = teammate.score
+        assert log_me_in(testapp, user).status_code == 200
+        testapp.get(url_for('admin.project_toggle', project_id=project.id))
+        db.session.refresh(teammate)
+        assert project.is_hidden
+        assert teammate.score < score
+        testapp.get(url_for('admin.project_toggle', project_id=project.id))
+        db.session.refresh(teammate)
+        assert teammate.score == score
+        project.is_hidden = True
+        project.save()
+        teammate.score = score
+        teammate.save()
+        testapp.get(url_for('admin.project_delete', project_id=project.id))
+        db.session.refresh(teammate)
+        assert teammate.score == teammate.calculate_score() < score
+
     def test_project_suggestions(self, db, testapp):
         """Test project templates."""
         event = EventFactory()
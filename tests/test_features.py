@@ -4,9 +4,14 @@
 See: http://webtest.readthedocs.org/
 """
 
+import threading
+
 from flask import url_for
 from .factories import ProjectFactory, EventFactory, UserFactory
-from dribdat.onebox import make_onebox
+from dribdat.onebox import make_onebox, make_oembedplus, OEMBED_WORKERS
+from dribdat.boxout.datapackage import (
+    box_datapackage, render_datapackage, wait_for_prefetch, DATAPACKAGE_LOADING,
+)
 from dribdat.public.projhelper import (
     check_update,
     bootstraps_by_stage,
@@ -14,11 +19,18 @@ from dribdat.public.projhelper import (
     navigate_around_project,
 )
 from dribdat.aggregation import ProjectActivity
+from dribdat.caching import (
+    tagged_key, invalidate_tags, invalidate_event, invalidate_project,
+    RenderCache,
+)
+from dribdat.extensions import cache
 from dribdat.utils import load_yaml_presets
 from dribdat.apifetch import FetchStageConfig
 from dribdat.apigenerate import gen_project_pitch
 from dribdat.user.constants import PR_CHALLENGE
 
+from micawber.providers import ProviderRegistry
+from micawber.exceptions import ProviderException
 from requests.exceptions import ConnectionError
 
 STAGES_URL = "https://raw.githubusercontent.com/dribdat/dribdat/main/dribdat/templates/includes/stages.yaml"
@@ -47,6 +59,74 @@ EOF""" % (url, url)
         result = make_onebox(test_markdown)
         assert "onebox" in result
 
+    def test_project_boxes(self, project, testapp):
+        """Box links to several projects, and refresh changed ones."""
+        srv = url_for("public.home", _external=True)
+        other = ProjectFactory(name="Other box")
+        other.save()
+        links = ['<a href="%sproject/%d">%sproject/%d</a>' % (srv, p.id, srv, p.id)
+                 for p in [project, other]]
+        missing = '<a href="%sproject/0">%sproject/0</a>' % (srv, srv)
+        result = make_onebox(" ".join(links + [missing]))
+        assert result.count("onebox") == 2
+        assert project.name in result and "Other box" in result
+        assert missing in result
+        other.name = "Renamed box"
+        other.save()
+        assert "Other box" in make_onebox(links[1])
+        invalidate_project(other)
+        assert "Renamed box" in make_onebox(links[1])
+
+    def test_onebox_filter(self, project, testapp):
+        """Refresh boxes of the template filter when their project changes."""
+        onebox = testapp.app.jinja_env.filters["onebox"]
+        url = url_for("project.project_view", project_id=project.id, _external=True)
+        text = "Intro\n%s" % url
+        assert project.name in onebox(text)
+        name = project.name
+        project.name = "Renamed project"
+        project.save()
+        assert name in onebox(text)
+        invalidate_project(project)
+        assert "Renamed project" in onebox(text)
+
+    def test_datapackage_boxes(self, project, testapp, tmp_path):
+        """Fetch Data Packages in the background."""
+        url = "https://localhost:1/datapackage.json"
+        assert DATAPACKAGE_LOADING in box_datapackage(url, cache)
+        wait_for_prefetch(30)
+        # The broken package is not fetched again for a while
+        assert box_datapackage(url, cache) is None
+        path = tmp_path / "datapackage.json"
+        path.write_text('{"name": "test", "title": "Test package", "resources": []}')
+        assert "Test package" in render_datapackage(str(path))
+
+    def test_oembed_boxes(self, project, testapp):
+        """Resolve embedded links once, including failures."""
+        calls = []
+
+        class TestProvider:
+            def request(self, url, **params):
+                calls.append(url)
+                if "broken" in url:
+                    raise ProviderException("Not found")
+                return {"type": "link", "url": url, "title": "Test video"}
+
+        providers = ProviderRegistry()
+        providers.register(r"https://video\.test/\S+", TestProvider())
+        text = "Intro\nhttps://video.test/1\nhttps://video.test/broken\nhttps://other.test/"
+        for i in range(2):
+            html = make_oembedplus(text, providers).splitlines()
+            assert html[0] == "Intro"
+            assert "Test video" in html[1]
+            assert html[2:] == ["https://video.test/broken", "https://other.test/"]
+        assert sorted(calls) == ["https://video.test/1", "https://video.test/broken"]
+        # Providers are queried by a shared pool of threads
+        for i in range(OEMBED_WORKERS + 1):
+            make_oembedplus("https://video.test/more%d" % i, providers)
+        assert len([t for t in threading.enumerate()
+                    if t.name.startswith("oembed")]) <= OEMBED_WORKERS
+
     def test_project_api(self, project, testapp):
         """Make sure Project APIs respond correctly."""
         project = ProjectFactory()
@@ -88,12 +168,75 @@ EOF""" % (url, url)
         """Check next/previous and sort ordering."""
         event = EventFactory()
         event.save()
-        project1 = ProjectFactory(progress=0)
-        project2 = ProjectFactory(progress=1)
-        project3 = ProjectFactory(progress=2)
+        project1 = ProjectFactory(name="Nav A", progress=0)
+        project2 = ProjectFactory(name="Nav B", progress=1)
+        project3 = ProjectFactory(name="Nav C", progress=2)
         getnav = navigate_around_project(project2)
         assert getnav["prev"]["id"] == project1.id
         assert getnav["next"]["id"] == project3.id
+        getnav = navigate_around_project(project3, True)
+        assert getnav["prev"]["url"] == "/" + project2.url + "/challenge"
+        assert "next" not in getnav
+        # Identity takes precedence over the name
+        project1.ident = "B"
+        project1.save()
+        project3.ident = "A"
+        project3.save()
+        getnav = navigate_around_project(project1)
+        assert getnav["prev"]["id"] == project3.id
+        assert "next" not in getnav
+
+    def test_cache_tags(self, project, testapp):
+        """Check that cached content is invalidated by tags."""
+        cache.set(tagged_key("test", "event-1", "events"), "hello")
+        assert cache.get(tagged_key("test", "event-1", "events")) == "hello"
+        invalidate_tags("event-2")
+        assert cache.get(tagged_key("test", "event-1", "events")) == "hello"
+        invalidate_event()
+        assert cache.get(tagged_key("test", "event-1", "events")) is None
+        # Event pages reflect the changes of their projects
+        event = EventFactory()
+        event.save()
+        project = ProjectFactory(name="Chameleon", event=event, progress=10)
+        project.save()
+        res = testapp.get(url_for("public.event", event_id=event.id))
+        assert 'project-name">Chameleon' in res
+        project.name = "Salamander"
+        project.save()
+        res = testapp.get(url_for("public.event", event_id=event.id))
+        assert 'project-name">Salamander' not in res
+        invalidate_project(project)
+        res = testapp.get(url_for("public.event", event_id=event.id))
+        assert 'project-name">Salamander' in res
+
+    def test_render_cache(self, project, testapp):
+        """Check the memoization of rendered text."""
+        calls = []
+
+        def render(text):
+            calls.append(text)
+            return text.upper()
+
+        renders = RenderCache("test", render, maxsize=2)
+        assert renders("a") == "A"
+        assert renders("a") == "A"
+        assert renders("a", "other config") == "A"
+        assert calls == ["a", "a"]
+        assert renders.stats == {"hits": 1, "misses": 2, "size": 2}
+        # Older entries are dropped locally, but found in the shared cache
+        renders("b")
+        renders.shared = False
+        renders("a")
+        assert calls == ["a", "a", "b", "a"]
+        renders.clear()
+        renders.shared = True
+        assert renders("b") == "B"
+        assert renders.stats == {"hits": 1, "misses": 0, "size": 1}
+        # The template filter uses the same cache
+        html = testapp.app.jinja_env.from_string(
+            "{{ '*hello*'|markdown }}").render()
+        assert html.strip() == "<p><em>hello</em></p>"
+        assert testapp.app.markdown_cache.stats["size"] == 1
 
     def test_project_stage(self, project, testapp):
         """Check stage progression."""
@@ -9,7 +9,10 @@ from dribdat.admin.forms import EventForm
 from dribdat.user.models import User
 from dribdat.user import USER_UNDER_REVIEW_MESSAGE
 
-from .factories import log_me_in
+from dribdat.aggregation import ProjectActivity
+from dribdat.database import db
+
+from .factories import log_me_in, ProjectFactory, UserFactory
 
 from datetime import time, datetime
 from dribdat.futures import UTC
@@ -105,6 +108,18 @@ class TestLoginForm:
 
     def test_user_deletion(self, user, testapp):
         """Test the deactivation of a user."""
+        project = ProjectFactory(progress=30)
+        project.save()
+        ProjectActivity(project, "star", user)
+        for i in range(10):
+            ProjectActivity(project, "review", user, comments="Looks good")
+        teammate = UserFactory(webpage_url="https://blah.com")
+        teammate.save()
+        ProjectActivity(project, "star", teammate)
+        project.update_now()
+        db.session.commit()
+        score = teammate.score
+        assert project.team_count == 2
         # Log in with the user
         assert log_me_in(testapp, user).status_code == 200
         # Delete using the GET method
@@ -113,6 +128,14 @@ class TestLoginForm:
         # Check that the user is now gone
         user = User.query.get(user.id)
         assert user is None
+        # The counters of joined projects are updated
+        db.session.refresh(project)
+        assert project.team_count == 1
+        assert project.activity_count == 1
+        # As well as the scores of the remaining team
+        db.session.refresh(teammate)
+        assert teammate.score < score
+        assert teammate.score == teammate.calculate_score()
 
     def test_user_profile(self, user, testapp):
         """Test editing a user profile and story."""
@@ -145,8 +168,12 @@ class TestLoginForm:
         form = res.forms['userStory']
         form['my_story'] = 'My Story'
         form['vitae'] = '{"valid":"json"}'
+        form['my_skills'] = 'Python, SQL'
         res = form.submit().follow()
         assert res.status_code == 200
+        # The skills can be searched for
+        db.session.refresh(user)
+        assert [s.name for s in user.skills] == ['python', 'sql']
 
 
 
@@ -8,6 +8,7 @@ from dribdat.apiutils import (
     get_schema_for_user_projects, 
     get_project_list,
     gen_csv,
+    iter_csv,
 )
 from dribdat.apipackage import (
     event_to_data_package,
@@ -118,6 +119,16 @@ class TestImport:
         assert len(testimport) == 5
         assert 'Test Project' in testimport[0]['name']
 
+    def test_iter_csv(self):
+        """Rows are written out as they are generated."""
+        def rows():
+            yield {'id': 1, 'name': 'first', 'data': {'a': 1}}
+            raise AssertionError('read too far')
+        lines = iter_csv(rows())
+        assert next(lines) == '"id","name","data"\r\n"1","first","{""a"": 1}"\r\n'
+        assert list(iter_csv([])) == []
+        assert gen_csv([{'id': 2, 'name': None}]) == '"id","name"\r\n"2",""\r\n'
+
     def test_configuration(self):
         d,a,s = event_upload_configuration()
         assert d
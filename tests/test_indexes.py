@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Query plan tests for the database indexes."""
+
+import re
+
+import pytest
+from sqlalchemy import text
+
+from dribdat.user.models import Activity, Project
+from dribdat.apiutils import get_projects_by_event, query_latest_activity
+
+from .factories import EventFactory
+
+
+def explain_query(db, query):
+    """Return the lines of the query plan of a SQLite or PostgreSQL query."""
+    dialect = db.engine.dialect
+    statement = str(query.statement.compile(
+        dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == 'sqlite':
+        rows = db.session.execute(text("EXPLAIN QUERY PLAN " + statement))
+        return [r[-1] for r in rows]
+    if dialect.name == 'postgresql':
+        # Tiny test tables would otherwise always be scanned
+        db.session.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = db.session.execute(text("EXPLAIN " + statement))
+        return [r[0] for r in rows]
+    pytest.skip("EXPLAIN not supported on %s" % dialect.name)
+
+
+def assert_index_search(db, query):
+    """Fail unless the query plan looks up rows with the conditions of an index."""
+    lines = explain_query(db, query)
+    for line in lines:
+        if line.startswith('SCAN '):
+            pytest.fail("Scan instead of index search: %s" % line)
+        if line.startswith('SEARCH ') and not re.search(
+                r' USING (COVERING )?INDEX ', line):
+            pytest.fail("Search without an index: %s" % line)
+        if 'Seq Scan' in line:
+            pytest.fail("Sequential scan: %s" % line)
+    if not any(line.startswith('SEARCH ') or 'Index Cond' in line for line in lines):
+        pytest.fail("No index search: %s" % lines)
+
+
+def assert_ordered_by_index(db, query):
+    """Fail unless the rows are read in the order of an index, without sorting."""
+    lines = explain_query(db, query)
+    for line in lines:
+        if line.startswith('SCAN ') and not re.search(
+                r' USING (COVERING )?INDEX ', line):
+            pytest.fail("Full table scan: %s" % line)
+        if 'TEMP B-TREE' in line or 'Sort' in line:
+            pytest.fail("Sorted instead of using an index: %s" % line)
+        if 'Seq Scan' in line:
+            pytest.fail("Sequential scan: %s" % line)
+
+
+@pytest.mark.usefixtures('db')
+class TestIndexes:
+    """Check that the hot query paths are covered by indexes."""
+
+    def test_activity_indexes(self, db):
+        """Team, profile and activity feed queries."""
+        event = EventFactory()
+        event.save()
+        assert_index_search(db, Activity.query.filter_by(
+            project_id=1, name='star'))
+        assert_index_search(db, Activity.query.filter_by(
+            user_id=1, name='star').order_by(Activity.timestamp.desc()))
+        assert_index_search(db, Activity.query.filter(
+            Activity.action == 'post').order_by(Activity.id.desc()).limit(10))
+        assert_index_search(db, Activity.query
+                            .filter(Activity.timestamp >= event.starts_at)
+                            .filter(Activity.timestamp <= event.ends_at)
+                            .order_by(Activity.id.desc()).limit(50))
+        assert_index_search(db, query_latest_activity(
+            Activity.timestamp >= event.starts_at,
+            Activity.timestamp <= event.ends_at))
+
+    def test_project_indexes(self, db):
+        """Event project listings."""
+        assert_index_search(db, get_projects_by_event(1))
+        assert_index_search(db, Project.query
+                            .filter_by(event_id=1, is_hidden=False)
+                            .filter(Project.progress >= 0)
+                            .order_by(Project.ident, Project.name))
+        assert_ordered_by_index(db, Project.query.order_by(
+            Project.ident, Project.name))
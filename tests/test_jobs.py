@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Background job tests."""
+
+import pytest
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from dribdat.database import db
+from dribdat.futures import UTC
+from dribdat.jobs import (
+    JobError, enqueue, purge_jobs, release_lost_jobs, task, work_off,
+)
+from dribdat.user.models import Activity, Job
+
+from .factories import ProjectFactory, EventFactory
+
+calls = []
+
+
+@task("test-flaky", attempts=2)
+def flaky_task(job, value, failures=0):
+    """Fail a number of times before working."""
+    calls.append(value)
+    if calls.count(value) <= failures:
+        raise RuntimeError("Not yet")
+    return "Got %s" % value
+
+
+@task("test-secret", private=True)
+def secret_task(job, token):
+    """Do something with a secret."""
+    return "Used the token"
+
+
+@task("test-refuse")
+def refuse_task(job, reason):
+    """Fail without trying again."""
+    raise JobError(reason)
+
+
+def make_due(job):
+    """Skip the wait before the next attempt."""
+    job.run_at = datetime.now(UTC) - timedelta(seconds=1)
+    job.save()
+
+
+@pytest.mark.usefixtures("db")
+class TestJobs:
+    """Background job tests."""
+
+    def test_job_queue(self, app):
+        """Test queueing, retrying and deduplicating jobs."""
+        app.config["JOB_WORKER"] = "external"
+        job = enqueue("test-flaky", value="a", failures=1)
+        assert enqueue("test-flaky", value="a", failures=1).id == job.id
+        assert enqueue("test-flaky", value="b").id != job.id
+        assert Job.query.count() == 2
+        assert job.status == "pending"
+        assert calls == []
+        # The first attempt fails, and the next one waits
+        assert work_off() == 2
+        db.session.refresh(job)
+        assert job.status == "pending"
+        assert job.attempts == 1
+        assert job.error == "Not yet"
+        assert job.run_at.replace(tzinfo=None) > datetime.now(UTC).replace(tzinfo=None)
+        assert work_off() == 0
+        make_due(job)
+        assert work_off() == 1
+        db.session.refresh(job)
+        assert job.status == "done"
+        assert job.data["message"] == "Got a"
+        assert job.data["progress"] == 1.0
+        assert calls.count("a") == 2
+        # Finished jobs are not reused, and give up after the last attempt
+        job = enqueue("test-flaky", value="a", failures=5)
+        work_off()
+        make_due(job)
+        work_off()
+        db.session.refresh(job)
+        assert job.status == "failed"
+        assert job.attempts == 2
+        with pytest.raises(LookupError):
+            enqueue("test-unknown")
+        # Jobs of a stopped worker are run again
+        job = enqueue("test-flaky", value="c")
+        job.status = "running"
+        job.started_at = datetime.now(UTC) - timedelta(days=1)
+        job.save()
+        release_lost_jobs()
+        db.session.refresh(job)
+        assert job.status == "pending"
+
+    def test_inline_job(self, app):
+        """Test running a job straight away, which cannot be done."""
+        app.config["JOB_WORKER"] = "inline"
+        project = ProjectFactory()
+        project.save()
+        project.name = "Unsaved"
+        job = enqueue("test-refuse", reason="Nothing to do")
+        # The outcome is seen by the caller, without retrying
+        assert job.status == "failed"
+        assert job.attempts == 1
+        assert job.error == "Nothing to do"
+        assert project.name == "Unsaved"
+
+    def test_job_cleanup(self, app):
+        """Test removing secrets and old jobs."""
+        app.config["JOB_WORKER"] = "external"
+        job = enqueue("test-secret", token="abracadabra")
+        assert "abracadabra" in job.payload
+        assert work_off() == 1
+        db.session.refresh(job)
+        assert job.status == "done"
+        assert job.payload is None
+        other = enqueue("test-flaky", value="d")
+        work_off()
+        assert purge_jobs() == 0
+        job.finished_at = datetime.now(UTC) - timedelta(days=30)
+        job.save()
+        assert purge_jobs() == 1
+        assert Job.query.all() == [other]
+
+    def test_job_routes(self, app, testapp, user):
+        """Test syncing a project in the background."""
+        app.config["JOB_WORKER"] = "external"
+        event = EventFactory()
+        project = ProjectFactory(event=event, autotext_url="https://git.test/repo")
+        project.user = user
+        project.save()
+        res = testapp.get("/login/")
+        form = res.forms["loginForm"]
+        form["username"] = user.username
+        form["password"] = "myprecious"
+        form.submit().follow()
+        res = testapp.get("/project/%d/autoupdate" % project.id).follow()
+        assert "refresh in a moment" in res.text
+        testapp.get("/project/%d/autoupdate" % project.id)
+        job = Job.query.one()
+        assert job.user_id == user.id
+        res = testapp.get("/api/job/%d.json" % job.id)
+        assert res.json["job"]["status"] == "pending"
+        data = {"type": "Git", "name": "Repo", "description": "# Synced readme"}
+        with patch("dribdat.autosync.GetProjectData", return_value=data):
+            assert work_off() == 1
+        db.session.refresh(project)
+        assert project.autotext == "# Synced readme"
+        assert Activity.query.filter_by(
+            project_id=project.id, action="sync", user_id=user.id).count() == 1
+        res = testapp.get("/api/job/%d.json" % job.id)
+        assert res.json["job"]["status"] == "done"
+        assert "Git" in res.json["job"]["message"]
+        # Only admins see all the jobs
+        testapp.get("/api/jobs.json", status=403)
+        user.is_admin = True
+        user.save()
+        res = testapp.get("/api/jobs.json?status=done")
+        assert [j["id"] for j in res.json["jobs"]] == [job.id]
+        res = testapp.get("/api/jobs.json?limit=abc")
+        assert len(res.json["jobs"]) == 1
@@ -1,18 +1,19 @@
 # -*- coding: utf-8 -*-
 """Model unit tests."""
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pytest
 
 from base64 import b64decode
 from json import dumps
+from unittest.mock import PropertyMock, patch
 
-from dribdat.user.models import Role, User
+from dribdat.user.models import Activity, Role, Skill, User
 from dribdat.utils import load_json_presets
-from dribdat.aggregation import ProjectActivity
+from dribdat.aggregation import ProjectActivity, RescoreUsers
 
-from .factories import UserFactory, ProjectFactory
+from .factories import UserFactory, ProjectFactory, EventFactory
 
 
 @pytest.mark.usefixtures("db")
@@ -76,6 +77,40 @@ class TestUser:
         user.save()
         assert role in user.roles
 
+    def test_skills(self):
+        """Skills and wishes are kept in sync with the profile."""
+        user1 = UserFactory(my_skills=["Python", "SQL"], my_wishes=["design"])
+        user1.update_skills()
+        user1.save()
+        user2 = UserFactory()
+        user2.my_skills = ["python ", "Python", "Rust"]
+        assert user2.skills == []
+        user2.update_skills()
+        user2.save()
+        assert user1.my_skills == ["Python", "SQL"]
+        assert [s.name for s in user1.skills] == ["python", "sql"]
+        assert [s.name for s in user1.wishes] == ["design"]
+        assert [s.name for s in user2.skills] == ["python", "rust"]
+        assert user2.skills[0] == user1.skills[0]
+        assert Skill.query.count() == 4
+        user1.my_skills = []
+        user1.update_skills()
+        user1.save()
+        assert user1.skills == []
+
+    def test_skills_added_meanwhile(self):
+        """Skills created by another request at the same time are reused."""
+        existing = Skill("go")
+        existing.save()
+        # The first lookup does not see the skill yet
+        missed = Skill.query.filter(Skill.id < 0)
+        with patch.object(Skill, "query", new_callable=PropertyMock,
+                          side_effect=[missed, Skill.query]):
+            skills = Skill.from_names(["Go", "Zig"])
+        assert skills[0] == existing
+        assert [s.name for s in skills] == ["go", "zig"]
+        assert Skill.query.count() == 2
+
     def test_social(self):
         """Check social network profile."""
         user = UserFactory()
@@ -105,7 +140,7 @@ class TestUser:
         user1.save()
         assert user1.get_score() == 0
         user1.webpage_url = "https://blah.com"
-        user1.save()
+        user1.socialize()
         assert user1.get_score() == 2
         ProjectActivity(project, "star", user1)
         project.update_now()
@@ -118,6 +153,65 @@ class TestUser:
         project.update_now()
         assert user1.get_score() == 20
 
+    def test_user_score_cache(self, db):
+        """Stored user scores follow joined projects."""
+        project = ProjectFactory(progress=30)
+        project.update_now()
+        project.save()
+        user1 = UserFactory(webpage_url="https://blah.com")
+        user1.save()
+        assert user1.get_score() == 2
+        # Only changes to the profile or projects refresh the score
+        user1.vitae = "Longer than it used to be"
+        user1.save()
+        assert user1.score == 2
+        user1.socialize()
+        assert user1.score == 6
+        user1.vitae = None
+        user1.socialize()
+        assert user1.score == 2
+        ProjectActivity(project, "star", user1)
+        assert user1.score == 9
+        project.progress = 80
+        project.update_now()
+        db.session.commit()
+        assert user1.score == 19
+        User.query.filter_by(id=user1.id).update({"score": None})
+        db.session.commit()
+        assert RescoreUsers() == 1
+        assert user1.score == 19
+        ProjectActivity(project, "unstar", user1)
+        assert user1.score == 2
+
+    def test_joined_projects(self, db):
+        """Joined projects are unique, filtered and most recent first."""
+        event = EventFactory()
+        event.save()
+        user1 = UserFactory()
+        user1.save()
+        user2 = UserFactory()
+        user2.save()
+        challenge = ProjectFactory(event=event, progress=0)
+        project = ProjectFactory(event=event, progress=30)
+        hidden = ProjectFactory(event=event, progress=30, is_hidden=True)
+        other = ProjectFactory(progress=30)
+        for p in [challenge, project, hidden, other]:
+            p.save()
+        since = datetime.now() - timedelta(hours=1)
+        # Includes a duplicate star, as may result from imported data
+        for i, p in enumerate([challenge, project, hidden, other, challenge]):
+            Activity(name="star", user_id=user1.id, project_id=p.id,
+                     timestamp=since + timedelta(minutes=i)).save()
+        ProjectActivity(project, "star", user2)
+        assert user1.joined_projects() == [challenge, other, project]
+        assert user1.joined_projects(False) == [other, project]
+        assert user1.joined_projects(True, 1) == [challenge]
+        assert user1.joined_projects(True, -1, event) == [challenge, project]
+        assert user1.has_joined(event)
+        joined = User.get_joined_projects([user1.id, user2.id], False, 1)
+        assert joined == {user1.id: [other], user2.id: [project]}
+        assert User.get_joined_projects([]) == {}
+
     def test_user_vitals(self):
         """Test support for the JSON Resume format"""
         user = UserFactory()
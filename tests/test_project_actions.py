@@ -63,8 +63,8 @@ class TestProjectActions:
         res = form.submit().follow()
 
         from unittest.mock import patch
-        with patch('dribdat.public.project.GetProjectData') as mock_data, \
-             patch('dribdat.public.project.SyncProjectData') as mock_sync:
+        with patch('dribdat.autosync.GetProjectData') as mock_data, \
+             patch('dribdat.autosync.SyncProjectData') as mock_sync:
             mock_data.return_value = {'name': 'Updated Name', 'type': 'github', 'autotext': 'Content'}
             res = testapp.get(f'/project/{project.id}/autoupdate').follow()
             assert res.status_code == 200
@@ -3,12 +3,16 @@
 
 import pytest
 
-from dribdat.user.models import Role
+from datetime import timedelta
+
+from dribdat.user.models import Role, Project
 from dribdat.user.constants import stageProjectToNext
-from dribdat.aggregation import ProjectActivity
+from dribdat.aggregation import (
+    ProjectActivity, RecountProjects, ChangeProjectCounters,
+)
 from dribdat.boxout.dribdat import box_project
 
-from .factories import UserFactory, ProjectFactory, EventFactory
+from .factories import UserFactory, ProjectFactory, EventFactory, ActivityFactory
 
 
 @pytest.mark.usefixtures("db")
@@ -79,6 +83,81 @@ class TestProject:
         project.update_now()
         assert project.score == 1
 
+    def test_project_team_count(self, db):
+        """Test the stored team size."""
+        project = ProjectFactory()
+        project.save()
+        assert project.team_count == 0
+        user1 = UserFactory()
+        user1.save()
+        user2 = UserFactory()
+        user2.save()
+        ProjectActivity(project, "star", user1)
+        ProjectActivity(project, "star", user1)
+        ProjectActivity(project, "star", user2)
+        assert project.team_count == 2
+        assert project.data["team_count"] == 2
+        ProjectActivity(project, "unstar", user2)
+        assert project.team_count == 1
+        assert project.versions.count() == 1
+        # The counters can be read before they are saved
+        ChangeProjectCounters(project, "star")
+        assert project.team_count == 2
+        assert project.needs_members
+        db.session.rollback()
+        assert project.team_count == 1
+        project.team_count = 5
+        project.save()
+        assert RecountProjects() == 1
+        assert project.team_count == 1
+
+    def test_project_rescore(self, db):
+        """Test incremental and bulk score calculation."""
+        project = ProjectFactory(progress=10)
+        project.save()
+        user = UserFactory()
+        user.save()
+        for i in range(3):
+            ProjectActivity(project, "boost", user, "Great", "Well done")
+        ProjectActivity(project, "update", user)
+        assert project.activity_count == 4
+        assert project.boost_count == 3
+        project.update_now()
+        project.save()
+        score = project.score
+        assert score == 10 + 2 + 15 + 3
+        project.score = project.activity_count = project.boost_count = 0
+        project.save()
+        assert RecountProjects(None, True, 1) == 1
+        assert project.boost_count == 3
+        assert project.score == score
+
+    def test_project_stats(self, db):
+        """Test aggregated activity statistics."""
+        event = EventFactory()
+        project = ProjectFactory(event=event, longtext=" Hello ")
+        project.save()
+        other = ProjectFactory(event=event)
+        other.save()
+        user = UserFactory()
+        user.save()
+        ProjectActivity(project, "star", user)
+        ProjectActivity(project, "update", user, "post", "Some news")
+        ActivityFactory(name="update", action="commit", project_id=project.id)
+        before = event.starts_at - timedelta(days=1)
+        ActivityFactory(name="review", project_id=project.id, timestamp=before)
+        db.session.commit()
+        stats = project.get_stats()
+        assert stats["total"] == 4
+        assert stats["updates"] == 2
+        assert stats["commits"] == 1
+        assert stats["people"] == 1
+        assert stats["during"] == 3
+        assert stats["sizepitch"] == 5
+        counts = Project.get_activity_counts([project.id, other.id])
+        assert project.get_stats(counts) == stats
+        assert other.get_stats(counts)["total"] == 0
+
     def test_project_promote(self, db):
         project = ProjectFactory()
         db.session.add(project)
@@ -1,7 +1,29 @@
 # -*- coding: utf-8 -*-
 """Dribdat data aggregation tests."""
 
-from dribdat.git import clone_repo, get_git_log, get_file_content
+import os
+import subprocess
+from unittest.mock import patch
+
+from dribdat.git import clone_repo, get_git_log, get_file_content, mirror_lock
+
+
+def git(path, *args):
+    """Run a git command as a test author."""
+    subprocess.check_call(
+        ['git', '-c', 'user.name=Tester', '-c', 'user.email=test@dribdat.cc']
+        + list(args), cwd=path, stdout=subprocess.DEVNULL)
+
+
+def make_repo(path, readme):
+    """Create a local repository with a README."""
+    os.makedirs(path)
+    git(path, 'init', '--quiet', '-b', 'main')
+    with open(os.path.join(path, 'README.md'), 'w') as f:
+        f.write(readme)
+    git(path, 'add', 'README.md')
+    git(path, 'commit', '--quiet', '-m', 'Initial commit')
+    return 'file://' + path
 
 
 class TestGit:
@@ -16,3 +38,52 @@ class TestGit:
         content = get_file_content(path, "README.md")
         assert "dridbot" in content
 
+    def test_mirror_repo(self, app, tmp_path):
+        """Test reading from cached mirrors of repositories."""
+        app.config['GIT_MIRROR_DIR'] = str(tmp_path / 'mirrors')
+        source = str(tmp_path / 'source')
+        url = make_repo(source, "# Mirrored project")
+        path = clone_repo(url)
+        assert path.startswith(app.config['GIT_MIRROR_DIR'])
+        # Read without a working copy
+        assert not os.path.exists(os.path.join(path, 'README.md'))
+        assert get_file_content(path, 'README.md') == "# Mirrored project"
+        assert get_file_content(path, 'README') is None
+        assert [c['message'] for c in get_git_log(path)] == ['Initial commit']
+        # Fetch new commits into the same mirror
+        git(source, 'commit', '--quiet', '--allow-empty', '-m', 'Second commit')
+        assert clone_repo(url) == path
+        log = get_git_log(path)
+        assert [c['message'] for c in log] == ['Second commit', 'Initial commit']
+        assert log[0]['author_name'] == 'Tester'
+        # Keep the previous state if the source is gone
+        os.rename(source, source + '-moved')
+        assert clone_repo(url) == path
+        assert len(get_git_log(path)) == 2
+        assert clone_repo('file://' + str(tmp_path / 'missing')) is None
+        # Mirrors in use, also by other processes, are not removed
+        app.config['GIT_MIRROR_SIZE'] = 0
+        with mirror_lock(path, shared=True):
+            other = clone_repo(make_repo(str(tmp_path / 'other'), "# Other"))
+        assert os.path.exists(path)
+        # Evict the least recently used mirrors beyond the size limit
+        third = clone_repo(make_repo(str(tmp_path / 'third'), "# Third"))
+        assert os.path.exists(third)
+        assert not os.path.exists(path)
+        assert not os.path.exists(other)
+        mirrors = [name for name in os.listdir(app.config['GIT_MIRROR_DIR'])
+                   if name.endswith('.git')]
+        assert mirrors == [os.path.basename(third)]
+        # Along with their lock files
+        assert sorted(os.listdir(app.config['GIT_MIRROR_DIR'])) == [
+            os.path.basename(third), os.path.basename(third) + '.lock']
+
+    def test_mirror_without_flock(self, app, tmp_path):
+        """Test mirroring where only threads can be kept apart."""
+        app.config['GIT_MIRROR_DIR'] = str(tmp_path / 'mirrors')
+        url = make_repo(str(tmp_path / 'source'), "# Mirrored project")
+        with patch('dribdat.git.fcntl', None):
+            path = clone_repo(url)
+            assert get_file_content(path, 'README.md') == "# Mirrored project"
+        assert os.listdir(app.config['GIT_MIRROR_DIR']) == [
+            os.path.basename(path)]
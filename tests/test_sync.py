@@ -3,19 +3,67 @@
 
 from dribdat.aggregation import (
     AddProjectDataFromAutotext,
+    SyncCommitData,
     SyncProjectData,
     TrimProjectData,
 )
 from dribdat.apifetch import (
     FetchWebProject,
+    FetchDataProject,
+    FetchGithubProject,
 )
+from dribdat import httpclient
+from dribdat.autosync import autosync_due, sync_projects, SyncJob
+from dribdat.database import db
+from dribdat.user.models import Activity, ProjectSync
 from dribdat.utils import fix_relative_links
-from .factories import ProjectFactory
+from .factories import ProjectFactory, EventFactory
 
 from .mock.project_data import project_data
 
 import random
+import time
+from datetime import datetime, timedelta
+from dribdat.futures import UTC
 from string import ascii_uppercase
+from threading import Lock
+from unittest.mock import patch
+from requests import Response
+from requests.adapters import BaseAdapter
+
+
+class LocalTransport(BaseAdapter):
+    """Answers requests with local data instead of going online."""
+
+    def __init__(self, pages):
+        super().__init__()
+        self.pages = pages
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append((request.url, kwargs.get("timeout")))
+        response = Response()
+        response.url = request.url
+        response.request = request
+        response.status_code = 200 if request.url in self.pages else 404
+        response._content = self.pages.get(request.url, "").encode("utf-8")
+        return response
+
+    def close(self):
+        pass
+
+
+class RevalidatingTransport(LocalTransport):
+    """Answers with an ETag, and with no content if it is still current."""
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        etag = '"%d"' % len(response.content)
+        if request.headers.get("If-None-Match") == etag:
+            response.status_code = 304
+            response._content = b""
+        response.headers["ETag"] = etag
+        return response
 
 
 class TestSync:
@@ -48,6 +96,245 @@ class TestSync:
         assert len(project.contact_url) == 2048
         assert len(project.download_url) == 2048
 
+    def test_sync_projects(self, user, testapp):
+        """Test concurrent syncing of an event."""
+        event = EventFactory()
+        event.save()
+        hosts = ["a.test", "b.test"]
+        for i in range(6):
+            project = ProjectFactory(event=event, summary="")
+            project.autotext_url = "https://%s/%d" % (hosts[i % 2], i)
+            project.save()
+        ProjectFactory(event=event).save()  # not syncable
+        lock = Lock()
+        running = {host: 0 for host in hosts}
+        most = {host: 0 for host in hosts}
+
+        def fetch(url, with_history):
+            host = url.split("/")[2]
+            with lock:
+                running[host] += 1
+                most[host] = max(most[host], running[host])
+            time.sleep(0.05)
+            with lock:
+                running[host] -= 1
+            if url.endswith("/5"):
+                return {}
+            return {"name": "Synced", "summary": "From " + url}
+
+        progress = []
+        job = SyncJob(lambda job: progress.append(job.done))
+        with patch("dribdat.autosync.GetProjectData", side_effect=fetch):
+            sync_projects(event.projects, job, workers=4, per_host=1, batch_size=2)
+        assert job.data["total"] == 6
+        assert job.data["synced"] == 5
+        assert len(job.failed) == 1
+        assert progress == [0, 1, 2, 3, 4, 5, 6]
+        assert job.progress == 1.0
+        assert most == {"a.test": 1, "b.test": 1}
+        for project in job.synced:
+            assert project.summary == "From " + project.autotext_url
+        # An error while saving one project does not hold up the others
+        broken = job.synced[0]
+
+        def save(project, data, commit=True):
+            if project.id == broken.id:
+                raise ValueError("Broken")
+            project.summary = "Again"
+            project.save()
+
+        job = SyncJob()
+        with patch("dribdat.autosync.GetProjectData", side_effect=fetch), \
+                patch("dribdat.autosync.SyncProjectData", side_effect=save):
+            sync_projects(event.projects, job, batch_size=2)
+        assert job.data["synced"] == 4
+        assert broken in job.failed
+        db.session.expire_all()
+        assert broken.summary == "From " + broken.autotext_url
+        assert all(p.summary == "Again" for p in job.synced)
+
+    def test_autosync_schedule(self, user, testapp):
+        """Test syncing projects of running events on an adaptive schedule."""
+        testapp.app.config["AUTOSYNC_MIN_INTERVAL"] = 60
+        event = EventFactory()
+        event.save()
+        past = EventFactory(
+            starts_at=datetime.now(UTC) - timedelta(days=9),
+            ends_at=datetime.now(UTC) - timedelta(days=8))
+        past.save()
+        urls = ["https://a.test/active", "https://a.test/quiet", "https://b.test/down"]
+        projects = []
+        for url in urls:
+            project = ProjectFactory(event=event, autotext_url=url)
+            project.save()
+            projects.append(project)
+        ProjectFactory(event=event, autotext_url="https://a.test/off",
+                       is_autoupdate=False).save()
+        ProjectFactory(event=past, autotext_url="https://a.test/past").save()
+        blank = ProjectFactory(event=event, autotext_url="  ")
+        blank.save()
+        tab = ProjectFactory(event=event, autotext_url="\t")
+        tab.save()
+        versions = {"active": 0}
+
+        def fetch(url, with_history):
+            if url.endswith("/down"):
+                return {}
+            if url.endswith("/active"):
+                versions["active"] += 1
+                url += " %d" % versions["active"]
+            return {"name": "Synced", "description": url}
+
+        def make_due():
+            for schedule in ProjectSync.query.all():
+                schedule.next_sync_at = datetime.now(UTC) - timedelta(seconds=1)
+            db.session.commit()
+
+        def schedule_of(project):
+            return ProjectSync.query.filter_by(project_id=project.id).one()
+
+        with patch("dribdat.autosync.GetProjectData", side_effect=fetch):
+            job = autosync_due()
+            assert job.total == 3
+            assert len(job.changed) == 2
+            assert len(job.failed) == 1
+            # Nothing is due until the next interval
+            assert autosync_due().total == 0
+            for i in range(2):
+                make_due()
+                job = autosync_due()
+                assert [p.id for p in job.changed] == [projects[0].id]
+        active, quiet, down = [schedule_of(p) for p in projects]
+        assert active.interval == 60
+        assert quiet.interval == 240
+        assert down.failures == 3
+        assert down.interval == 60 * 8
+        assert quiet.next_sync_at > active.next_sync_at
+        # Blank sources do not take up the budget of each minute
+        assert ProjectSync.query.filter_by(project_id=blank.id).count() == 0
+        assert schedule_of(tab).interval == 24 * 60 * 60
+        assert projects[0].autotext == "https://a.test/active 3"
+        # Syncs are limited per minute, the most overdue first
+        make_due()
+        down.next_sync_at = datetime.now(UTC) - timedelta(days=1)
+        down.save()
+        with patch("dribdat.autosync.GetProjectData", side_effect=fetch):
+            job = autosync_due(per_minute=1)
+        assert job.failed == [projects[2]]
+        # A project which cannot be saved backs off, without holding up others
+        sync_project_data = SyncProjectData
+
+        def save(project, data, commit=True):
+            if project.id == projects[1].id:
+                project.autotext = "Half saved"
+                db.session.flush()
+                raise ValueError("Broken project")
+            sync_project_data(project, data, commit)
+
+        make_due()
+        with patch("dribdat.autosync.GetProjectData",
+                   side_effect=lambda url, h: {"name": "New", "description": url}), \
+                patch("dribdat.autosync.SyncProjectData", side_effect=save):
+            job = autosync_due()
+        assert job.failed == [projects[1]]
+        assert projects[0] in job.changed
+        active, quiet = schedule_of(projects[0]), schedule_of(projects[1])
+        assert active.failures == 0
+        assert quiet.failures == 1
+        assert quiet.next_sync_at > datetime.now(UTC).replace(tzinfo=None)
+        assert projects[1].autotext != "Half saved"
+        assert projects[0].autotext == "https://a.test/active"
+
+    def test_http_transport(self, user, testapp):
+        """Test remote requests through the shared client."""
+        url = "https://data.test/datapackage.json"
+        transport = LocalTransport({
+            url: '{"name": "test", "title": "Local data", "resources": []}'
+        })
+        httpclient.set_transport(transport)
+        try:
+            data = FetchDataProject(url)
+            assert data["summary"] == "Local data"
+            assert FetchDataProject("https://data.test/missing/") == {}
+            assert transport.sent == [
+                (url, httpclient.HTTP_TIMEOUT),
+                ("https://data.test/missing/datapackage.json", httpclient.HTTP_TIMEOUT),
+            ]
+        finally:
+            httpclient.set_transport(None)
+        # Connections are pooled and retried
+        session = httpclient.get_session()
+        assert session is httpclient.get_session()
+        adapter = session.get_adapter("https://api.github.com/")
+        assert adapter.max_retries.total == httpclient.HTTP_RETRIES
+        assert 503 in adapter.max_retries.status_forcelist
+        # Only error responses are retried, not unreachable hosts
+        assert adapter.max_retries.connect == 0
+        assert adapter.max_retries.read == 0
+
+    def test_http_cache(self, user, testapp):
+        """Test revalidating cached API responses."""
+        api = "https://api.github.com/repos/dribdat/cached"
+        transport = RevalidatingTransport({
+            api: '{"name": "cached", "full_name": "dribdat/cached",'
+                 ' "default_branch": "main", "description": "Cached data",'
+                 ' "homepage": "", "html_url": "https://github.com/dribdat/cached",'
+                 ' "owner": {"avatar_url": ""}}',
+            api + "/readme": '{"content": "IyBSZWFkbWU="}',
+        })
+        httpclient.set_transport(transport)
+        try:
+            first = FetchGithubProject("dribdat/cached", False)
+            assert first["description"] == "# Readme"
+            second = FetchGithubProject("dribdat/cached", False)
+            assert second == first
+            response = httpclient.get_cached(api)
+            assert response.from_cache
+            assert response.status_code == 200
+            assert response.json()["name"] == "cached"
+        finally:
+            httpclient.set_transport(None)
+        # Only the first requests were answered in full
+        assert len(transport.sent) == 5
+
+    def test_sync_commits(self, user, testapp):
+        """Test saving new commits of a project in bulk."""
+        event = EventFactory()
+        event.save()
+        project = ProjectFactory(event=event)
+        project.save()
+        now = datetime.now(UTC)
+
+        def entry(n, author="someone", minutes=0, url=True):
+            return {
+                "url": "https://git.test/commit/%d" % n if url else None,
+                "date": now - timedelta(minutes=minutes or n),
+                "author": author,
+                "message": "Commit %d" % n,
+            }
+
+        commits = [
+            entry(1, user.username),
+            entry(2),
+            entry(2),  # same link
+            entry(3, minutes=2, url=False),  # same time
+            entry(4, minutes=600),  # before the event
+        ]
+        counts = SyncCommitData(project, commits)
+        assert counts == {"inserted": 2, "skipped": 3}
+        activities = Activity.query.filter_by(
+            project_id=project.id, action="commit").order_by(Activity.id).all()
+        assert [a.content for a in activities] == [
+            "Commit 1", "Commit 2 (@someone)"]
+        assert activities[0].user_id == user.id
+        assert activities[1].user_id is None
+        db.session.refresh(project)
+        assert project.activity_count == 2
+        # Syncing again only adds what is new
+        counts = SyncCommitData(project, commits + [entry(5)])
+        assert counts == {"inserted": 1, "skipped": 5}
+        assert SyncCommitData(project, []) == {"inserted": 0, "skipped": 0}
+
     def test_data_mapping(self, user, testapp):
         """Test mapping from Data Package."""
         project = ProjectFactory()
@@ -100,6 +100,7 @@ class TestViews:
         user.fullname = 'The Builder'
         user.my_story = 'Knight of Can-A-Lot'
         user._my_skills = 'hammer,time'
+        user.update_skills()
         user.save()
         assert user in userhelper.get_users_by_search('@bob')
         assert user in userhelper.get_users_by_search('@builder')